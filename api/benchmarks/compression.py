@@ -0,0 +1,108 @@
+"""
+Benchmark precompressed responses: CPU time per request and bytes on the wire
+for the Destination and Explore resources.
+
+Compares:
+
+- identity: uncompressed responses.
+- gzip per request: compressing every response again with gzip level 6,
+  like a proxy that compresses on the fly.
+- precompressed: the cached brotli or gzip variant of the response.
+
+For every scenario the CPU time of the first request of a response is
+reported separately: a cache miss, which is what most requests for the long
+tail of explore pages are. The second request compresses hot responses again
+with the highest level, the requests after that are cache hits. The time to
+compress a response at the fast and the highest level is reported too.
+Run from the `api/` folder:
+
+    python -m benchmarks.compression
+"""
+import gzip
+import time
+
+from common.compression import BEST_COMPRESSORS, COMPRESSORS
+
+
+def hot_urls(catalog, n_urls=50):
+    """Destination documents and first explore pages that are often requested."""
+    ids = catalog.documents.ids[:n_urls].tolist()
+    profiles = catalog.features.profiles
+    return {
+        "destination": [f"/api/{place_id}" for place_id in ids],
+        "explore": [f"/api/explore/?seed={seed}" for seed in range(n_urls // 2)]
+        + [
+            f"/api/explore/?profiles={profiles[i % len(profiles)]}&offset={12 * i}"
+            for i in range(n_urls // 2)
+        ],
+    }
+
+
+def measure(client, urls, headers, compress=None, repeat=20):
+    """
+    Return CPU milliseconds per request of the first, second and later
+    requests of every url, and bytes per later request.
+    """
+    passes_ms = []
+    for _ in range(2):
+        start = time.process_time()
+        for url in urls:
+            client.get(url, headers=headers)
+        passes_ms.append((time.process_time() - start) / len(urls) * 1000)
+
+    n_bytes = 0
+    start = time.process_time()
+    for _ in range(repeat):
+        for url in urls:
+            body = client.get(url, headers=headers).data
+            if compress is not None:
+                body = compress(body)
+            n_bytes += len(body)
+    n_requests = repeat * len(urls)
+    cpu_ms = (time.process_time() - start) / n_requests * 1000
+    return passes_ms[0], passes_ms[1], cpu_ms, n_bytes / n_requests
+
+
+def compress_ms(client, urls, compress):
+    """Return CPU milliseconds and bytes to compress the body of every url."""
+    bodies = [client.get(url).data for url in urls]
+    start = time.process_time()
+    n_bytes = sum(len(compress(body)) for body in bodies)
+    return (time.process_time() - start) / len(bodies) * 1000, n_bytes / len(bodies)
+
+
+def main():
+    import main as app
+
+    client = app.app.test_client()
+    encoding = next(iter(COMPRESSORS))
+    scenarios = [
+        ("identity", [], {}, None),
+        ("gzip per request", [], {}, lambda body: gzip.compress(body, 6)),
+        (f"precompressed {encoding}", None, {"Accept-Encoding": "br, gzip"}, None),
+    ]
+
+    for resource, urls in hot_urls(app.catalog).items():
+        for label, encodings, headers, compress in scenarios:
+            app.cache.clear()
+            app.responses.encodings = (
+                list(COMPRESSORS) if encodings is None else encodings
+            )
+            first_ms, second_ms, cpu_ms, n_bytes = measure(
+                client, urls, headers, compress
+            )
+            print(
+                f"{resource:>11} | {label:>22} | miss {first_ms:6.2f} ms"
+                f" | second {second_ms:6.2f} ms | hit {cpu_ms:6.3f} ms"
+                f" | {n_bytes:8.0f} bytes/request"
+            )
+        for level, compressors in [("fast", COMPRESSORS), ("best", BEST_COMPRESSORS)]:
+            cpu_ms, n_bytes = compress_ms(client, urls, compressors[encoding])
+            print(
+                f"{resource:>11} | {encoding + ' ' + level + ' compression':>22}"
+                f" | cpu {cpu_ms:6.3f} ms/request | {n_bytes:8.0f} bytes/request"
+            )
+
+
+if __name__ == "__main__":
+    main()
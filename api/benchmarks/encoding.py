@@ -0,0 +1,91 @@
+"""
+Benchmark encoding an Explore page: building dicts and encoding them with the
+json module versus splicing the pre-encoded documents of the catalog.
+
+Compares two ways of encoding the same page, including the selection of
+the top features of every place:
+
+- pandas: select the rows and columns of the DataFrame and convert them with
+  `to_dict`, like Explore did originally.
+- fragments: join the pre-encoded documents, encoding only the features.
+
+Run from the `api/` folder:
+
+    python -m benchmarks.encoding
+"""
+import json
+import timeit
+
+from common.catalog import SUMMARY_COLUMNS
+from resources.explore import ExploreQuery, select_places
+from resources.utils.documents import encode_object
+from resources.utils.utils import prettify_n_results
+
+
+def envelope(positions, destinations):
+    return {
+        "maxPlaces": len(positions),
+        "maxPlacesText": prettify_n_results(len(positions)),
+        "destinations": destinations,
+    }
+
+
+def encode_pandas(catalog, positions, page):
+    features = catalog.features.top_features(page, [])
+    places = catalog.df.iloc[page][SUMMARY_COLUMNS].to_dict(orient="records")
+    for place, place_features in zip(places, features):
+        place["features"] = place_features
+    # flask-restful encodes with json.dumps and adds a newline
+    return (json.dumps(envelope(positions, places)) + "\n").encode("utf-8")
+
+
+def encode_fragments(catalog, positions, page):
+    return encode_object(
+        {
+            "maxPlaces": len(positions),
+            "maxPlacesText": prettify_n_results(len(positions)),
+        },
+        destinations=catalog.summaries.render_many(
+            page, features=catalog.features.top_features_json(page, [])
+        ),
+    )
+
+
+def main(page_sizes=(12, 100)):
+    import main as app
+
+    catalog = app.catalog
+    positions = select_places(catalog, ExploreQuery(None, None, (), 1234))
+
+    for n_results in page_sizes:
+        page = positions[:n_results]
+        results = []
+        for label, encode in [
+            ("pandas", encode_pandas),
+            ("fragments", encode_fragments),
+        ]:
+            body = encode(catalog, positions, page)
+            number = 2000 // n_results * 10
+            seconds = min(
+                timeit.repeat(
+                    lambda: encode(catalog, positions, page),
+                    number=number,
+                    repeat=3,
+                )
+            ) / number
+            results.append((label, body, seconds))
+
+        # all approaches should encode the same data
+        expected = json.loads(results[0][1])
+        assert all(json.loads(body) == expected for _, body, _ in results)
+
+        for label, body, seconds in results:
+            print(
+                f"{n_results:>3} results | {label:>9} | {seconds * 1e6:8.1f} us"
+                f" | {len(body):6d} bytes | {len(body) / seconds / 2 ** 20:7.1f} MB/s"
+                f" | speedup {results[0][2] / seconds:5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Micro-benchmarks of the place selection functions on synthetic data, at the
+sizes of `benchmarks.synthetic`.
+
+Times the DataFrame functions the API started with next to the catalog
+structures that replaced them in the resources:
+
+- sort_places_by_distance versus SphericalIndex.query (Nearby)
+- filter_on_geolocation versus GridIndex.query (Explore viewport)
+- filter_and_sort_places_by_profiles versus sort_positions_by_profiles
+  (Explore profiles)
+- select_features_with_profiles for every place of a page versus
+  FeatureMatrix.top_features (Destination, Explore)
+- create_list_of_likes (Signup, Member)
+
+Run from the `api/` folder, 1M places takes a few minutes:
+
+    python -m benchmarks.functions --places 30000 300000 1000000
+"""
+import sys
+import timeit
+from argparse import ArgumentParser
+
+import numpy as np
+from benchmarks.synthetic import SIZES, create_data
+from common.catalog import Catalog
+from resources.explore import PROFILE_WEIGHT_FACTOR, PROFILE_WEIGHT_THRESHOLD
+from resources.utils.distance import sort_places_by_distance
+from resources.utils.features import (
+    filter_and_sort_places_by_profiles,
+    select_features_with_profiles,
+    sort_positions_by_profiles,
+)
+from resources.utils.selection import filter_on_geolocation
+from resources.utils.utils import create_list_of_likes
+
+N_CLOSEST = 30
+N_RESULTS = 12
+N_LIKES = 20
+PROFILES = ["nature", "culture"]
+# north east and south west corners of a map of western Europe
+VIEWPORT = (55.0, 15.0, 45.0, 0.0)
+
+
+def time_per_call(func):
+    """Return the best time per call in milliseconds, over at least 0.2 s."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(number=number, repeat=3)) / number * 1000
+
+
+def benchmarks(catalog, rng):
+    """Pairs of functions to time, by name, with the same arguments."""
+    df, df_features, df_feature_types = (
+        catalog.df,
+        catalog.df_features,
+        catalog.df_feature_types,
+    )
+    position = rng.randint(len(df))
+    place_id = int(df["id"].iat[position])
+    lat, lng = df["lat"].iat[position], df["lng"].iat[position]
+    page = rng.choice(len(df), N_RESULTS, replace=False)
+    page_ids = df["id"].values[page].tolist()
+    likes = df["id"].values[rng.choice(len(df), N_LIKES, replace=False)].tolist()
+    all_positions = np.arange(len(df))
+
+    return [
+        (
+            "sort_places_by_distance",
+            lambda: sort_places_by_distance(df, place_id).head(N_CLOSEST),
+            lambda: catalog.spatial_index.query(
+                lat, lng, k=N_CLOSEST, exclude=position
+            ),
+        ),
+        (
+            "filter_on_geolocation",
+            lambda: filter_on_geolocation(df, *VIEWPORT),
+            lambda: catalog.grid_index.query(*VIEWPORT),
+        ),
+        (
+            "filter_and_sort_places_by_profiles",
+            lambda: filter_and_sort_places_by_profiles(
+                df,
+                PROFILES,
+                df_features,
+                df_feature_types,
+                profile_weight_factor=PROFILE_WEIGHT_FACTOR,
+                profile_weight_threshold=PROFILE_WEIGHT_THRESHOLD,
+            ),
+            lambda: sort_positions_by_profiles(
+                all_positions,
+                PROFILES,
+                catalog.profile_weights,
+                catalog.nr_tokens_norm,
+                profile_weight_factor=PROFILE_WEIGHT_FACTOR,
+                profile_weight_threshold=PROFILE_WEIGHT_THRESHOLD,
+            ),
+        ),
+        (
+            "select_features_with_profiles",
+            lambda: [
+                select_features_with_profiles(
+                    place_id, PROFILES, df_features, df_feature_types
+                )
+                for place_id in page_ids
+            ],
+            lambda: catalog.features.top_features(page, PROFILES),
+        ),
+        ("create_list_of_likes", None, lambda: create_list_of_likes(catalog, likes)),
+    ]
+
+
+def main(*args):
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--places", type=int, nargs="+", default=SIZES[:2])
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(args)
+
+    for n_places in args.places:
+        catalog = Catalog(*create_data(n_places, args.seed))
+        rng = np.random.RandomState(args.seed)
+        for name, original, indexed in benchmarks(catalog, rng):
+            indexed_ms = time_per_call(indexed)
+            if original is None:
+                print(f"{n_places:>9} | {name:>34} | {indexed_ms:10.3f} ms")
+                continue
+            original_ms = time_per_call(original)
+            print(
+                f"{n_places:>9} | {name:>34} | {original_ms:10.3f} ms"
+                f" | indexed {indexed_ms:8.3f} ms"
+                f" | speedup {original_ms / indexed_ms:7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
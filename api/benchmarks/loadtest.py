@@ -0,0 +1,238 @@
+"""
+Load test the API in-process on synthetic data, without network access.
+
+Writes a snapshot of synthetic destinations (`benchmarks.synthetic`) to a
+temporary folder, imports the app from `main.py` with that snapshot, and
+sends a seeded mix of requests to every endpoint through the Flask test
+client, from one or more threads. Mailchimp is replaced by a local HTTP
+server that accepts every request, so the signup form also works offline.
+
+Reports the number of requests, errors and the p50, p95 and p99 latencies
+per endpoint. Run from the `api/` folder:
+
+    python -m benchmarks.loadtest --places 300000 --requests 5000 --threads 8
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from benchmarks.synthetic import SIZES, write_data
+
+PERCENTILES = (50, 95, 99)
+N_LIKES = 5
+N_BATCH = 20
+VIEWPORTS = [(55.0, 15.0, 45.0, 0.0), (10.0, 120.0, -10.0, 95.0)]
+PROFILES = ["nature", "city", "active", "culture", "relax"]
+
+
+class MailchimpStub(BaseHTTPRequestHandler):
+    """Answers every Mailchimp request with a new member."""
+
+    def respond(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        body = json.dumps({"id": "stub", "status": "subscribed"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PATCH = do_PUT = respond
+
+    def log_message(self, *args):
+        pass
+
+
+@contextlib.contextmanager
+def mailchimp_stub():
+    """Run the Mailchimp stub on a free local port and yield its url."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MailchimpStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield "http://127.0.0.1:{}/3.0".format(server.server_port)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def import_app(n_places, seed, directory):
+    """
+    Import `main.py` with a synthetic snapshot, a fake Mailchimp key and all
+    files it writes in a temporary folder.
+    """
+    snapshot_dir = os.path.join(directory, "snapshots")
+    write_data(n_places, snapshot_dir, seed)
+    os.makedirs(os.path.join(directory, "credentials"))
+    with open(os.path.join(directory, "credentials", "mailchimp-key.json"), "w") as f:
+        json.dump({"api_key": "stub-us3", "audience_id": "stub"}, f)
+
+    os.environ["STAIRWAY_SNAPSHOT_DIR"] = snapshot_dir
+    os.environ["STAIRWAY_OUTBOX_PATH"] = os.path.join(directory, "outbox.sqlite3")
+    os.environ["STAIRWAY_METRICS_DIR"] = os.path.join(directory, "metrics")
+    os.environ["STAIRWAY_PROFILE_DIR"] = os.path.join(directory, "profiles")
+    # the key file is read relative to the working directory
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.chdir(directory)
+
+    import main
+
+    return main
+
+
+def request_mix(ids, rng):
+    """
+    Functions that send a random request to one endpoint, by endpoint name.
+    """
+
+    def profiles():
+        return "".join(
+            "&profiles=" + profile for profile in rng.sample(PROFILES, rng.randint(0, 2))
+        )
+
+    def viewport():
+        ne_lat, ne_lng, sw_lat, sw_lng = rng.choice(VIEWPORTS)
+        return f"ne_lat={ne_lat}&ne_lng={ne_lng}&sw_lat={sw_lat}&sw_lng={sw_lng}"
+
+    return {
+        "destination": lambda client: client.get(
+            f"/api/{rng.choice(ids)}?{profiles()}"
+        ),
+        "random destination": lambda client: client.get("/api/"),
+        "destinations": lambda client: client.get(
+            "/api/destinations?ids="
+            + ",".join(str(place_id) for place_id in rng.sample(ids, N_BATCH))
+        ),
+        "explore": lambda client: client.get(
+            f"/api/explore/?seed={rng.randrange(100)}"
+            f"&offset={12 * rng.randrange(5)}{profiles()}"
+        ),
+        "explore viewport": lambda client: client.get(
+            f"/api/explore/?{viewport()}{profiles()}"
+        ),
+        "nearby": lambda client: client.get(f"/api/nearby/{rng.choice(ids)}"),
+        "nearby location": lambda client: client.get(
+            f"/api/nearby/?lat={rng.uniform(-60, 60):.4f}"
+            f"&lng={rng.uniform(-180, 180):.4f}"
+        ),
+        "signup": lambda client: client.post(
+            "/signup/",
+            json={
+                "email": f"user{rng.randrange(10 ** 6)}@example.com",
+                "location": "loadtest",
+                "likes": rng.sample(ids, N_LIKES),
+            },
+        ),
+        "member": lambda client: client.post(
+            "/member/",
+            json={
+                "email": f"user{rng.randrange(10 ** 6)}@example.com",
+                "likes": rng.sample(ids, N_LIKES),
+                "flights": True,
+            },
+        ),
+    }
+
+
+# share of every endpoint in the requests, roughly like the site's traffic
+WEIGHTS = {
+    "destination": 25,
+    "random destination": 5,
+    "destinations": 5,
+    "explore": 30,
+    "explore viewport": 10,
+    "nearby": 15,
+    "nearby location": 5,
+    "signup": 3,
+    "member": 2,
+}
+
+
+def run_client(app, ids, n_requests, seed, latencies, errors):
+    """Send requests from one thread and record their latency per endpoint."""
+    client = app.test_client()
+    rng = random.Random(seed)
+    mix = request_mix(ids, rng)
+    names = rng.choices(list(WEIGHTS), weights=list(WEIGHTS.values()), k=n_requests)
+    for name in names:
+        start = time.perf_counter()
+        response = mix[name](client)
+        latencies[name].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors[name] += 1
+
+
+def load_test(app, ids, n_requests, n_threads, seed):
+    """
+    Send requests from `n_threads` threads.
+
+    Returns
+    -------
+    out: tuple
+        The latencies in seconds and the number of errors per endpoint, and
+        the total duration in seconds.
+    """
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(app, ids, n_requests // n_threads, seed + i, latencies, errors),
+        )
+        for i in range(n_threads)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def report(latencies, errors, duration):
+    header = " | ".join(f"p{p:<2} (ms)" for p in PERCENTILES)
+    print(f"{'endpoint':>18} | requests | errors | {header}")
+    for name in WEIGHTS:
+        if not latencies[name]:
+            continue
+        values = np.percentile(np.array(latencies[name]) * 1000, PERCENTILES)
+        print(
+            f"{name:>18} | {len(latencies[name]):8} | {errors[name]:6} | "
+            + " | ".join(f"{value:9.2f}" for value in values)
+        )
+    n_requests = sum(len(values) for values in latencies.values())
+    print(f"{n_requests} requests in {duration:.1f} s, {n_requests / duration:.0f}/s")
+
+
+def main(*args):
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--places", type=int, default=SIZES[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as directory, mailchimp_stub() as url:
+        main = import_app(args.places, args.seed, directory)
+        main.mailchimp.base_url = url
+        main.warm_up()
+        ids = [int(place_id) for place_id in main.live_catalog.catalog.df["id"].values]
+
+        # the member endpoint prints its payload
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = load_test(main.app, ids, args.requests, args.threads, args.seed)
+        report(*results)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,69 @@
+"""
+Benchmark the Nearby lookup: full-catalog haversine sort versus the spherical
+nearest neighbour index.
+
+Run from the `api/` folder:
+
+    python -m benchmarks.nearby
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+from resources.utils.distance import SphericalIndex, sort_places_by_distance
+
+N_CLOSEST = 30
+
+
+def create_places(n_places, seed=1234):
+    """Create a DataFrame with uniformly distributed places on the globe."""
+    rng = np.random.RandomState(seed)
+    ids = np.arange(100000, 100000 + n_places)
+    return pd.DataFrame(
+        {
+            "id": ids,
+            "lat": np.degrees(np.arcsin(rng.uniform(-1, 1, n_places))),
+            "lng": rng.uniform(-180, 180, n_places),
+        }
+    ).set_index("id", drop=False)
+
+
+def time_per_call(func, number):
+    """Return the best time per call in milliseconds over 3 repeats."""
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1000
+
+
+def main(sizes=(30_000, 1_000_000)):
+    for n_places in sizes:
+        df = create_places(n_places)
+        place_id = df["id"].iat[n_places // 2]
+        lat, lng = df.loc[place_id, "lat"], df.loc[place_id, "lng"]
+
+        start = timeit.default_timer()
+        index = SphericalIndex(df["lat"].values, df["lng"].values)
+        build_time = timeit.default_timer() - start
+
+        # both approaches should find the same places
+        expected = sort_places_by_distance(df, place_id).head(N_CLOSEST)["id"]
+        positions, _ = index.query(
+            lat, lng, k=N_CLOSEST, exclude=n_places // 2
+        )
+        assert set(expected) == set(df["id"].values[positions])
+
+        sort_time = time_per_call(
+            lambda: sort_places_by_distance(df, place_id).head(N_CLOSEST), 3
+        )
+        query_time = time_per_call(
+            lambda: index.query(lat, lng, k=N_CLOSEST, exclude=n_places // 2),
+            1000,
+        )
+        print(
+            f"{n_places:>9,} places | index build {build_time * 1000:8.1f} ms"
+            f" | haversine + sort {sort_time:8.2f} ms"
+            f" | index query {query_time:6.3f} ms"
+            f" | speedup {sort_time / query_time:8.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
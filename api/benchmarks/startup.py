@@ -0,0 +1,67 @@
+"""
+Benchmark API startup: loading the data from CSV files versus memory-mapping
+the binary snapshot.
+
+Every measurement starts a fresh Python process that imports `main`, like a
+new worker or an App Engine cold start. Run from the `api/` folder, after
+creating a snapshot with `src/stairway/sources/wikivoyage/snapshot.py`:
+
+    python -m benchmarks.startup
+"""
+import json
+import os
+import subprocess
+import sys
+
+CHILD = """
+import json, resource, time
+start = time.perf_counter()
+import main
+seconds = time.perf_counter() - start
+rss_kb = None
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss_kb = int(line.split()[1])
+print(json.dumps({
+    "seconds": seconds,
+    "rss_kb": rss_kb,
+    "peak_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "version": main.catalog.version,
+}))
+"""
+
+
+def measure(snapshot_dir, repeat=3):
+    """Start the API `repeat` times and return the fastest measurement."""
+    env = dict(os.environ, STAIRWAY_SNAPSHOT_DIR=snapshot_dir)
+    runs = [
+        json.loads(
+            subprocess.run(
+                [sys.executable, "-c", CHILD],
+                env=env,
+                check=True,
+                stdout=subprocess.PIPE,
+            ).stdout.decode()
+        )
+        for _ in range(repeat)
+    ]
+    return min(runs, key=lambda run: run["seconds"])
+
+
+def main(snapshot_dir="./data/snapshots"):
+    if not os.path.exists(os.path.join(snapshot_dir, "CURRENT")):
+        sys.exit(f"No snapshot found in {snapshot_dir}, create one first.")
+
+    for label, directory in [("csv", "./no-snapshot"), ("snapshot", snapshot_dir)]:
+        run = measure(directory)
+        print(
+            f"{label:>8} | startup {run['seconds'] * 1000:7.0f} ms"
+            f" | rss {run['rss_kb'] / 1024:6.1f} MB"
+            f" | peak rss {run['peak_kb'] / 1024:6.1f} MB"
+            f" | version {run['version']}"
+        )
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
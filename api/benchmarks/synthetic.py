@@ -0,0 +1,148 @@
+"""
+Generate synthetic API data, to benchmark the API with more destinations than
+the real data set has and without the data files.
+
+The data sets have the same columns and types as the CSV files the API loads
+in `main.py`, and the same seed always gives the same data. Write a snapshot
+of 300k destinations that the API can load with `STAIRWAY_SNAPSHOT_DIR` from
+the `api/` folder with:
+
+    python -m benchmarks.synthetic --places 300000 --snapshot-dir /tmp/synthetic
+"""
+import sys
+from argparse import ArgumentParser
+
+import numpy as np
+import pandas as pd
+
+SIZES = (30_000, 300_000, 1_000_000)
+N_FEATURES = 87
+PROFILES = ["nature", "city", "active", "culture", "relax", "enabled", "beach"]
+FEATURE_TYPES = ["Scenery", "Activities", "Culture", "Nightlife", "Shopping"]
+STATUSES = ["outline", "usable", "guide", "star"]
+STATUS_SHARES = [0.67, 0.30, 0.029, 0.001]
+N_COUNTRIES = 200
+
+
+def create_feature_types(seed=1234):
+    """
+    Create the feature types data set, with every feature in one or two
+    feature profiles.
+    """
+    rng = np.random.RandomState(seed)
+    names = ["Feature {}".format(i) for i in range(1, N_FEATURES + 1)]
+    membership = np.zeros((N_FEATURES, len(PROFILES)), dtype=int)
+    for row in membership:
+        row[rng.choice(len(PROFILES), size=rng.randint(1, 3), replace=False)] = 1
+    return pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "feature_id": np.arange(1, N_FEATURES + 1),
+                    "feature_name": names,
+                    "feature_column": [
+                        name.lower().replace(" ", "_") for name in names
+                    ],
+                    "feature_type": rng.choice(FEATURE_TYPES, N_FEATURES),
+                }
+            ),
+            pd.DataFrame(membership, columns=PROFILES),
+        ],
+        axis=1,
+    )
+
+
+def create_destinations(n_places, seed=1234):
+    """
+    Create the destinations data set, with places spread uniformly over the
+    globe and a long tailed number of tokens, like Wikivoyage articles.
+    """
+    rng = np.random.RandomState(seed)
+    # unique ids with gaps, in random order
+    ids = rng.permutation(100_000 + np.cumsum(rng.randint(1, 100, n_places)))
+    # long tail: few long articles and many short ones
+    weight = np.maximum(
+        rng.lognormal(mean=7, sigma=2, size=n_places).astype(np.int64), 1
+    )
+    countries = ["Country {}".format(i) for i in range(N_COUNTRIES)]
+    # some countries have many more places than others
+    country_shares = 1 / np.arange(1, N_COUNTRIES + 1) ** 1.1
+    return pd.DataFrame(
+        {
+            "id": ids,
+            "wiki_id": np.arange(10, 10 + 3 * n_places, 3),
+            "name": ["Place {}".format(i) for i in range(n_places)],
+            "status": rng.choice(STATUSES, n_places, p=STATUS_SHARES),
+            "type": rng.choice(["city", "park"], n_places, p=[0.94, 0.06]),
+            "lat": np.degrees(np.arcsin(rng.uniform(-1, 1, n_places))),
+            "lng": rng.uniform(-180, 180, n_places),
+            "country": rng.choice(
+                countries, n_places, p=country_shares / country_shares.sum()
+            ),
+            "weight": weight,
+            "nr_tokens_norm": weight / weight.max(),
+        }
+    )
+
+
+def create_features(df, df_feature_types, seed=1234):
+    """
+    Create the feature scores of all places, mostly close to 0 with a few
+    high scores per place, indexed on 'id'.
+    """
+    rng = np.random.RandomState(seed)
+    scores = rng.beta(0.3, 3, size=(len(df), len(df_feature_types)))
+    return pd.DataFrame(
+        scores,
+        index=pd.Index(df["id"].values, name="id"),
+        columns=df_feature_types["feature_name"].values,
+    )
+
+
+def create_data(n_places, seed=1234):
+    """
+    Create all data sets of the API.
+
+    Parameters
+    ----------
+    n_places: int
+        Number of destinations.
+    seed: int
+        Seed of the random generators. The same seed gives the same data.
+
+    Returns
+    -------
+    out: tuple
+        The destinations, features and feature types DataFrames, as
+        `main.py` reads them from the CSV files.
+    """
+    df_feature_types = create_feature_types(seed)
+    df = create_destinations(n_places, seed)
+    df_features = create_features(df, df_feature_types, seed)
+    return df.set_index("id", drop=False), df_features, df_feature_types
+
+
+def write_data(n_places, snapshot_dir, seed=1234):
+    """Write the data as a snapshot the API can load, and return its version."""
+    # the snapshot writer lives in the stairway package, outside the api/ folder
+    from stairway.sources.wikivoyage.snapshot import write_snapshot
+
+    df, df_features, df_feature_types = create_data(n_places, seed)
+    return write_snapshot(
+        df.reset_index(drop=True), df_features, df_feature_types, snapshot_dir
+    )
+
+
+def main(*args):
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--places", type=int, default=SIZES[0])
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--snapshot-dir", required=True)
+    args = parser.parse_args(args)
+
+    version = write_data(args.places, args.snapshot_dir, args.seed)
+    print("Wrote snapshot {} with {} places".format(version, args.places))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
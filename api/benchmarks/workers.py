@@ -0,0 +1,122 @@
+"""
+Measure the memory used by every API worker process.
+
+Compares two ways of starting N workers:
+
+- independent: every worker loads the data itself, like workers that are
+  started without preloading the app.
+- preforked: the master loads the data once and forks the workers, which
+  share the master's memory until they write to it (copy-on-write).
+
+For every worker the unique set size (USS) is reported after serving a mix
+of requests: the memory that only that worker uses and that would be freed
+if it exited. Linux only. Run from the `api/` folder:
+
+    python -m benchmarks.workers --workers 4
+"""
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+from argparse import SUPPRESS, ArgumentParser
+
+
+def unique_set_size_kb(pid="self"):
+    """Return the unique set size of a process in kB."""
+    uss = 0
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                uss += int(line.split()[1])
+    return uss
+
+
+def serve_requests(app, catalog, n_requests, seed):
+    """Send a mix of requests to the app through the Flask test client."""
+    client = app.test_client()
+    rng = random.Random(seed)
+    ids = [int(place_id) for place_id in catalog.df["id"].values]
+    urls = [
+        lambda: f"/api/{rng.choice(ids)}",
+        lambda: f"/api/{rng.choice(ids)}?profiles=nature",
+        lambda: f"/api/nearby/{rng.choice(ids)}",
+        lambda: f"/api/explore/?seed={rng.randrange(100)}&offset={12 * rng.randrange(10)}",
+        lambda: f"/api/explore/?profiles=culture&profiles=city&offset={12 * rng.randrange(10)}",
+        lambda: "/api/explore/?ne_lat=55&ne_lng=15&sw_lat=45&sw_lng=0",
+    ]
+    for _ in range(n_requests):
+        client.get(rng.choice(urls)())
+
+
+def run_worker(n_requests, seed):
+    """Import the app, serve requests and print the USS (independent mode)."""
+    import main
+
+    serve_requests(main.app, main.catalog, n_requests, seed)
+    print(unique_set_size_kb())
+
+
+def independent(n_workers, n_requests):
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.workers", "--worker", str(seed)]
+            + ["--requests", str(n_requests)],
+            stdout=subprocess.PIPE,
+        )
+        for seed in range(n_workers)
+    ]
+    return [int(process.communicate()[0]) for process in processes]
+
+
+def preforked(n_workers, n_requests):
+    import main
+
+    # like the when_ready hook in gunicorn.conf.py
+    main.warm_up()
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+
+    readers = []
+    for seed in range(n_workers):
+        read_fd, write_fd = os.pipe()
+        if os.fork() == 0:
+            os.close(read_fd)
+            serve_requests(main.app, main.catalog, n_requests, seed)
+            os.write(write_fd, str(unique_set_size_kb()).encode())
+            os._exit(0)
+        os.close(write_fd)
+        readers.append(read_fd)
+
+    results = []
+    for read_fd in readers:
+        with os.fdopen(read_fd) as f:
+            results.append(int(f.read()))
+    for _ in readers:
+        os.wait()
+    return results
+
+
+def main(*args):
+    parser = ArgumentParser(description="Measure memory use per API worker.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--worker", type=int, default=None, help=SUPPRESS)
+    options = parser.parse_args(args)
+
+    if options.worker is not None:
+        return run_worker(options.requests, options.worker)
+
+    for label, start in [("independent", independent), ("preforked", preforked)]:
+        uss = [kb / 1024 for kb in start(options.workers, options.requests)]
+        print(
+            f"{label:>11} | {options.workers} workers"
+            f" | USS per worker {json.dumps([round(mb, 1) for mb in uss])} MB"
+            f" | total {sum(uss):7.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
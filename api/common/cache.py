@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe least recently used cache, bounded by the total size of the
+    cached values in bytes.
+
+    The cache belongs to one version of the data. Setting a different version
+    drops all entries, so results computed on old data are never served.
+
+    Parameters
+    ----------
+    max_bytes: int
+        Maximum total size of the cached values.
+    """
+
+    def __init__(self, max_bytes=32 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """Return the value for a key and mark it as recently used."""
+        with self._lock:
+            try:
+                value, _ = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, nbytes):
+        """
+        Add a value to the cache, evicting least recently used values if the
+        cache gets too large.
+
+        Parameters
+        ----------
+        key: hashable
+            Key to store the value under.
+        value: object
+            Value to cache.
+        nbytes: int
+            Memory used by the value, counted towards `max_bytes`.
+        """
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_nbytes
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def set_version(self, version):
+        """Link the cache to a data version, clearing it if the version changed."""
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.nbytes = 0
+                self.version = version
+
+    def stats(self):
+        """Return the cache counters as a dict."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
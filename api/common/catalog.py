@@ -0,0 +1,102 @@
+import hashlib
+
+import pandas as pd
+from resources.utils.distance import SphericalIndex
+from resources.utils.documents import DocumentStore
+from resources.utils.features import FeatureMatrix, ProfileWeightMatrix
+from resources.utils.sampling import WeightedShuffle
+from resources.utils.selection import CountryIndex, GridIndex
+from resources.utils.utils import read_only
+
+# columns of the short documents in lists of places, like Explore results
+SUMMARY_COLUMNS = ["id", "wiki_id", "name", "status", "type", "lat", "lng", "country"]
+
+
+class Catalog:
+    """
+    Destination data together with the lookup structures derived from it.
+
+    The catalog is built once when the app starts and shared by all resources,
+    so that requests never have to copy or re-index the full data set.
+
+    Parameters
+    ----------
+    df: DataFrame
+        Destinations data, indexed on 'id'.
+    df_features: DataFrame
+        Data set with feature scores for all places, indexed on 'id'.
+    df_feature_types: DataFrame
+        Data set that tells which features belong to which feature profiles.
+    version: str
+        Version of the data, e.g. from a snapshot manifest. Computed from the
+        data when not provided.
+    """
+
+    def __init__(self, df, df_features, df_feature_types, version=None):
+        self.df = df
+        self.df_features = df_features
+        self.df_feature_types = df_feature_types
+        self.version = version or compute_version(
+            df, df_features, df_feature_types
+        )
+
+        # read-only column arrays for selecting values of many places at once
+        self.columns = {column: to_column_array(df[column]) for column in df.columns}
+        # JSON documents served by the Destination and Nearby resources
+        self.documents = DocumentStore(df)
+        # short JSON documents served by the Explore resource
+        self.summaries = DocumentStore(df, columns=SUMMARY_COLUMNS)
+        # lookup of a place's row position by its id
+        self.positions = self.documents.positions
+        # nearest neighbour search for the Nearby resource
+        self.spatial_index = SphericalIndex(df["lat"].values, df["lng"].values)
+        # map viewport search for the Explore resource
+        self.grid_index = GridIndex(df["lat"].values, df["lng"].values)
+        # country search for the Explore resource
+        self.country_index = CountryIndex(df["country"].values)
+        # profile weights and token weights for sorting places in Explore
+        self.profile_weights = ProfileWeightMatrix(
+            df["id"].values, df_features, df_feature_types
+        )
+        self.nr_tokens_norm = self.columns["nr_tokens_norm"]
+        # feature scores for labelling places with their top features
+        self.features = FeatureMatrix(df["id"].values, df_features, df_feature_types)
+        # weighted random order of places using the number of tokens weight
+        self.shuffle = WeightedShuffle(df["weight"].values)
+
+
+def to_column_array(series):
+    """
+    Convert a column to a read-only numpy array without Python objects.
+
+    Text columns become fixed width unicode arrays. Columns with other Python
+    objects, like missing values in a text column, are kept as they are.
+    """
+    values = series.to_numpy()
+    if values.dtype == object and series.map(lambda value: isinstance(value, str)).all():
+        values = series.to_numpy(dtype=str)
+    # arrays that are already read-only can be shared as they are
+    if values.flags.writeable:
+        values = read_only(values.copy())
+    return values
+
+
+def compute_version(*frames):
+    """
+    Compute a short version string that changes whenever the data changes.
+
+    Parameters
+    ----------
+    frames: DataFrame
+        Data sets to compute the version for.
+
+    Returns
+    -------
+    out: str
+        Hexadecimal hash of the contents of all data sets.
+    """
+    digest = hashlib.sha1()
+    for frame in frames:
+        digest.update(",".join(map(str, frame.columns)).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(frame).values.tobytes())
+    return digest.hexdigest()[:12]
@@ -0,0 +1,111 @@
+import gzip
+
+from common.etags import add_cache_headers, variant_etag
+from common.timing import span
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# compressed when a response is first requested, most of which are never
+# requested again, so fast levels; in order of preference, when the client
+# accepts multiple encodings
+COMPRESSORS = {}
+if brotli is not None:
+    COMPRESSORS["br"] = lambda data: brotli.compress(data, quality=5)
+COMPRESSORS["gzip"] = lambda data: gzip.compress(data, compresslevel=6, mtime=0)
+
+# compressed again when a response is requested a second time, and likely
+# more often, so the highest levels
+BEST_COMPRESSORS = {}
+if brotli is not None:
+    BEST_COMPRESSORS["br"] = lambda data: brotli.compress(data, quality=11)
+BEST_COMPRESSORS["gzip"] = lambda data: gzip.compress(
+    data, compresslevel=9, mtime=0
+)
+
+# suffix of the variants compressed with the fast levels
+FAST = "-fast"
+
+
+class ResponseCache:
+    """
+    Cache of response bodies, together with their compressed variants.
+
+    Deterministic responses are stored by their ETag in a bounded cache, so
+    that they are only created once. Each body is compressed with the best
+    encoding the client accepts: quickly the first time a client accepts that
+    encoding, and with the highest level the second time, so that only the
+    responses that are requested again pay for the best compression.
+
+    Parameters
+    ----------
+    cache: LRUCache
+        Bounded cache to store the bodies and their variants in.
+    encodings: list
+        Encodings to compress with, in order of preference. Defaults to
+        brotli, when installed, and gzip. An empty list disables compression.
+    min_size: int
+        Minimum size of a body in bytes to compress it.
+    """
+
+    def __init__(self, cache, encodings=None, min_size=256):
+        self.cache = cache
+        self.encodings = list(COMPRESSORS) if encodings is None else list(encodings)
+        self.min_size = min_size
+
+    def respond(self, etag, render, cache_control, mimetype="application/json"):
+        """
+        Create the response for a request.
+
+        Parameters
+        ----------
+        etag: str
+            Entity tag of the response, see `common.etags.create_etag`.
+        render: callable
+            Function that returns the uncompressed body, called when the body
+            is not in the cache.
+        cache_control: str
+            Value of the Cache-Control header.
+        mimetype: str
+            Content type of the body.
+
+        Returns
+        -------
+        out: Response
+            Response with the body in the negotiated encoding.
+        """
+        encoding = request.accept_encodings.best_match(self.encodings) or "identity"
+
+        key = ("response", etag)
+        variants = self.cache.get(key)
+        changed = variants is None
+        if changed:
+            variants = {"identity": render()}
+        body = variants["identity"]
+
+        # small bodies are not worth compressing
+        variant = encoding
+        if len(body) < self.min_size:
+            encoding = variant = "identity"
+        elif encoding not in variants:
+            # a copy, other threads may be reading the cached variants
+            variants = dict(variants)
+            with span("compress"):
+                if encoding + FAST in variants:
+                    variants[encoding] = BEST_COMPRESSORS[encoding](body)
+                    del variants[encoding + FAST]
+                else:
+                    variant = encoding + FAST
+                    variants[variant] = COMPRESSORS[encoding](body)
+            changed = True
+        if changed:
+            self.cache.put(key, variants, sum(len(data) for data in variants.values()))
+
+        response = Response(variants[variant], mimetype=mimetype)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        return add_cache_headers(response, variant_etag(etag, variant), cache_control)
@@ -0,0 +1,63 @@
+import hashlib
+
+from flask import Response, request
+
+# responses that are different for every request, like a random destination
+NO_STORE = "no-store"
+
+
+def create_etag(version, *parts):
+    """
+    Create a strong entity tag for a response.
+
+    Parameters
+    ----------
+    version: str
+        Version of the data the response is created from.
+    parts:
+        Normalized request arguments that determine the response.
+
+    Returns
+    -------
+    out: str
+        Tag that changes when the data or any of the arguments change.
+    """
+    digest = hashlib.sha1(repr((version,) + parts).encode("utf-8"))
+    return digest.hexdigest()[:24]
+
+
+def variant_etag(etag, encoding):
+    """Entity tag of a compressed variant of a response."""
+    return etag if encoding == "identity" else "{}-{}".format(etag, encoding)
+
+
+def matching_etag(etag):
+    """Return the tag in the If-None-Match header that matches the tag or any
+    of its compressed variants, or None."""
+    tags = request.if_none_match
+    if tags.star_tag:
+        return etag
+    for tag in tags.as_set(include_weak=True):
+        if tag.split("-", 1)[0] == etag:
+            return tag
+    return None
+
+
+def is_not_modified(etag):
+    """Whether the client sent an If-None-Match header matching the tag."""
+    return matching_etag(etag) is not None
+
+
+def not_modified(etag, cache_control):
+    """Create an empty 304 Not Modified response."""
+    response = Response(status=304)
+    response.vary.add("Accept-Encoding")
+    return add_cache_headers(response, matching_etag(etag) or etag, cache_control)
+
+
+def add_cache_headers(response, etag, cache_control):
+    """Add the ETag and Cache-Control headers to a response."""
+    if etag is not None:
+        response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
@@ -0,0 +1,146 @@
+import random
+import time
+from json import load
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_DATA_CENTER = "us3"
+# (connect, read) timeouts in seconds
+TIMEOUT = (3.05, 10)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# a read timeout may happen after the request was processed, so only retry those
+# for methods that can safely be repeated
+IDEMPOTENT_METHODS = {"GET", "PUT", "PATCH", "DELETE"}
+
+
+class MailchimpClient:
+    """
+    Client for the Mailchimp marketing API, shared by all requests of a worker.
+
+    Keeps connections to Mailchimp alive between requests and retries failed
+    requests a limited number of times with jittered exponential backoff.
+
+    Parameters
+    ----------
+    api_key: str
+        Mailchimp API key, ending with the data center, e.g. '...-us3'.
+    audience_id: str
+        Id of the Mailchimp audience (list) to add members to.
+    base_url: str
+        Url of the API. Defaults to the API of the key's data center.
+    timeout: tuple
+        Connect and read timeout in seconds.
+    max_retries: int
+        Number of times to retry a failed request.
+    backoff: float
+        Base delay in seconds between retries, doubled for every retry.
+    pool_size: int
+        Number of connections to keep open.
+    metrics: Metrics
+        Records the duration of every request to Mailchimp, if given.
+    """
+
+    def __init__(
+        self,
+        api_key,
+        audience_id,
+        base_url=None,
+        timeout=TIMEOUT,
+        max_retries=3,
+        backoff=0.5,
+        pool_size=10,
+        metrics=None,
+    ):
+        if base_url is None:
+            data_center = api_key.rsplit("-", 1)[1] if "-" in api_key else ""
+            base_url = "https://{}.api.mailchimp.com/3.0".format(
+                data_center or DEFAULT_DATA_CENTER
+            )
+        self.base_url = base_url.rstrip("/")
+        self.audience_id = audience_id
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.histogram(
+                "mailchimp_request_duration_seconds",
+                "Time to get a response from Mailchimp, for every attempt.",
+            )
+
+        self.session = requests.Session()
+        self.session.auth = ("randomstring", api_key)
+        self.session.headers["content-type"] = "application/json"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @classmethod
+    def from_key_file(cls, path, **kwargs):
+        """Create a client with the 'api_key' and 'audience_id' in a JSON file."""
+        with open(path, "r") as f:
+            key = load(f)
+        return cls(key["api_key"], key["audience_id"], **kwargs)
+
+    def request(self, method, path, **kwargs):
+        """
+        Send a request to the Mailchimp API, retrying on connection errors,
+        rate limiting and server errors.
+
+        Parameters
+        ----------
+        method: str
+            HTTP method.
+        path: str
+            Path relative to the API url, e.g. '/lists/{id}/members/'.
+        kwargs:
+            Passed on to `requests.Session.request`, e.g. `json`.
+
+        Returns
+        -------
+        out: Response
+            The last response. Only raises when no response was received at
+            all after the last retry.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.base_url + path
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                self.record(method, type(error).__name__, start)
+                read_timeout = isinstance(error, requests.ReadTimeout)
+                if last_attempt or (read_timeout and method not in IDEMPOTENT_METHODS):
+                    raise
+            else:
+                self.record(method, response.status_code, start)
+                if last_attempt or response.status_code not in RETRY_STATUS_CODES:
+                    return response
+            time.sleep(self.retry_delay(attempt))
+
+    def record(self, method, status, start):
+        """Record the duration of a request that started at `start`."""
+        if self.metrics is not None:
+            self.metrics.observe(
+                "mailchimp_request_duration_seconds",
+                time.perf_counter() - start,
+                method=method,
+                status=status,
+            )
+
+    def retry_delay(self, attempt):
+        """Exponential backoff with full jitter, to spread out retries of workers."""
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def members_path(self, email=None):
+        """Path of the audience members, or of one member."""
+        path = "/lists/{}/members/".format(self.audience_id)
+        return path if email is None else path + email
+
+    def close(self):
+        """Close all connections."""
+        self.session.close()
+
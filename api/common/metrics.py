@@ -0,0 +1,403 @@
+"""
+Request metrics in the Prometheus text format.
+
+Threads record their samples without taking locks and the samples are only
+added up when `/metrics` is scraped. Gunicorn runs multiple worker processes
+and a scrape is served by one of them, so every worker regularly writes its
+samples to a file and the worker serving the scrape adds up the files of all
+running workers.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+
+# upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Metrics:
+    """
+    Counters, gauges and histograms of one worker process.
+
+    Every thread updates its own samples, so recording a value is a couple of
+    dict operations. Samples are keyed by metric name and label values, e.g.
+    `metrics.inc("http_requests_total", endpoint="/api/", status="200")`; keep
+    the labels in the same order for the same metric.
+
+    Parameters
+    ----------
+    directory: str
+        Folder to share the samples of worker processes in. None for a
+        single process.
+    interval: float
+        Minimum number of seconds between writing the samples to the folder.
+    """
+
+    def __init__(self, directory=None, interval=1.0):
+        self.directory = directory
+        self.interval = interval
+        # name -> (type, description, histogram buckets)
+        self.descriptions = {}
+        self.collectors = []
+        self.published = 0.0
+        self._local = threading.local()
+        self._threads = []
+        self._lock = threading.Lock()
+        # a forked worker starts without the samples of its parent
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def counter(self, name, description):
+        """Declare a value that only goes up, e.g. the number of requests."""
+        self.descriptions[name] = ("counter", description, None)
+
+    def gauge(self, name, description):
+        """Declare a value that goes up and down, e.g. requests in progress."""
+        self.descriptions[name] = ("gauge", description, None)
+
+    def histogram(self, name, description, buckets=LATENCY_BUCKETS):
+        """Declare a distribution of observed values, e.g. request durations."""
+        self.descriptions[name] = ("histogram", description, tuple(buckets))
+
+    def add_collector(self, collect):
+        """
+        Add a function that returns samples when the metrics are scraped, as
+        (name, labels, value) tuples with labels as a dict.
+        """
+        self.collectors.append(collect)
+
+    def inc(self, name, value=1, **labels):
+        """Increase a counter or gauge (decrease with a negative value)."""
+        samples = self._samples()
+        key = (name, tuple(labels.items()))
+        samples[key] = samples.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Add a value to a histogram."""
+        samples = self._samples()
+        key = (name, tuple(labels.items()))
+        buckets = self.descriptions[name][2]
+        counts = samples.get(key)
+        if counts is None:
+            # one count per bucket, one for +Inf and the sum of all values
+            counts = samples[key] = [0] * (len(buckets) + 2)
+        counts[bisect_left(buckets, value)] += 1
+        counts[-1] += value
+
+    def snapshot(self):
+        """
+        Add up the samples of all threads of this process.
+
+        Returns
+        -------
+        out: dict
+            Value, or list of histogram counts and sum, by (name, labels).
+        """
+        with self._lock:
+            threads = list(self._threads)
+        merged = {}
+        for samples in threads:
+            # copying a dict is atomic, iterating one that grows is not
+            add_samples(merged, samples.copy())
+        for collect in self.collectors:
+            add_samples(
+                merged,
+                {
+                    (name, tuple(labels.items())): value
+                    for name, labels, value in collect()
+                },
+            )
+        return merged
+
+    def publish(self, force=False):
+        """Write the samples of this process to the shared folder, at most every
+        `interval` seconds."""
+        now = time.monotonic()
+        if self.directory is None or (
+            not force and now - self.published < self.interval
+        ):
+            return
+        self.published = now
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(os.getpid())
+        # other threads of this process may be publishing at the same time
+        temporary = "{}.{}.tmp".format(path, threading.get_ident())
+        with open(temporary, "w") as f:
+            json.dump(
+                [
+                    [name, labels, value]
+                    for (name, labels), value in self.snapshot().items()
+                ],
+                f,
+            )
+        os.replace(temporary, path)
+
+    def collect(self):
+        """Add up the samples of this process and of the other running workers."""
+        merged = self.snapshot()
+        if self.directory is None or not os.path.isdir(self.directory):
+            return merged
+
+        for filename in os.listdir(self.directory):
+            pid, extension = os.path.splitext(filename)
+            if extension != ".json" or not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            path = os.path.join(self.directory, filename)
+            if not is_running(int(pid)):
+                # the samples of stopped workers are gone, like after a restart
+                remove(path)
+                continue
+            try:
+                with open(path, "r") as f:
+                    published = json.load(f)
+            except (OSError, ValueError):
+                continue
+            add_samples(
+                merged,
+                {
+                    (name, tuple(tuple(label) for label in labels)): value
+                    for name, labels, value in published
+                },
+            )
+        return merged
+
+    def render(self):
+        """Return the metrics of all workers in the Prometheus text format."""
+        by_name = {}
+        for (name, labels), value in sorted(self.collect().items(), key=sort_key):
+            by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name, samples in by_name.items():
+            kind, description, buckets = self.descriptions.get(
+                name, ("untyped", None, None)
+            )
+            if description:
+                lines.append("# HELP {} {}".format(name, description))
+            lines.append("# TYPE {} {}".format(name, kind))
+            for labels, value in samples:
+                if kind != "histogram":
+                    lines.append(format_sample(name, labels, value))
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ("+Inf",), value[:-1]):
+                    cumulative += count
+                    lines.append(
+                        format_sample(
+                            name + "_bucket", labels + (("le", str(bound)),), cumulative
+                        )
+                    )
+                lines.append(format_sample(name + "_sum", labels, value[-1]))
+                lines.append(format_sample(name + "_count", labels, cumulative))
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        """Remove all samples of this process."""
+        self._reset()
+        if self.directory is not None:
+            remove(self._path(os.getpid()))
+
+    def _samples(self):
+        samples = getattr(self._local, "samples", None)
+        if samples is None:
+            samples = self._local.samples = {}
+            with self._lock:
+                self._threads.append(samples)
+        return samples
+
+    def _reset(self):
+        self._local = threading.local()
+        self._threads = []
+        self._lock = threading.Lock()
+        self.published = 0.0
+
+    def _path(self, pid):
+        return os.path.join(self.directory, "{}.json".format(pid))
+
+
+def add_samples(merged, samples):
+    """Add samples to the merged samples of other threads or processes."""
+    for key, value in samples.items():
+        if isinstance(value, list):
+            total = merged.get(key)
+            merged[key] = (
+                list(value) if total is None else [a + b for a, b in zip(total, value)]
+            )
+        else:
+            merged[key] = merged.get(key, 0) + value
+
+
+def sort_key(item):
+    (name, labels), _ = item
+    return name, [(key, str(value)) for key, value in labels]
+
+
+def format_sample(name, labels, value):
+    if not labels:
+        return "{} {}".format(name, value)
+    return "{}{{{}}} {}".format(
+        name,
+        ",".join('{}="{}"'.format(key, escape(value)) for key, value in labels),
+        value,
+    )
+
+
+def escape(value):
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def instrument(app, metrics, path="/metrics"):
+    """
+    Record the number, duration and size of the responses of a Flask app, by
+    url rule, and serve the metrics.
+
+    Parameters
+    ----------
+    app: Flask
+        App to instrument.
+    metrics: Metrics
+        Metrics to record to.
+    path: str
+        Url to serve the metrics on.
+    """
+    metrics.counter("http_requests_total", "Number of responses.")
+    metrics.gauge("http_requests_in_flight", "Number of requests being handled.")
+    metrics.histogram(
+        "http_request_duration_seconds", "Time to create a response.", LATENCY_BUCKETS
+    )
+    metrics.histogram(
+        "http_response_size_bytes", "Size of the response bodies.", SIZE_BUCKETS
+    )
+
+    @app.before_request
+    def start_request():
+        # the url rule, not the url, so that the number of labels is bounded
+        rule = request.url_rule
+        rule = rule.rule if rule is not None else "unmatched"
+        g.metrics_request = (time.perf_counter(), rule)
+        metrics.inc("http_requests_in_flight", endpoint=rule)
+
+    @app.after_request
+    def record_response(response):
+        started = g.pop("metrics_request", None)
+        if started is None:
+            return response
+        start, rule = started
+        # done before publishing, so published samples don't count this request
+        metrics.inc("http_requests_in_flight", -1, endpoint=rule)
+        metrics.inc(
+            "http_requests_total",
+            endpoint=rule,
+            method=request.method,
+            status=response.status_code,
+        )
+        metrics.observe(
+            "http_request_duration_seconds",
+            time.perf_counter() - start,
+            endpoint=rule,
+        )
+        # streamed responses have no known size
+        if not response.is_streamed:
+            metrics.observe(
+                "http_response_size_bytes",
+                response.calculate_content_length(),
+                endpoint=rule,
+            )
+        metrics.publish()
+        return response
+
+    @app.teardown_request
+    def finish_request(error):
+        # when no response was created
+        started = g.pop("metrics_request", None)
+        if started is not None:
+            metrics.inc("http_requests_in_flight", -1, endpoint=started[1])
+
+    app.add_url_rule(
+        path,
+        "metrics",
+        lambda: Response(metrics.render(), content_type=CONTENT_TYPE),
+    )
+
+
+def monitor_cache(metrics, cache, name="cache"):
+    """Report the counters of an `LRUCache` when the metrics are scraped."""
+    for key, kind, description in [
+        ("hits", "counter", "Number of lookups that found a value."),
+        ("misses", "counter", "Number of lookups that found no value."),
+        ("evictions", "counter", "Number of values removed to free space."),
+        ("entries", "gauge", "Number of cached values."),
+        ("bytes", "gauge", "Size of the cached values."),
+    ]:
+        suffix = "_total" if kind == "counter" else ""
+        getattr(metrics, kind)("{}_{}{}".format(name, key, suffix), description)
+
+    def collect():
+        stats = cache.stats()
+        return [
+            ("{}_{}_total".format(name, key), {}, stats[key])
+            for key in ["hits", "misses", "evictions"]
+        ] + [
+            ("{}_{}".format(name, key), {}, stats[key]) for key in ["entries", "bytes"]
+        ]
+
+    metrics.add_collector(collect)
+
+
+def monitor_outbox(metrics, outbox, name="mailchimp_outbox"):
+    """
+    Report the queue depth and the counters of a `MailchimpOutbox` when the
+    metrics are scraped.
+
+    Workers share the outbox file, so only the worker that drains it reports
+    the depth. Every worker reports its own counters.
+    """
+    metrics.gauge("{}_updates".format(name), "Number of queued updates by status.")
+    for key, description in [
+        ("enqueued", "Number of updates added to the outbox."),
+        ("delivered", "Number of updates Mailchimp processed without error."),
+        ("errored", "Number of updates Mailchimp rejected, not retried."),
+        ("failed", "Number of updates given up on after too many attempts."),
+        ("retries", "Number of times an update was scheduled to be sent again."),
+        ("batches", "Number of batches sent to Mailchimp."),
+    ]:
+        metrics.counter("{}_{}_total".format(name, key), description)
+
+    def collect():
+        stats = outbox.stats()
+        samples = [
+            ("{}_{}_total".format(name, key), {}, value)
+            for key, value in stats["counters"].items()
+        ]
+        if outbox.lock_file is not None:
+            samples += [
+                ("{}_updates".format(name), {"status": status}, stats[status])
+                for status in ["pending", "sent", "failed"]
+            ]
+        return samples
+
+    metrics.add_collector(collect)
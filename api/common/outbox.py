@@ -0,0 +1,447 @@
+import fcntl
+import io
+import json
+import logging
+import os
+import random
+import sqlite3
+import tarfile
+import threading
+import time
+import uuid
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    email TEXT NOT NULL,
+    method TEXT NOT NULL,
+    path TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    batch_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    finished REAL,
+    UNIQUE (email, key)
+);
+CREATE INDEX IF NOT EXISTS outbox_email ON outbox (email, status, id);
+CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, batch_id);
+"""
+
+# the first operation of every email that is not waiting for an earlier one,
+# so that the operations of one email are delivered in order
+SELECT_NEXT = """
+SELECT id, method, path, body FROM outbox AS o
+WHERE status = 'pending' AND next_attempt <= ? AND id = (
+    SELECT MIN(id) FROM outbox
+    WHERE email = o.email AND status IN ('pending', 'sent')
+)
+ORDER BY id LIMIT ?
+"""
+
+
+class MailchimpOutbox:
+    """
+    Persistent queue of Mailchimp updates, delivered in batches in the
+    background.
+
+    Requests add their Mailchimp updates to a SQLite database and respond
+    without waiting for Mailchimp. A drainer thread sends the queued updates
+    with Mailchimp's batch operations endpoint and retries failed batches
+    with backoff. Every update has a key that is unique per email, which is
+    used to ignore duplicates. Updates that Mailchimp processed are kept
+    without their contents for a while, so that their keys still ignore
+    repeated requests after delivery.
+
+    The updates of one email are sent in order: a batch holds at most one
+    update per email, and the next update of an email is only sent once
+    the batch with the previous one has finished.
+
+    Operations of a finished batch that failed with rate limiting or a
+    server error are sent again, like failed batches. Other failed
+    operations are dropped.
+
+    Worker processes can share an outbox file. Only one of them drains it
+    at a time.
+
+    Parameters
+    ----------
+    path: str
+        Path of the SQLite database.
+    client: MailchimpClient
+        Client to send the batches with.
+    batch_size: int
+        Maximum number of updates per batch.
+    interval: float
+        Seconds between checks for new updates and finished batches.
+    max_attempts: int
+        Number of times to try sending an update before giving up on it.
+    backoff: float
+        Base delay in seconds before retrying a failed batch, doubled for
+        every attempt.
+    key_ttl: float
+        Seconds to remember the keys of updates that Mailchimp processed.
+    """
+
+    def __init__(
+        self,
+        path,
+        client,
+        batch_size=500,
+        interval=1.0,
+        max_attempts=8,
+        backoff=5.0,
+        key_ttl=24 * 3600,
+    ):
+        self.path = path
+        self.client = client
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.key_ttl = key_ttl
+
+        self.local = threading.local()
+        self.thread = None
+        self.thread_lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.lock_file = None
+        self.counters_lock = threading.Lock()
+        self.counters = {
+            "enqueued": 0,
+            "delivered": 0,
+            "errored": 0,
+            "failed": 0,
+            "retries": 0,
+            "batches": 0,
+        }
+        # not kept open, connections can't be shared with forked processes
+        connection = sqlite3.connect(path)
+        with connection:
+            connection.executescript(SCHEMA)
+        connection.close()
+
+    def connection(self):
+        """Return a connection for the current thread and process."""
+        if getattr(self.local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def enqueue(self, email, method, path, body, key=None):
+        """
+        Add an update to the outbox.
+
+        Parameters
+        ----------
+        email: str
+            Email of the member the update is for.
+        method: str
+            HTTP method of the update.
+        path: str
+            Path relative to the Mailchimp API url.
+        body: dict
+            JSON body of the update.
+        key: str
+            Idempotency key. Updates with a key that is already in the outbox
+            for the same email are ignored, also up to `key_ttl` seconds
+            after they were delivered. Defaults to a random key.
+
+        Returns
+        -------
+        out: str
+            Idempotency key of the update.
+        """
+        key = key or uuid.uuid4().hex
+        cursor = self.connection().execute(
+            "INSERT OR IGNORE INTO outbox (key, email, method, path, body, created)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (key, email.lower(), method, path, json.dumps(body), time.time()),
+        )
+        self.count("enqueued", cursor.rowcount)
+        self.start()
+        return key
+
+    def start(self):
+        """Start the drainer thread of this process, if not running yet."""
+        with self.thread_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stopping.clear()
+                self.thread = threading.Thread(
+                    target=self.run, name="mailchimp-outbox", daemon=True
+                )
+                self.thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the drainer thread."""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def flush(self):
+        """
+        Stop the drainer thread and send all queued updates, e.g. before the
+        process exits. Updates waiting for a retry are sent right away.
+
+        Only the process that drains the outbox file sends the updates. It
+        logs the updates that are left, which are lost if the file is.
+
+        Returns
+        -------
+        out: int
+            Number of updates sent.
+        """
+        self.stop()
+        if not self.acquire_drainer_lock():
+            return 0
+        self.connection().execute(
+            "UPDATE outbox SET next_attempt = 0 WHERE status = 'pending'"
+        )
+        sent = 0
+        while True:
+            n_sent = self.drain_once()
+            if not n_sent:
+                break
+            sent += n_sent
+        stats = self.stats()
+        if stats["pending"] or stats["sent"]:
+            logger.warning(
+                "%s Mailchimp updates are still pending and %s are in batches"
+                " that haven't finished",
+                stats["pending"],
+                stats["sent"],
+            )
+        return sent
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            if not self.acquire_drainer_lock():
+                continue
+            try:
+                while self.drain_once() and not self.stopping.is_set():
+                    pass
+            except Exception:
+                logger.exception("Draining the Mailchimp outbox failed")
+
+    def acquire_drainer_lock(self):
+        """Try to become the process that drains the outbox file."""
+        if self.lock_file is None:
+            lock_file = open(self.path + ".lock", "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            self.lock_file = lock_file
+        return True
+
+    def drain_once(self):
+        """
+        Check the batches that were sent and send the next batch.
+
+        Returns
+        -------
+        out: int
+            Number of updates sent.
+        """
+        self.check_batches()
+
+        rows = self.connection().execute(SELECT_NEXT, (time.time(), self.batch_size))
+        rows = rows.fetchall()
+        if not rows:
+            return 0
+
+        # the row id is unique in the batch, keys are only unique per email
+        operations = [
+            {"method": method, "path": path, "body": body, "operation_id": str(row_id)}
+            for row_id, method, path, body in rows
+        ]
+        ids = [row[0] for row in rows]
+        try:
+            response = self.client.request(
+                "POST", "/batches", json={"operations": operations}
+            )
+            response.raise_for_status()
+            batch_id = response.json()["id"]
+        except Exception as error:
+            logger.warning("Sending %s Mailchimp updates failed: %s", len(ids), error)
+            self.retry(ids)
+            return 0
+
+        self.update(ids, "UPDATE outbox SET status = 'sent', batch_id = ?", batch_id)
+        self.count("batches")
+        logger.info("Sent %s Mailchimp updates in batch %s", len(ids), batch_id)
+        return len(ids)
+
+    def check_batches(self):
+        """
+        Mark the updates of finished batches as processed, and forget the
+        processed updates that are older than `key_ttl`.
+        """
+        self.connection().execute(
+            "DELETE FROM outbox WHERE status IN ('delivered', 'errored')"
+            " AND finished < ?",
+            (time.time() - self.key_ttl,),
+        )
+        batch_ids = self.connection().execute(
+            "SELECT DISTINCT batch_id FROM outbox WHERE status = 'sent'"
+        )
+        for (batch_id,) in batch_ids.fetchall():
+            try:
+                response = self.client.request("GET", "/batches/" + batch_id)
+            except Exception as error:
+                logger.warning("Checking Mailchimp batch %s failed: %s", batch_id, error)
+                continue
+
+            ids = [
+                row_id
+                for (row_id,) in self.connection().execute(
+                    "SELECT id FROM outbox WHERE batch_id = ? AND status = 'sent'",
+                    (batch_id,),
+                )
+            ]
+            if not ids:
+                continue
+            # the batch was lost, send its updates again
+            if response.status_code == 404:
+                self.retry(ids)
+            elif response.ok and response.json().get("status") == "finished":
+                batch = response.json()
+                statuses = {}
+                if batch.get("errored_operations", 0):
+                    try:
+                        statuses = self.read_results(batch["response_body_url"])
+                    except Exception as error:
+                        # check the batch again later
+                        logger.warning(
+                            "Reading the results of Mailchimp batch %s failed: %s",
+                            batch_id,
+                            error,
+                        )
+                        continue
+                delivered, errored, retry_ids = [], [], []
+                for row_id in ids:
+                    status = statuses.get(str(row_id), 200)
+                    if status < 400:
+                        delivered.append(row_id)
+                    elif is_transient(status):
+                        retry_ids.append(row_id)
+                    else:
+                        errored.append(row_id)
+                if errored or retry_ids:
+                    logger.error(
+                        "%s of %s updates in Mailchimp batch %s failed, "
+                        "retrying %s, see %s",
+                        len(errored) + len(retry_ids),
+                        len(ids),
+                        batch_id,
+                        len(retry_ids),
+                        batch["response_body_url"],
+                    )
+                self.retry(retry_ids)
+                # keep the keys of processed updates, but not their contents
+                for status, status_ids in [
+                    ("delivered", delivered),
+                    ("errored", errored),
+                ]:
+                    self.update(
+                        status_ids,
+                        "UPDATE outbox SET status = ?, body = '', finished = ?",
+                        status,
+                        time.time(),
+                    )
+                    self.count(status, len(status_ids))
+
+    def read_results(self, url):
+        """
+        Download the results of a finished batch.
+
+        Parameters
+        ----------
+        url: str
+            The `response_body_url` of the batch, a gzipped tar archive of
+            JSON files with the results of the operations.
+
+        Returns
+        -------
+        out: dict
+            HTTP status code of every operation, by operation id.
+        """
+        # a presigned url, which doesn't accept the Mailchimp credentials
+        response = requests.get(url, timeout=self.client.timeout)
+        response.raise_for_status()
+        statuses = {}
+        with tarfile.open(fileobj=io.BytesIO(response.content), mode="r:gz") as tar:
+            for member in tar.getmembers():
+                if member.isfile():
+                    for result in json.load(tar.extractfile(member)):
+                        statuses[result["operation_id"]] = result["status_code"]
+        return statuses
+
+    def retry(self, ids):
+        """Schedule updates to be sent again, or give up after too many attempts."""
+        if not ids:
+            return
+        connection = self.connection()
+        for row_id, attempts in connection.execute(
+            "SELECT id, attempts FROM outbox WHERE id IN ({})".format(
+                ",".join("?" * len(ids))
+            ),
+            ids,
+        ).fetchall():
+            attempts += 1
+            if attempts >= self.max_attempts:
+                status = "failed"
+                logger.error("Giving up on Mailchimp update %s", row_id)
+            else:
+                status = "pending"
+            self.count("failed" if status == "failed" else "retries")
+            delay = random.uniform(0, self.backoff * 2 ** attempts)
+            connection.execute(
+                "UPDATE outbox SET status = ?, batch_id = NULL, attempts = ?,"
+                " next_attempt = ? WHERE id = ?",
+                (status, attempts, time.time() + delay, row_id),
+            )
+
+    def count(self, name, n=1):
+        with self.counters_lock:
+            self.counters[name] += n
+
+    def update(self, ids, statement, *parameters):
+        """Run an UPDATE or DELETE statement on the rows with the given ids."""
+        if not ids:
+            return
+        self.connection().execute(
+            "{} WHERE id IN ({})".format(statement, ",".join("?" * len(ids))),
+            parameters + tuple(ids),
+        )
+
+    def stats(self):
+        """Return the queue depth per status and the counters of this process."""
+        depth = dict(
+            self.connection()
+            .execute("SELECT status, COUNT(*) FROM outbox GROUP BY status")
+            .fetchall()
+        )
+        with self.counters_lock:
+            counters = dict(self.counters)
+        return {
+            "pending": depth.get("pending", 0),
+            "sent": depth.get("sent", 0),
+            "failed": depth.get("failed", 0),
+            "counters": counters,
+        }
+
+
+def is_transient(status):
+    """Whether an operation that failed with this status may succeed later."""
+    return status == 429 or status >= 500
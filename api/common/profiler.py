@@ -0,0 +1,231 @@
+"""
+Statistical profiler for finding slow code under real load.
+
+While running, a background thread looks at the stacks of the threads that
+handle sampled requests every few milliseconds, and counts how often every
+stack is seen per endpoint. Requests are not slowed down by tracing every
+function call like cProfile, and the profiler costs nothing while stopped.
+
+The counts are written in the collapsed stack format, one line per stack
+with the frames separated by semicolons and the number of samples, which
+`flamegraph.pl` and https://www.speedscope.app/ turn into flame graphs.
+"""
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import Response, abort, request
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of the threads handling requests of one worker.
+
+    Parameters
+    ----------
+    directory: str
+        Folder to write the collapsed stacks to.
+    interval: float
+        Seconds between samples.
+    fraction: float
+        Default fraction of the requests to profile.
+    """
+
+    def __init__(self, directory, interval=0.005, fraction=0.1):
+        self.directory = directory
+        self.interval = interval
+        self.fraction = fraction
+        self.running = False
+        self.deadline = None
+        # thread id -> endpoint of the sampled requests in progress
+        self.active = {}
+        # endpoint -> Counter of stacks
+        self.stacks = {}
+        self.n_samples = 0
+        self.labels = {}
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self, fraction=None, seconds=None):
+        """
+        Start profiling, in the background.
+
+        Parameters
+        ----------
+        fraction: float
+            Fraction of the requests to profile. Defaults to `self.fraction`.
+        seconds: float
+            Stop and write the stacks after this many seconds. None to keep
+            profiling until `stop` is called.
+        """
+        with self.lock:
+            if fraction is not None:
+                self.fraction = fraction
+            self.deadline = None if seconds is None else time.monotonic() + seconds
+            if self.running:
+                return
+            self.running = True
+            self.stacks = {}
+            self.n_samples = 0
+            self.thread = threading.Thread(
+                target=self.run, name="profiler", daemon=True
+            )
+            self.thread.start()
+        logger.info("Profiling %.0f%% of the requests", self.fraction * 100)
+
+    def stop(self):
+        """
+        Stop profiling and write the stacks.
+
+        Returns
+        -------
+        out: list
+            Paths of the written files, one per endpoint.
+        """
+        with self.lock:
+            if not self.running:
+                return []
+            self.running = False
+            thread = self.thread
+        if thread is not threading.current_thread():
+            thread.join()
+        return self.write()
+
+    def toggle(self, *args):
+        """Start or stop profiling, e.g. as a signal handler."""
+        # a signal handler runs in the main thread, in between any two
+        # statements, so taking a lock there that the main thread might hold,
+        # like `self.lock` or a logging lock, could deadlock
+        target = self.stop if self.running else self.start
+        threading.Thread(target=target, daemon=True).start()
+
+    def begin(self, endpoint):
+        """Sample the current request, with a probability of `fraction`."""
+        if self.running and random.random() < self.fraction:
+            self.active[threading.get_ident()] = endpoint
+
+    def end(self):
+        """Stop sampling the current request."""
+        self.active.pop(threading.get_ident(), None)
+
+    def run(self):
+        """Take samples until stopped or the deadline has passed."""
+        while self.running:
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                self.stop()
+                return
+            self.sample()
+            time.sleep(self.interval)
+
+    def sample(self):
+        """Count the current stack of every sampled request."""
+        if not self.active:
+            return
+        frames = sys._current_frames()
+        for thread_id, endpoint in list(self.active.items()):
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self.label(frame.f_code))
+                frame = frame.f_back
+            self.stacks.setdefault(endpoint, Counter())[tuple(reversed(stack))] += 1
+            self.n_samples += 1
+
+    def label(self, code):
+        """Name of a function in a stack, cached because codes are reused."""
+        label = self.labels.get(code)
+        if label is None:
+            path = code.co_filename.replace(os.sep, "/").split("/")
+            label = self.labels[code] = "{} ({}:{})".format(
+                code.co_name, "/".join(path[-2:]), code.co_firstlineno
+            ).replace(";", ",")
+        return label
+
+    def write(self):
+        """Write the collapsed stacks of every endpoint, and return the paths."""
+        os.makedirs(self.directory, exist_ok=True)
+        paths = []
+        for endpoint, counts in self.stacks.items():
+            name = re.sub(r"[^A-Za-z0-9]+", "_", endpoint).strip("_") or "root"
+            path = os.path.join(
+                self.directory, "{}.{}.collapsed".format(name, os.getpid())
+            )
+            with open(path, "w") as f:
+                for stack, count in counts.most_common():
+                    f.write("{} {}\n".format(";".join(stack), count))
+            paths.append(path)
+        logger.info("Wrote %d samples to %s", self.n_samples, paths)
+        return paths
+
+    def status(self):
+        """Return the state of the profiler as a dict."""
+        return {
+            "pid": os.getpid(),
+            "running": self.running,
+            "fraction": self.fraction,
+            "samples": self.n_samples,
+        }
+
+
+def profile_requests(app, profiler, token=None, path="/admin/profiler"):
+    """
+    Sample requests of a Flask app by url rule, while the profiler is running.
+
+    Parameters
+    ----------
+    app: Flask
+        App to profile.
+    profiler: SamplingProfiler
+        Profiler of this worker.
+    token: str
+        Secret to control the profiler with requests to `path`:
+        GET for the status, POST to start (optional `fraction` and `seconds`
+        arguments) and DELETE to stop and write the stacks. Without a token
+        the profiler can only be controlled with a signal, see `toggle`.
+    path: str
+        Url to control the profiler on.
+    """
+
+    @app.before_request
+    def begin_sample():
+        if profiler.running:
+            rule = request.url_rule
+            profiler.begin(rule.rule if rule is not None else "unmatched")
+
+    @app.teardown_request
+    def end_sample(error):
+        if profiler.active:
+            profiler.end()
+
+    if token is None:
+        return
+
+    def control():
+        authorization = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(authorization, "Bearer " + token):
+            abort(403)
+        if request.method == "POST":
+            profiler.start(
+                fraction=request.args.get("fraction", type=float),
+                seconds=request.args.get("seconds", type=float),
+            )
+            status = profiler.status()
+        elif request.method == "DELETE":
+            files = profiler.stop()
+            status = dict(profiler.status(), files=files)
+        else:
+            status = profiler.status()
+        return Response(json.dumps(status), mimetype="application/json")
+
+    app.add_url_rule(path, "profiler", control, methods=["GET", "POST", "DELETE"])
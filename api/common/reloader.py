@@ -0,0 +1,145 @@
+import logging
+import os
+import threading
+import time
+import weakref
+
+from common.catalog import Catalog
+from common.snapshot import get_current_version, read_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class LiveCatalog:
+    """
+    Reference to the catalog of the current snapshot, replaced without a
+    restart when a new snapshot is published.
+
+    The new catalog is built in a background thread and then swapped in with
+    a single assignment. Resources read `catalog` once when they are created
+    for a request, so requests in progress finish with the catalog they
+    started with, and the old catalog is freed when the last of them is done.
+
+    Parameters
+    ----------
+    catalog: Catalog
+        Catalog to serve until a new snapshot is published.
+    snapshot_dir: str
+        Folder with the snapshot versions and the CURRENT file pointing to the
+        version to serve, see `common.snapshot`.
+    caches: list
+        Caches with results of the catalog, e.g. `LRUCache`, whose version is
+        set to the version of the new catalog, dropping the old results.
+    interval: float
+        Seconds between checks for a new snapshot.
+    """
+
+    def __init__(self, catalog, snapshot_dir=None, caches=(), interval=30.0):
+        self.catalog = catalog
+        self.snapshot_dir = snapshot_dir
+        self.caches = list(caches)
+        self.interval = interval
+        self.thread = None
+        self.thread_lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def check(self):
+        """
+        Load the current snapshot if it is not the version being served.
+
+        Returns
+        -------
+        out: bool
+            Whether a new catalog was swapped in.
+        """
+        version = get_current_version(self.snapshot_dir)
+        if version is None or version == self.catalog.version:
+            return False
+        return self.reload(version)
+
+    def reload(self, version):
+        """Build the catalog of a snapshot version and swap it in."""
+        with self.reload_lock:
+            if version == self.catalog.version:
+                return False
+            start = time.perf_counter()
+            memory_before = resident_memory()
+            df, df_features, df_feature_types, version = read_snapshot(
+                self.snapshot_dir, version
+            )
+            catalog = Catalog(df, df_features, df_feature_types, version=version)
+            built = time.perf_counter()
+            memory_both = resident_memory()
+
+            old = self.catalog
+            self.catalog = catalog
+            for cache in self.caches:
+                cache.set_version(catalog.version)
+            swapped = time.perf_counter()
+
+        logger.info(
+            "Swapped catalog %s for %s: built in %.2f s, swapped in %.2f ms, "
+            "memory %s MB with both catalogs loaded (%s MB before)",
+            old.version,
+            catalog.version,
+            built - start,
+            (swapped - built) * 1000,
+            format_megabytes(memory_both),
+            format_megabytes(memory_before),
+        )
+        # requests in progress keep the old catalog until they are done
+        log_release(old, swapped)
+        return True
+
+    def start(self):
+        """Start checking for new snapshots in the background."""
+        if self.snapshot_dir is None or self.interval <= 0:
+            return
+        with self.thread_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stopping.clear()
+                self.thread = threading.Thread(
+                    target=self.run, name="catalog-reloader", daemon=True
+                )
+                self.thread.start()
+
+    def stop(self, timeout=None):
+        """Stop checking for new snapshots."""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                # keep serving the current catalog, e.g. when a snapshot is incomplete
+                logger.exception("Reloading the catalog failed")
+
+
+def log_release(catalog, swapped):
+    """Log when a replaced catalog is freed, after the last request using it."""
+    version = catalog.version
+    weakref.finalize(
+        catalog,
+        lambda: logger.info(
+            "Released catalog %s %.2f s after the swap",
+            version,
+            time.perf_counter() - swapped,
+        ),
+    )
+
+
+def resident_memory():
+    """Return the memory used by this process in bytes, or None if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def format_megabytes(n_bytes):
+    return "unknown" if n_bytes is None else "{:.0f}".format(n_bytes / 2 ** 20)
@@ -0,0 +1,115 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# see src/stairway/sources/wikivoyage/snapshot.py for how snapshots are written
+SNAPSHOT_FORMAT = 1
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+
+def get_current_version(snapshot_dir):
+    """Return the current snapshot version, or None if there is no snapshot."""
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def read_manifest(snapshot_dir, version=None):
+    """
+    Read the manifest of a snapshot version.
+
+    Parameters
+    ----------
+    snapshot_dir: str
+        Folder containing all snapshot versions.
+    version: str
+        Snapshot version to read. Defaults to the current version.
+
+    Returns
+    -------
+    out: dict
+        Manifest with the tables, columns and files of the snapshot.
+    """
+    version = version or get_current_version(snapshot_dir)
+    if version is None:
+        raise FileNotFoundError(f"No current snapshot in {snapshot_dir}")
+    with open(os.path.join(snapshot_dir, version, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest["format"] != SNAPSHOT_FORMAT:
+        raise ValueError(
+            f"Unsupported snapshot format {manifest['format']} in {version}"
+        )
+    return manifest
+
+
+def load_array(snapshot_dir, manifest, file_name):
+    """Memory-map one array of a snapshot read-only."""
+    return np.load(
+        os.path.join(snapshot_dir, manifest["version"], file_name), mmap_mode="r"
+    )
+
+
+def load_column(snapshot_dir, manifest, column):
+    """Load one column of a table, with NaN for missing text values."""
+    values = load_array(snapshot_dir, manifest, column["file"])
+    if "missing" in column:
+        values = values.astype(object)
+        values[load_array(snapshot_dir, manifest, column["missing"])] = np.nan
+    return values
+
+
+def load_table(snapshot_dir, manifest, table):
+    """
+    Load a table that is stored as one array per column into a DataFrame.
+
+    The DataFrame holds a copy of the columns: pandas combines the columns of
+    a type into one block, and text columns become Python strings.
+    """
+    columns = manifest["tables"][table]["columns"]
+    return pd.DataFrame(
+        {
+            column["name"]: load_column(snapshot_dir, manifest, column)
+            for column in columns
+        },
+        columns=[column["name"] for column in columns],
+    )
+
+
+def read_snapshot(snapshot_dir, version=None):
+    """
+    Read the API data from a binary snapshot.
+
+    Parameters
+    ----------
+    snapshot_dir: str
+        Folder containing all snapshot versions.
+    version: str
+        Snapshot version to read. Defaults to the current version.
+
+    Returns
+    -------
+    out: tuple
+        The destinations, features and feature types DataFrames, as they
+        would be read from the CSV files, and the snapshot version.
+    """
+    manifest = read_manifest(snapshot_dir, version)
+
+    df = load_table(snapshot_dir, manifest, "destinations").set_index(
+        "id", drop=False
+    )
+    features = manifest["tables"]["features"]
+    df_features = pd.DataFrame(
+        load_array(snapshot_dir, manifest, features["file"]),
+        index=pd.Index(df["id"].values, name="id"),
+        columns=features["columns"],
+        # keep the float32 scores memory-mapped, see `aligned_scores`
+        copy=False,
+    )
+    df_feature_types = load_table(snapshot_dir, manifest, "feature_types")
+
+    return df, df_features, df_feature_types, manifest["version"]
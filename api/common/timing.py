@@ -0,0 +1,163 @@
+"""
+Durations of the stages of a request, reported in a Server-Timing header and
+in a log of slow requests.
+
+Stages are timed with `span`, which does nothing unless the app records
+timings with `record_timings`, so that functions like
+`resources.explore.select_places` can be timed without depending on a request.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+
+class Recording(threading.local):
+    """Spans of the request handled by a thread, None when not recording."""
+
+    # class attributes, as looking up a missing attribute is slow
+    spans = None
+    start = 0.0
+
+
+_local = Recording()
+
+
+class Span:
+    """Adds the time spent inside a `with` block to the spans of a request."""
+
+    __slots__ = ("spans", "name", "start")
+
+    def __init__(self, spans, name):
+        self.spans = spans
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        # stages that run more than once are added up
+        self.spans[self.name] = (
+            self.spans.get(self.name, 0.0) + time.perf_counter() - self.start
+        )
+        return False
+
+
+class NullSpan:
+    """Span that records nothing, when timings are not recorded."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name):
+    """
+    Time a stage of the current request.
+
+    Parameters
+    ----------
+    name: str
+        Name of the stage, a token like 'select' or 'render'.
+
+    Returns
+    -------
+    out: context manager
+        Records the time spent in the `with` block, or does nothing when
+        timings are not recorded.
+
+    Examples
+    --------
+    >>> with span("features"):
+    ...     features = catalog.features.top_features_json(page, profiles)
+    """
+    spans = _local.spans
+    if spans is None:
+        return NULL_SPAN
+    return Span(spans, name)
+
+
+@contextmanager
+def recording():
+    """Record the spans inside the block, e.g. in benchmarks, and yield them."""
+    previous = _local.spans
+    _local.spans = spans = {}
+    try:
+        yield spans
+    finally:
+        _local.spans = previous
+
+
+def server_timing(spans, total):
+    """Format spans as a Server-Timing header value, in milliseconds."""
+    return ", ".join(
+        "{};dur={:.2f}".format(name, seconds * 1000)
+        for name, seconds in list(spans.items()) + [("total", total)]
+    )
+
+
+def record_timings(app, header=True, slow_threshold=None):
+    """
+    Record the spans of every request of a Flask app.
+
+    Parameters
+    ----------
+    app: Flask
+        App to record the timings of.
+    header: bool
+        Whether to add a Server-Timing header to every response.
+    slow_threshold: float
+        Log the spans of requests that take longer than this many seconds.
+        None to not log slow requests.
+    """
+    if not header and slow_threshold is None:
+        return
+
+    @app.before_request
+    def start_spans():
+        _local.spans = {}
+        _local.start = time.perf_counter()
+
+    @app.after_request
+    def report_spans(response):
+        spans = _local.spans
+        if spans is None:
+            return response
+        total = time.perf_counter() - _local.start
+        if header:
+            response.headers["Server-Timing"] = server_timing(spans, total)
+        if slow_threshold is not None and total > slow_threshold:
+            logger.warning(
+                "Slow request: %s",
+                json.dumps(
+                    {
+                        "method": request.method,
+                        "path": request.path,
+                        "query": request.query_string.decode("utf-8", "replace"),
+                        "status": response.status_code,
+                        "total_ms": round(total * 1000, 2),
+                        "spans_ms": {
+                            name: round(seconds * 1000, 2)
+                            for name, seconds in spans.items()
+                        },
+                    }
+                ),
+            )
+        return response
+
+    @app.teardown_request
+    def stop_spans(error):
+        _local.spans = None
@@ -0,0 +1,50 @@
+"""
+Gunicorn settings for serving the API with multiple worker processes.
+
+The app is loaded once in the master process and the workers are forked from
+it, so that all workers share the destination data in memory instead of each
+loading their own copy. Python objects are kept out of the garbage collector
+before forking, because the collector would otherwise write to every object
+it visits and make the workers copy the memory pages they share.
+"""
+import gc
+import signal
+
+preload_app = True
+workers = 4
+threads = 8
+
+
+def when_ready(server):
+    import main
+
+    main.warm_up()
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    import main
+
+    # deliver Mailchimp updates that are still queued, e.g. from before a restart
+    if main.outbox is not None:
+        main.outbox.start()
+    # load new snapshots without restarting the workers
+    main.live_catalog.start()
+
+
+def worker_exit(server, worker):
+    import main
+
+    # send what is still queued, the outbox file in /tmp goes with the instance
+    if main.outbox is not None:
+        main.outbox.flush()
+
+
+def post_worker_init(worker):
+    import main
+
+    # `kill -USR2 <worker pid>` starts or stops profiling that worker; don't
+    # send it to the master, which upgrades gunicorn on USR2
+    signal.signal(signal.SIGUSR2, main.profiler.toggle)
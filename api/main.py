@@ -1,8 +1,22 @@
+import logging
+import os
+
 import pandas as pd
 from flask import Flask
 from flask_cors import CORS
 from flask_restful import Api
+from common.cache import LRUCache
+from common.catalog import Catalog
+from common.compression import ResponseCache
+from common.mailchimp import MailchimpClient
+from common.metrics import Metrics, instrument, monitor_cache, monitor_outbox
+from common.outbox import MailchimpOutbox
+from common.profiler import SamplingProfiler, profile_requests
+from common.reloader import LiveCatalog
+from common.snapshot import get_current_version, read_snapshot
+from common.timing import record_timings
 from resources.destination import Destination
+from resources.destinations import Destinations
 from resources.explore import Explore
 from resources.nearby import Nearby
 from resources.member import Member
@@ -22,62 +36,156 @@ CORS(
 )
 api = Api(app)
 
+logger = logging.getLogger(__name__)
+
 MAILCHIMP_KEY = "credentials/mailchimp-key.json"
+SNAPSHOT_DIR = os.environ.get("STAIRWAY_SNAPSHOT_DIR", "./data/snapshots")
+# seconds between checks for a new snapshot to load without restarting, 0 to not check
+RELOAD_INTERVAL = float(os.environ.get("STAIRWAY_RELOAD_INTERVAL", "30"))
+CACHE_BYTES = 64 * 2 ** 20
+# store gzip and brotli compressed variants of cacheable responses
+COMPRESSION = os.environ.get("STAIRWAY_COMPRESSION", "1") == "1"
+# App Engine only allows writing to /tmp, which lasts as long as the instance
+OUTBOX_PATH = os.environ.get("STAIRWAY_OUTBOX_PATH", "/tmp/stairway-outbox.sqlite3")
+# every worker shares its metrics in this folder, so any worker can report all
+METRICS_DIR = os.environ.get("STAIRWAY_METRICS_DIR", "/tmp/stairway-metrics")
+# add a Server-Timing header with the duration of every stage of a request
+SERVER_TIMING = os.environ.get("STAIRWAY_SERVER_TIMING", "0") == "1"
+# log the stages of requests that take longer than this many milliseconds
+SLOW_REQUEST_MS = os.environ.get("STAIRWAY_SLOW_REQUEST_MS")
+# the sampling profiler writes flame graph stacks here
+PROFILE_DIR = os.environ.get("STAIRWAY_PROFILE_DIR", "/tmp/stairway-profiles")
+# secret for starting and stopping the profiler with /admin/profiler
+PROFILER_TOKEN = os.environ.get("STAIRWAY_PROFILER_TOKEN")
 
-# load data once
-df = (
-    pd.read_csv("./data/wikivoyage_destinations.csv")
-    .set_index("id", drop=False)
+# request counts, durations and sizes per endpoint, served on /metrics
+metrics = Metrics(METRICS_DIR)
+instrument(app, metrics)
+record_timings(
+    app,
+    header=SERVER_TIMING,
+    slow_threshold=float(SLOW_REQUEST_MS) / 1000 if SLOW_REQUEST_MS else None,
 )
-df_features = pd.read_csv("./data/wikivoyage_features.csv").set_index("id")
-df_feature_types = pd.read_csv("./data/wikivoyage_features_types.csv")
+# samples the stacks of a fraction of the requests, only while switched on
+profiler = SamplingProfiler(PROFILE_DIR)
+profile_requests(app, profiler, token=PROFILER_TOKEN)
+
+# load data once, from the binary snapshot if there is one
+if get_current_version(SNAPSHOT_DIR):
+    df, df_features, df_feature_types, version = read_snapshot(SNAPSHOT_DIR)
+else:
+    df = (
+        pd.read_csv("./data/wikivoyage_destinations.csv")
+        .set_index("id", drop=False)
+    )
+    df_features = pd.read_csv("./data/wikivoyage_features.csv").set_index("id")
+    df_feature_types = pd.read_csv("./data/wikivoyage_features_types.csv")
+    version = None
+catalog = Catalog(df, df_features, df_feature_types, version=version)
+
+# ordered explore results, reused when scrolling through pages of a query,
+# and the bodies of deterministic responses
+cache = LRUCache(max_bytes=CACHE_BYTES)
+cache.set_version(catalog.version)
+responses = ResponseCache(cache, encodings=None if COMPRESSION else [])
+monitor_cache(metrics, cache)
+
+# swapped for the catalog of a new snapshot when it's published, dropping the
+# cached results of the old catalog
+live_catalog = LiveCatalog(catalog, SNAPSHOT_DIR, caches=[cache], interval=RELOAD_INTERVAL)
 
 # Api for fetching destinations
 api.add_resource(
     Destination,
     "/api/",
-    resource_class_kwargs={
-        "df": df,
-        "df_features": df_features,
-        "df_feature_types": df_feature_types,
-    },
+    resource_class_kwargs={"live_catalog": live_catalog, "responses": responses},
 )
 api.add_resource(
     Destination,
     "/api/<dest_id>",
     endpoint="dest_ep",
-    resource_class_kwargs={
-        "df": df,
-        "df_features": df_features,
-        "df_feature_types": df_feature_types,
-    },
+    resource_class_kwargs={"live_catalog": live_catalog, "responses": responses},
+)
+# Api for fetching many destinations in one request
+api.add_resource(
+    Destinations,
+    "/api/destinations",
+    resource_class_kwargs={"live_catalog": live_catalog, "responses": responses},
 )
 api.add_resource(
     Explore,
     "/api/explore/",
     resource_class_kwargs={
-        "df": df,
-        "df_features": df_features,
-        "df_feature_types": df_feature_types,
+        "live_catalog": live_catalog,
+        "cache": cache,
+        "responses": responses,
     },
 )
+api.add_resource(
+    Nearby,
+    "/api/nearby/",
+    resource_class_kwargs={"live_catalog": live_catalog, "responses": responses},
+)
 api.add_resource(
     Nearby,
     "/api/nearby/<dest_id>",
-    resource_class_kwargs={
-        "df": df,
-    },
+    endpoint="nearby_ep",
+    resource_class_kwargs={"live_catalog": live_catalog, "responses": responses},
 )
 
+# one Mailchimp client per worker, reusing connections between requests;
+# without a key, e.g. when developing locally, only signing up is unavailable
+if os.path.exists(MAILCHIMP_KEY):
+    mailchimp = MailchimpClient.from_key_file(MAILCHIMP_KEY, metrics=metrics)
+    # Mailchimp updates are queued and sent in batches in the background
+    outbox = MailchimpOutbox(OUTBOX_PATH, mailchimp)
+    monitor_outbox(metrics, outbox)
+else:
+    logger.warning("No Mailchimp key in %s, signing up is unavailable", MAILCHIMP_KEY)
+    mailchimp = outbox = None
+
 # Api for email signup form
 api.add_resource(
-    Signup, "/signup/", resource_class_kwargs={"mailchimp-key": MAILCHIMP_KEY, "df": df}
+    Signup,
+    "/signup/",
+    resource_class_kwargs={
+        "mailchimp": mailchimp,
+        "outbox": outbox,
+        "live_catalog": live_catalog,
+    },
 )
 api.add_resource(
     Member,
     "/member/",
-    resource_class_kwargs={"mailchimp-key": MAILCHIMP_KEY, "df": df},
+    resource_class_kwargs={
+        "mailchimp": mailchimp,
+        "outbox": outbox,
+        "live_catalog": live_catalog,
+    },
 )
 
+
+def warm_up():
+    """
+    Serve one request to every endpoint, so that lazily created objects exist
+    before workers are forked from this process and can be shared.
+    """
+    client = app.test_client()
+    catalog = live_catalog.catalog
+    place_id = int(catalog.documents.ids[0])
+    profiles = "&".join(f"profiles={profile}" for profile in catalog.features.profiles)
+    for url in [
+        f"/api/{place_id}?{profiles}",
+        f"/api/nearby/{place_id}",
+        f"/api/destinations?ids={place_id}&{profiles}",
+        "/api/explore/",
+        f"/api/explore/?{profiles}",
+    ]:
+        client.get(url)
+    # the first explore pages don't have to stay in the shared cache
+    cache.clear()
+    metrics.clear()
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", debug=True, port=5000)
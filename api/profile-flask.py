@@ -1,7 +1,15 @@
 #!flask/bin/python
-from werkzeug.contrib.profiler import ProfilerMiddleware
-from main import app
+"""
+Run the API locally while sampling the stacks of every request. Stop it with
+Ctrl+C to write the collapsed stacks of every endpoint to ./profiles, which
+https://www.speedscope.app/ or flamegraph.pl show as flame graphs.
+"""
+from main import app, profiler
 
-app.config["PROFILE"] = True
-app.wsgi_app = ProfilerMiddleware(app.wsgi_app, restrictions=[30])
-app.run(host="0.0.0.0", debug=True, port=5000)
+profiler.directory = "./profiles"
+profiler.start(fraction=1.0)
+try:
+    app.run(host="0.0.0.0", port=5000, threaded=True)
+finally:
+    for path in profiler.stop():
+        print(path)
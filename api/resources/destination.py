@@ -1,5 +1,15 @@
+from common.etags import (
+    NO_STORE,
+    add_cache_headers,
+    create_etag,
+    is_not_modified,
+    not_modified,
+)
+from flask import Response
 from flask_restful import Resource, reqparse
-from resources.utils.features import select_features_with_profiles
+
+# responses only change with the data, which is checked with the ETag
+CACHE_CONTROL = "public, max-age=3600"
 
 parser = reqparse.RequestParser()
 parser.add_argument("profiles", type=str, action="append", default=[])
@@ -7,29 +17,45 @@ parser.add_argument("profiles", type=str, action="append", default=[])
 
 class Destination(Resource):
     def __init__(self, **kwargs):
-        # TODO: avoid converting type to object to make it JSON serializable
-        self.df = kwargs["df"].astype("object")
-        self.df_features = kwargs["df_features"]
-        self.df_feature_types = kwargs["df_feature_types"]
+        self.catalog = kwargs["live_catalog"].catalog
+        self.responses = kwargs["responses"]
 
     def get(self, dest_id=None):
         args = parser.parse_args()
+        documents = self.catalog.documents
 
         # if dest_id in url, fetch that destination
         if dest_id:
             try:
-                doc = self.df.loc[int(dest_id)].to_dict()
-            # return null when id not found, or a non-integer id was provided
-            except (KeyError, ValueError) as e:
-                doc = None
-
-        # if no dest_id in url, fetch random
-        else:
-            doc = self.df.sample(1).iloc[0].to_dict()
-
-        # add top X features
-        doc["features"] = select_features_with_profiles(
-            doc["id"], args["profiles"], self.df_features, self.df_feature_types
+                place_id = int(dest_id)
+            # a non-integer id was provided
+            except ValueError:
+                place_id = None
+            # return null when id not found
+            if place_id not in documents:
+                return None
+            etag = create_etag(
+                self.catalog.version,
+                "destination",
+                place_id,
+                tuple(sorted(set(args["profiles"]))),
+            )
+            if is_not_modified(etag):
+                return not_modified(etag, CACHE_CONTROL)
+            position = self.catalog.positions[place_id]
+            return self.responses.respond(
+                etag, lambda: self.render(position, args["profiles"]), CACHE_CONTROL
+            )
+
+        # if no dest_id in url, fetch random using the number of tokens weight
+        position = self.catalog.shuffle.choice()
+        response = Response(
+            self.render(position, args["profiles"]), mimetype="application/json"
         )
+        # a different destination every time, so never reuse the response
+        return add_cache_headers(response, None, NO_STORE)
 
-        return doc
+    def render(self, position, profiles):
+        # add top X features
+        features = self.catalog.features.top_features([position], profiles)
+        return self.catalog.documents.render_position(position, features=features[0])
@@ -0,0 +1,89 @@
+import numpy as np
+from common.etags import create_etag, is_not_modified, not_modified
+from flask_restful import Resource, abort, reqparse
+from resources.utils.documents import encode_object
+
+# enough for a list of liked destinations, small enough to render in one go
+MAX_IDS = 250
+# responses only change with the data, which is checked with the ETag
+CACHE_CONTROL = "public, max-age=3600"
+
+parser = reqparse.RequestParser()
+parser.add_argument("ids", type=str, action="append", default=[])
+parser.add_argument("profiles", type=str, action="append", default=[])
+
+
+def parse_ids(values):
+    """
+    Parse the requested ids, given as comma separated lists and/or repeated
+    arguments.
+
+    Parameters
+    ----------
+    values: list
+        Values of the 'ids' arguments.
+
+    Returns
+    -------
+    out: list
+        Ids in request order, with -1 for ids that are not (64 bit) integers.
+    """
+    ids = []
+    for value in values:
+        for place_id in value.split(","):
+            place_id = place_id.strip()
+            if not place_id:
+                continue
+            try:
+                place_id = int(place_id)
+            except ValueError:
+                place_id = -1
+            ids.append(place_id if abs(place_id) < 2 ** 63 else -1)
+    return ids
+
+
+class Destinations(Resource):
+    """Many destinations at once, instead of a request per destination."""
+
+    def __init__(self, **kwargs):
+        self.catalog = kwargs["live_catalog"].catalog
+        self.responses = kwargs["responses"]
+
+    def get(self):
+        args = parser.parse_args()
+        ids = parse_ids(args["ids"])
+        if len(ids) > MAX_IDS:
+            abort(400, message=f"At most {MAX_IDS} ids can be requested at once")
+
+        etag = create_etag(
+            self.catalog.version,
+            "destinations",
+            tuple(ids),
+            tuple(sorted(set(args["profiles"]))),
+        )
+        if is_not_modified(etag):
+            return not_modified(etag, CACHE_CONTROL)
+
+        return self.responses.respond(
+            etag, lambda: self.render(ids, args["profiles"]), CACHE_CONTROL
+        )
+
+    def render(self, ids, profiles):
+        # positions of all ids in one lookup, -1 for unknown ids
+        positions = self.catalog.positions.lookup(ids)
+        known = np.flatnonzero(positions >= 0)
+
+        # top features of all known places at once
+        features = [None] * len(positions)
+        for i, place_features in zip(
+            known.tolist(),
+            self.catalog.features.top_features_json(positions[known], profiles),
+        ):
+            features[i] = place_features
+
+        return encode_object(
+            {},
+            destinations=self.catalog.documents.render_many(
+                positions, features=features
+            ),
+        )
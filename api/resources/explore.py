@@ -1,24 +1,20 @@
+from collections import namedtuple
+
+import numpy as np
+from common.etags import create_etag, is_not_modified, not_modified
+from common.timing import span
 from flask_restful import Resource, reqparse
-from resources.utils.features import (
-    select_features_with_profiles,
-    filter_and_sort_places_by_profiles,
-)
-from resources.utils.selection import filter_on_geolocation
-from resources.utils.utils import prettify_n_results
+from resources.utils.documents import encode_object
+from resources.utils.features import sort_positions_by_profiles
+from resources.utils.selection import normalize_country
+from resources.utils.utils import prettify_n_results, read_only
 
 PROFILE_WEIGHT_FACTOR = 1.5
 PROFILE_WEIGHT_THRESHOLD = 1
-OUTPUT_COLUMNS = [
-    "id",
-    "wiki_id",
-    "name",
-    "status",
-    "type",
-    "lat",
-    "lng",
-    "country",
-    "features",
-]
+# responses only change with the data, which is checked with the ETag
+CACHE_CONTROL = "public, max-age=3600"
+
+VIEWPORT_ARGUMENTS = ["ne_lat", "ne_lng", "sw_lat", "sw_lng"]
 
 parser = reqparse.RequestParser()
 parser.add_argument("seed", type=int, default=1234)
@@ -32,74 +28,130 @@ parser.add_argument("sw_lng", type=float)
 parser.add_argument("profiles", type=str, action="append", default=[])
 
 
+# an explore query without paging, the same for all pages of the query
+ExploreQuery = namedtuple("ExploreQuery", ["country", "viewport", "profiles", "seed"])
+
+
+def create_query(args):
+    """
+    Create the explore query for a request, normalized so that equivalent
+    requests result in the same query.
+
+    Parameters
+    ----------
+    args: dict
+        Parsed request arguments.
+
+    Returns
+    -------
+    out: ExploreQuery
+        Normalized country, viewport, profiles and seed. The viewport is None
+        unless all its coordinates are provided. The seed is left out when
+        sorting on profiles, because it does not affect the order then.
+    """
+    profiles = tuple(sorted(set(args["profiles"])))
+    viewport = tuple(args[key] for key in VIEWPORT_ARGUMENTS)
+    return ExploreQuery(
+        country=normalize_country(args["country"]) if args["country"] else None,
+        viewport=viewport if None not in viewport else None,
+        profiles=profiles,
+        seed=None if profiles else args["seed"],
+    )
+
+
+def select_places(catalog, query):
+    """
+    Find the places for an explore query.
+
+    Only reads from the catalog and allocates new arrays for the result, so
+    that concurrent requests can share the catalog without locking.
+
+    Parameters
+    ----------
+    catalog: Catalog
+        Destination data and lookup structures.
+    query: ExploreQuery
+        Query to find the places for.
+
+    Returns
+    -------
+    out: ndarray
+        Read-only row positions of all matching places, in the order to show
+        them.
+    """
+    # if no valid arguments, default is to use all places
+    positions = np.arange(len(catalog.documents))
+
+    # if country provided try to match on that first
+    country_match = False
+    if query.country is not None:
+        with span("country"):
+            positions = catalog.country_index.query(query.country)
+        country_match = len(positions) > 0
+    # if geocoordinates provided and no country match
+    if query.viewport is not None and not country_match:
+        with span("viewport"):
+            positions = catalog.grid_index.query(*query.viewport)
+    # if feature profiles provided, filter and sort on that
+    if query.profiles:
+        with span("profiles"):
+            positions = sort_positions_by_profiles(
+                positions,
+                query.profiles,
+                catalog.profile_weights,
+                catalog.nr_tokens_norm,
+                profile_weight_factor=PROFILE_WEIGHT_FACTOR,
+                profile_weight_threshold=PROFILE_WEIGHT_THRESHOLD,
+            )
+    # if not, sort using the number of tokens weight
+    else:
+        with span("shuffle"):
+            positions = catalog.shuffle.page(positions, query.seed)
+
+    # the cache holds many orders, so store them compactly and read-only
+    return read_only(positions.astype(np.int32))
+
+
 class Explore(Resource):
     def __init__(self, **kwargs):
-        self.df = kwargs["df"]
-        self.df_features = kwargs["df_features"]
-        self.df_feature_types = kwargs["df_feature_types"]
+        self.catalog = kwargs["live_catalog"].catalog
+        self.cache = kwargs["cache"]
+        self.responses = kwargs["responses"]
 
     def get(self):
         args = parser.parse_args()
 
-        # if no valid arguments, default is to use all places
-        subset = self.df
-
-        # if country provided try to match on that first
-        country_match = False
-        if args["country"]:
-            subset = self.df.loc[
-                lambda df: df["country"].str.lower() == args["country"].lower()
-            ]
-            if len(subset) > 0:
-                country_match = True
-        # if geocoordinates provided and no country match
-        if (
-            args["ne_lat"]
-            and args["ne_lng"]
-            and args["sw_lat"]
-            and args["sw_lng"]
-            and country_match == False
-        ):
-            subset = self.df.pipe(
-                filter_on_geolocation,
-                args["ne_lat"],
-                args["ne_lng"],
-                args["sw_lat"],
-                args["sw_lng"],
-            )
-        # if feature profiles provided, filter and sort on that
-        if args["profiles"]:
-            subset = subset.pipe(
-                filter_and_sort_places_by_profiles,
-                args["profiles"],
-                self.df_features,
-                self.df_feature_types,
-                profile_weight_factor=PROFILE_WEIGHT_FACTOR,
-                profile_weight_threshold=PROFILE_WEIGHT_THRESHOLD,
-            )
-        # if not, sort using the number of tokens weight (if places in subset at all)
-        elif len(subset) > 0:
-            subset = subset.sample(frac=1, random_state=args["seed"], weights="weight")
-
-        # apply offset if places found
-        try:
-            places = subset.iloc[
-                args["offset"] : args["offset"] + args["n_results"]
-            ].copy()
-            # add top X features
-            places["features"] = places["id"].apply(
-                lambda x: select_features_with_profiles(
-                    x, args["profiles"], self.df_features, self.df_feature_types
-                )
+        query = create_query(args)
+        offset = max(args["offset"], 0)
+        etag = create_etag(
+            self.catalog.version, "explore", query, offset, args["n_results"]
+        )
+        if is_not_modified(etag):
+            return not_modified(etag, CACHE_CONTROL)
+
+        return self.responses.respond(
+            etag, lambda: self.render(query, offset, args["n_results"]), CACHE_CONTROL
+        )
+
+    def render(self, query, offset, n_results):
+        # all pages of the same query share the ordered places
+        key = (self.catalog.version,) + query
+        positions = self.cache.get(key)
+        if positions is None:
+            positions = select_places(self.catalog, query)
+            self.cache.put(key, positions, positions.nbytes)
+
+        # apply offset
+        page = positions[offset : offset + n_results]
+        # add top X features to the pre-encoded documents
+        with span("features"):
+            features = self.catalog.features.top_features_json(page, query.profiles)
+        with span("render"):
+            destinations = self.catalog.summaries.render_many(page, features=features)
+            return encode_object(
+                {
+                    "maxPlaces": len(positions),
+                    "maxPlacesText": prettify_n_results(len(positions)),
+                },
+                destinations=destinations,
             )
-            # select columns and return as dict
-            places = places[OUTPUT_COLUMNS].to_dict(orient="records")
-        # if subset is empty return empty list
-        except ValueError:
-            places = []
-
-        return {
-            "maxPlaces": len(subset),
-            "maxPlacesText": prettify_n_results(len(subset)),
-            "destinations": places,
-        }
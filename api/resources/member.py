@@ -1,8 +1,15 @@
-from json import load, dumps
-from requests import post
+import logging
+from json import dumps
+
+from flask import request
 from flask_restful import Resource, reqparse
 from resources.utils.utils import create_list_of_likes
 
+logger = logging.getLogger(__name__)
+
+# when the API runs without a Mailchimp key
+UNAVAILABLE = "Signing up is not available"
+
 parser = reqparse.RequestParser()
 parser.add_argument("email", type=str, required=True)
 parser.add_argument("likes", type=int, required=True, action="append")
@@ -15,21 +22,25 @@ parser.add_argument("none", type=bool, required=False, default=False)
 
 class Member(Resource):
     def __init__(self, **kwargs):
-        with open(kwargs["mailchimp-key"], "r") as f:
-            self.key = load(f)
-        self.df = kwargs["df"]
+        self.mailchimp = kwargs["mailchimp"]
+        self.outbox = kwargs["outbox"]
+        self.catalog = kwargs["live_catalog"].catalog
 
     def post(self):
+        if self.mailchimp is None:
+            return {"message": UNAVAILABLE}, 503
         args = parser.parse_args()
 
-        likes_text = create_list_of_likes(
-            self.df,
+        likes_text, unknown = create_list_of_likes(
+            self.catalog,
             args["likes"],
             list_prefix="|",
             list_postfix="",
             line_prefix=" ",
             line_postfix=" |",
         )
+        if unknown:
+            logger.warning("Ignoring unknown liked destinations %s", unknown)
 
         payload = {
             "name": "liked_destinations",
@@ -46,16 +57,14 @@ class Member(Resource):
             },
         }
         print(payload)
-        headers = {"content-type": "application/json"}
-
-        # Use auth for Basic authentication
-        r = post(
-            "https://us3.api.mailchimp.com/3.0/lists/{}/members/{}/events".format(
-                self.key["audience_id"], args["email"]
-            ),
-            json=payload,
-            headers=headers,
-            auth=("randomstring", self.key["api_key"]),
+        # sent to Mailchimp in the background, retried until it succeeds
+        self.outbox.enqueue(
+            args["email"],
+            "POST",
+            self.mailchimp.members_path(args["email"]) + "/events",
+            payload,
+            key=request.headers.get("Idempotency-Key"),
         )
 
-        return r.status_code
+        # accepted, Mailchimp processes the update later
+        return None, 202
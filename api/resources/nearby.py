@@ -1,39 +1,72 @@
+from common.etags import create_etag, is_not_modified, not_modified
+from common.timing import span
 from flask_restful import Resource, reqparse
-from resources.utils.distance import sort_places_by_distance
+from resources.utils.documents import encode_object
+
+N_CLOSEST = 30
+# responses only change with the data, which is checked with the ETag
+CACHE_CONTROL = "public, max-age=3600"
 
 parser = reqparse.RequestParser()
 parser.add_argument("n_results", type=int, default=12)
 parser.add_argument("seed", type=int, default=1234)
+parser.add_argument("lat", type=float)
+parser.add_argument("lng", type=float)
 
 
 class Nearby(Resource):
     def __init__(self, **kwargs):
-        self.df = kwargs["df"]
+        self.catalog = kwargs["live_catalog"].catalog
+        self.responses = kwargs["responses"]
 
     def get(self, dest_id=None):
         args = parser.parse_args()
+        columns = self.catalog.columns
 
-        try:
-            place_id = int(dest_id)
-        except ValueError as e:
-            place_id = None
-
-        if place_id in self.df.index:
-            places = (
-                self.df
-                .pipe(sort_places_by_distance, place_id)
-                # first get 30 closest places
-                .head(30)
-                # Sort using the number of tokens weight
-                .sample(frac=1, random_state=args["seed"], weights="weight")
-                # return the requested subset
-                .head(args['n_results'])
-                .to_dict(orient="records")
-            )
-        # if place_id does not exist return nothing
+        # if dest_id in url, search around that destination
+        if dest_id:
+            try:
+                position = self.catalog.positions.get(int(dest_id))
+            except ValueError:
+                position = None
+            # if place_id does not exist return nothing
+            if position is None:
+                return {"destinations": []}
+            lat, lng = columns["lat"][position], columns["lng"][position]
+            origin = position
+        # otherwise search around the provided geocoordinates
+        elif args["lat"] is not None and args["lng"] is not None:
+            position = None
+            lat, lng = args["lat"], args["lng"]
+            # no places around nan, infinite or out of range coordinates
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                return {"destinations": []}
+            origin = (lat, lng)
         else:
-            places = []
+            return {"destinations": []}
+
+        etag = create_etag(
+            self.catalog.version, "nearby", origin, args["seed"], args["n_results"]
+        )
+        if is_not_modified(etag):
+            return not_modified(etag, CACHE_CONTROL)
+
+        return self.responses.respond(
+            etag, lambda: self.render(lat, lng, position, args), CACHE_CONTROL
+        )
 
-        return {
-            "destinations": places,
-        }
+    def render(self, lat, lng, position, args):
+        # first get 30 closest places
+        with span("closest"):
+            closest, _ = self.catalog.spatial_index.query(
+                lat, lng, k=N_CLOSEST, exclude=position
+            )
+        # Sort using the number of tokens weight and return the requested subset
+        with span("shuffle"):
+            page = self.catalog.shuffle.sample(
+                closest, args["seed"], n_results=args["n_results"]
+            )
+        with span("render"):
+            return encode_object(
+                {}, destinations=self.catalog.documents.render_many(page)
+            )
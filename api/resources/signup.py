@@ -1,5 +1,6 @@
-from json import load
-from requests import post, get, patch
+import logging
+
+from flask import request
 from flask_restful import Resource, reqparse
 from resources.utils.utils import (
     create_list_of_likes,
@@ -8,6 +9,11 @@ from resources.utils.utils import (
 )
 from resources.utils.interests import create_interests_query
 
+logger = logging.getLogger(__name__)
+
+# when the API runs without a Mailchimp key
+UNAVAILABLE = "Signing up is not available"
+
 # TODO split into 2 separate parsers, one for query and one for payload/body
 # Reason is that you cant set location argument required to True for GET requests
 parser = reqparse.RequestParser()
@@ -25,11 +31,13 @@ parser.add_argument("none", type=bool, required=False, default=False)
 
 class Signup(Resource):
     def __init__(self, **kwargs):
-        with open(kwargs["mailchimp-key"], "r") as f:
-            self.key = load(f)
-        self.df = kwargs["df"]
+        self.mailchimp = kwargs["mailchimp"]
+        self.outbox = kwargs["outbox"]
+        self.catalog = kwargs["live_catalog"].catalog
 
     def post(self):
+        if self.mailchimp is None:
+            return {"message": UNAVAILABLE}, 503
         args = parser.parse_args()
 
         payload = {
@@ -44,7 +52,11 @@ class Signup(Resource):
 
         # if likes are provided, the booking arguments should also be there
         if args["likes"]:
-            util_html = create_list_of_likes(self.df, args["likes"], add_link=True)
+            util_html, unknown = create_list_of_likes(
+                self.catalog, args["likes"], add_link=True
+            )
+            if unknown:
+                logger.warning("Ignoring unknown liked destinations %s", unknown)
             for i, html_part in enumerate(
                 pad_or_truncate_list(list(split_text_in_chuncks(util_html)))
             ):
@@ -62,16 +74,8 @@ class Signup(Resource):
             )
             payload["interests"] = create_interests_query(user_interests)
 
-        headers = {"content-type": "application/json"}
-
-        # Use auth for Basic authentication
-        r = post(
-            "https://us3.api.mailchimp.com/3.0/lists/{}/members/".format(
-                self.key["audience_id"]
-            ),
-            json=payload,
-            headers=headers,
-            auth=("randomstring", self.key["api_key"]),
+        r = self.mailchimp.request(
+            "POST", self.mailchimp.members_path(), json=payload
         )
 
         try:
@@ -82,14 +86,11 @@ class Signup(Resource):
         return member_id
 
     def get(self):
+        if self.mailchimp is None:
+            return {"message": UNAVAILABLE}, 503
         args = parser.parse_args()
 
-        r = get(
-            "https://us3.api.mailchimp.com/3.0/lists/{}/members/{}".format(
-                self.key["audience_id"], args["email"]
-            ),
-            auth=("randomstring", self.key["api_key"]),
-        )
+        r = self.mailchimp.request("GET", self.mailchimp.members_path(args["email"]))
 
         try:
             member_id = r.json()["id"]
@@ -99,6 +100,8 @@ class Signup(Resource):
         return member_id
 
     def patch(self):
+        if self.mailchimp is None:
+            return {"message": UNAVAILABLE}, 503
         args = parser.parse_args()
 
         # default status should be 'subscribed'. Otherwise no emails can be sent.
@@ -119,23 +122,25 @@ class Signup(Resource):
                 "none": args["none"],
             }
             payload["interests"] = create_interests_query(user_interests)
-            util_html = create_list_of_likes(self.df, args["likes"], add_link=True)
+            util_html, unknown = create_list_of_likes(
+                self.catalog, args["likes"], add_link=True
+            )
+            if unknown:
+                logger.warning("Ignoring unknown liked destinations %s", unknown)
             for i, html_part in enumerate(
                 pad_or_truncate_list(list(split_text_in_chuncks(util_html)))
             ):
                 # for this to work, 'merge_field' should already exist in the payload dict
                 payload["merge_fields"][f"UTIL{i}"] = html_part
 
-        headers = {"content-type": "application/json"}
-        # Use auth for Basic authentication
-        r = patch(
-            "https://us3.api.mailchimp.com/3.0/lists/{}/members/{}".format(
-                self.key["audience_id"], args["email"]
-            ),
-            json=payload,
-            headers=headers,
-            auth=("randomstring", self.key["api_key"]),
+        # sent to Mailchimp in the background, retried until it succeeds
+        self.outbox.enqueue(
+            args["email"],
+            "PATCH",
+            self.mailchimp.members_path(args["email"]),
+            payload,
+            key=request.headers.get("Idempotency-Key"),
         )
 
-        # always successful given valid status input, so return doesn't matter
-        return r.status_code
+        # accepted, Mailchimp processes the update later
+        return None, 202
@@ -1,5 +1,8 @@
 import numpy as np
 from pandas import DataFrame
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS = 6371
 
 
 def sort_places_by_distance(
@@ -52,3 +55,85 @@ def haversine(lat1, lon1, lat2, lon2, to_radians=True, earth_radius=6371):
         np.cos(lat1) * np.cos(lat2) * np.sin((lon2-lon1)/2.0)**2
 
     return earth_radius * 2 * np.arcsin(np.sqrt(a))
+
+
+def to_unit_vectors(lat, lng):
+    """
+    Convert latitudes and longitudes in degrees to 3D unit vectors.
+
+    Parameters
+    ----------
+    lat: array-like
+        Latitudes in degrees.
+    lng: array-like
+        Longitudes in degrees.
+
+    Returns
+    -------
+    out: ndarray
+        Array of shape (n, 3) with points on the unit sphere.
+    """
+    lat, lng = np.radians(lat), np.radians(lng)
+    return np.column_stack(
+        [np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)]
+    )
+
+
+class SphericalIndex:
+    """
+    Nearest neighbour index for places on the globe.
+
+    Places are stored as 3D unit vectors in a k-d tree. The straight line
+    (chord) distance between two unit vectors increases monotonically with
+    their great circle distance, so the nearest neighbours in 3D are also the
+    nearest places on earth.
+
+    Parameters
+    ----------
+    lat: array-like
+        Latitudes of the places in degrees.
+    lng: array-like
+        Longitudes of the places in degrees.
+    """
+
+    def __init__(self, lat, lng):
+        self.tree = cKDTree(to_unit_vectors(lat, lng))
+
+    def __len__(self):
+        return self.tree.n
+
+    def query(self, lat, lng, k=30, exclude=None):
+        """
+        Find the k places closest to a location.
+
+        Parameters
+        ----------
+        lat: float
+            Latitude of the location in degrees.
+        lng: float
+            Longitude of the location in degrees.
+        k: int
+            Number of places to return.
+        exclude: int
+            Row position of a place to leave out of the result, e.g. the place
+            the location belongs to.
+
+        Returns
+        -------
+        out: tuple of ndarray
+            Row positions of the closest places and their distances in km,
+            both sorted by increasing distance.
+        """
+        n_query = min(k + (exclude is not None), len(self))
+        if n_query < 1:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        chord, positions = self.tree.query(
+            to_unit_vectors([lat], [lng])[0], k=n_query
+        )
+        chord, positions = np.atleast_1d(chord), np.atleast_1d(positions)
+        if exclude is not None:
+            keep = positions != exclude
+            chord, positions = chord[keep][:k], positions[keep][:k]
+
+        distances = EARTH_RADIUS * 2 * np.arcsin(np.minimum(chord / 2, 1))
+        return positions, distances
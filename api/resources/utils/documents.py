@@ -0,0 +1,262 @@
+import json
+
+import numpy as np
+
+from .utils import read_only
+
+
+def to_native(value):
+    """Convert numpy scalars to native Python types so they are JSON serializable."""
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+# reused, json.dumps creates a new encoder for every call with custom options
+JSON_ENCODER = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_json(data):
+    """Encode data as compact JSON bytes."""
+    return JSON_ENCODER.encode(data).encode("utf-8")
+
+
+def encode_object(data, **encoded):
+    """
+    Encode a dict as a JSON object, adding values that are already encoded.
+
+    Parameters
+    ----------
+    data: dict
+        Values to encode.
+    encoded:
+        JSON bytes of additional values, e.g. from `DocumentStore.render_many`.
+
+    Returns
+    -------
+    out: bytes
+        JSON object with all values.
+    """
+    members = [encode_json(data)[1:-1]] if data else []
+    members += [encode_json(key) + b":" + value for key, value in encoded.items()]
+    return b"{" + b",".join(members) + b"}"
+
+
+INT64 = np.iinfo(np.int64)
+
+
+def to_int64(values):
+    """
+    Convert integers to an int64 array, with 0 for the integers outside its
+    range, like ids parsed from a url.
+
+    Returns
+    -------
+    out: tuple
+        The int64 array, and a boolean array of the integers within range or
+        None if all of them are.
+    """
+    try:
+        return np.asarray(values, dtype=np.int64), None
+    except OverflowError:
+        values = np.asarray(values, dtype=object)
+        in_range = np.array(
+            [INT64.min <= value <= INT64.max for value in values.ravel()],
+            dtype=bool,
+        ).reshape(values.shape)
+        return np.where(in_range, values, 0).astype(np.int64), in_range
+
+
+class IdIndex:
+    """
+    Lookup of the row positions of places by their id.
+
+    The lookup is stored in numpy arrays instead of a dict, so that looking up
+    ids does not touch Python objects. This keeps the memory pages shared
+    between forked worker processes (see `gunicorn.conf.py`).
+
+    Parameters
+    ----------
+    ids: array-like
+        Integer ids of the places, in the order of the destinations data.
+    """
+
+    def __init__(self, ids):
+        self.ids = read_only(np.asarray(ids, dtype=np.int64).copy())
+        self.min_id = int(self.ids.min()) if len(self.ids) else 0
+        span = int(self.ids.max()) - self.min_id + 1 if len(self.ids) else 0
+
+        # a table with an entry for every id in range is fastest if not too sparse
+        if span <= max(16 * len(self.ids), 2 ** 20):
+            self.table = np.full(span, -1, dtype=np.int64)
+            self.table[self.ids - self.min_id] = np.arange(len(self.ids))
+            self.sorted_ids = None
+        else:
+            self.table = None
+            self.order = np.argsort(self.ids, kind="stable")
+            self.sorted_ids = self.ids[self.order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, place_id):
+        return self.get(place_id) is not None
+
+    def __getitem__(self, place_id):
+        position = self.get(place_id)
+        if position is None:
+            raise KeyError(place_id)
+        return position
+
+    def get(self, place_id, default=None):
+        """Return the row position of a place id, or `default` if not found."""
+        if not isinstance(place_id, (int, np.integer)) or isinstance(place_id, bool):
+            return default
+        position = int(self.lookup([place_id])[0])
+        return default if position < 0 else position
+
+    def lookup(self, place_ids):
+        """
+        Look up the row positions of many place ids at once.
+
+        Parameters
+        ----------
+        place_ids: array-like
+            Integer ids of places.
+
+        Returns
+        -------
+        out: ndarray
+            Row position of each id, or -1 for ids that are not found,
+            including ids outside the int64 range.
+        """
+        place_ids, valid = to_int64(place_ids)
+        positions = np.full(place_ids.shape, -1, dtype=np.int64)
+
+        if self.table is not None:
+            # compare before subtracting, which could overflow
+            in_range = (place_ids >= self.min_id) & (
+                place_ids < self.min_id + len(self.table)
+            )
+            positions[in_range] = self.table[place_ids[in_range] - self.min_id]
+        elif len(self.ids):
+            found = np.searchsorted(self.sorted_ids, place_ids)
+            found = np.minimum(found, len(self.ids) - 1)
+            match = self.sorted_ids[found] == place_ids
+            positions[match] = self.order[found[match]]
+        if valid is not None:
+            positions[~valid] = -1
+        return positions
+
+
+class DocumentStore:
+    """
+    Pre-serialized JSON documents for all destinations, aligned with the rows
+    of the destinations DataFrame.
+
+    Each document is stored as an open JSON object (without the closing brace)
+    so that request dependent fields like 'features' can be appended without
+    re-encoding the static fields. All documents live in one bytes object,
+    which forked worker processes can share.
+
+    Parameters
+    ----------
+    df: DataFrame
+        Destinations data with an 'id' column.
+    columns: list
+        Columns to include in the documents. Defaults to all columns.
+    """
+
+    def __init__(self, df, columns=None):
+        columns = list(df.columns) if columns is None else list(columns)
+        self.positions = IdIndex(df["id"].values)
+        self.ids = self.positions.ids
+
+        fragments = [
+            encode_json(
+                {column: to_native(value) for column, value in zip(columns, row)}
+            )[:-1]
+            for row in df[columns].itertuples(index=False, name=None)
+        ]
+        self.offsets = read_only(
+            np.cumsum([0] + [len(fragment) for fragment in fragments])
+        )
+        self.buffer = b"".join(fragments)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __contains__(self, place_id):
+        return place_id in self.positions
+
+    def fragment(self, position):
+        """Return the open JSON object of a place by row position."""
+        start, end = self.offsets[position : position + 2].tolist()
+        return self.buffer[start:end]
+
+    def render(self, place_id, **fields):
+        """
+        Return the JSON document for a place, completed with additional fields.
+
+        Parameters
+        ----------
+        place_id: int
+            Id of the place to return the document for.
+        fields:
+            Request specific fields to add to the document.
+
+        Returns
+        -------
+        out: bytes
+            Complete JSON document.
+        """
+        return self.render_position(self.positions[place_id], **fields)
+
+    def render_position(self, position, **fields):
+        """Same as `render`, but looks up the document by row position."""
+        fragment = self.fragment(position)
+        if not fields:
+            return fragment + b"}"
+        return fragment + b"," + encode_json(fields)[1:]
+
+    def render_many(self, positions, **fields):
+        """
+        Return a JSON array with the documents of many places.
+
+        Parameters
+        ----------
+        positions: array-like
+            Row positions of the places.
+        fields:
+            Request specific fields to add to the documents, with a list of
+            values for each field that is aligned with `positions`. Values
+            that are bytes are added as already encoded JSON.
+
+        Returns
+        -------
+        out: bytes
+            JSON array of complete documents. Negative positions, like those
+            of unknown ids from `IdIndex.lookup`, are encoded as null.
+        """
+        positions = np.asarray(positions, dtype=np.intp)
+        missing = positions < 0
+        positions = np.where(missing, 0, positions)
+        starts = self.offsets[positions].tolist()
+        ends = self.offsets[positions + 1].tolist()
+        missing = missing.tolist()
+        prefixes = [b"," + encode_json(name) + b":" for name in fields]
+
+        parts = [b"["]
+        for i, (start, end) in enumerate(zip(starts, ends)):
+            if i:
+                parts.append(b",")
+            if missing[i]:
+                parts.append(b"null")
+                continue
+            parts.append(self.buffer[start:end])
+            for prefix, values in zip(prefixes, fields.values()):
+                value = values[i]
+                parts += [prefix, value if isinstance(value, bytes) else encode_json(value)]
+            parts.append(b"}")
+        parts.append(b"]")
+        return b"".join(parts)
@@ -1,4 +1,10 @@
-from .utils import add_normalized_column
+import numpy as np
+
+from .documents import encode_json
+from .utils import add_normalized_column, read_only
+
+# columns in the feature types data set that are not feature profiles
+NON_PROFILE_COLUMNS = ["feature_id", "feature_column", "feature_type"]
 
 
 def select_features(place_id, df_features, top_x=5, min_threshold=0.1):
@@ -113,14 +119,16 @@ def add_sorting_weight_by_profiles(df_places, profiles, df_features, df_feature_
     Returns
     -------
     out: DataFrame
-        DataFrame with a 'profile_weight' column.
+        Copy of the DataFrame with a 'profile_weight' column.
     """
     features_inscope = select_feature_columns_with_profiles(profiles, df_feature_types)
 
-    df_places["profile_weight"] = df_features.loc[df_places["id"].tolist()][
-        features_inscope
-    ].sum(axis=1)
-    return df_places
+    # assign to a copy, df_places may be the shared destinations data
+    return df_places.assign(
+        profile_weight=df_features.loc[df_places["id"].tolist()][features_inscope]
+        .sum(axis=1)
+        .values
+    )
 
 
 def filter_and_sort_places_by_profiles(
@@ -173,3 +181,255 @@ def filter_and_sort_places_by_profiles(
     )
 
     return sorted_places
+
+
+def aligned_scores(place_ids, df_features):
+    """
+    Get the feature scores of places as a read-only float32 array.
+
+    Scores that are already aligned with the places, like the memory-mapped
+    features of a snapshot, are used as they are instead of copied.
+
+    Parameters
+    ----------
+    place_ids: array-like
+        Ids of the places, in the order of the destinations DataFrame.
+    df_features: DataFrame
+        Data set with feature scores for all places, indexed on 'id'.
+
+    Returns
+    -------
+    out: ndarray
+        Scores with a row per place and a column per feature, 0 for missing
+        places and scores.
+    """
+    if np.array_equal(df_features.index.values, place_ids):
+        scores = df_features.values.astype(np.float32, copy=False)
+        # any NaN makes the sum NaN, without a temporary array of all scores
+        if not np.isnan(scores.sum(dtype=np.float64)):
+            return read_only(scores)
+    return read_only(
+        df_features.reindex(index=place_ids).fillna(0).values.astype(np.float32)
+    )
+
+
+class ProfileWeightMatrix:
+    """
+    Precomputed profile weights for all places, aligned with the rows of the
+    destinations DataFrame.
+
+    Profiles share features, so the weight of a combination of profiles (the
+    summed score of all features in any of the profiles) is not the sum of
+    the weights of the individual profiles. Instead, features are grouped by
+    the set of profiles they belong to, and the matrix holds the summed
+    feature scores per group. The weight for any combination of profiles is
+    then the sum of the columns of the groups that match at least one of the
+    profiles.
+
+    Parameters
+    ----------
+    place_ids: array-like
+        Ids of the places, in the order of the destinations DataFrame.
+    df_features: DataFrame
+        Data set with feature scores for all places, indexed on 'id'.
+    df_feature_types: DataFrame
+        Data set that tells which features belong to which feature profiles.
+    """
+
+    def __init__(self, place_ids, df_features, df_feature_types):
+        feature_types = df_feature_types.set_index("feature_name").loc[
+            lambda df: df.index.isin(df_features.columns)
+        ]
+        self.profiles = [
+            column
+            for column in feature_types.columns
+            if column not in NON_PROFILE_COLUMNS
+        ]
+        membership = feature_types[self.profiles].values > 0
+        # one group for every distinct combination of profiles a feature is in
+        self.group_profiles, feature_groups = np.unique(
+            membership, axis=0, return_inverse=True
+        )
+        feature_groups = np.ravel(feature_groups)
+
+        scores = aligned_scores(place_ids, df_features)
+        columns = df_features.columns.get_indexer(feature_types.index)
+        self.matrix = np.zeros(
+            (len(scores), len(self.group_profiles)), dtype=np.float32
+        )
+        for group in range(len(self.group_profiles)):
+            self.matrix[:, group] = scores[:, columns[feature_groups == group]].sum(
+                axis=1
+            )
+        read_only(self.matrix)
+
+    def weights(self, profiles, positions=None):
+        """
+        Get the profile weight of places for a combination of profiles.
+
+        Parameters
+        ----------
+        profiles: list
+            List with feature profiles in scope. Unknown profiles are ignored.
+        positions: ndarray
+            Row positions of the places to get weights for. Defaults to all
+            places.
+
+        Returns
+        -------
+        out: ndarray
+            Summed feature scores of all features in the selected profiles.
+        """
+        selected = [
+            i for i, profile in enumerate(self.profiles) if profile in profiles
+        ]
+        groups = np.flatnonzero(self.group_profiles[:, selected].any(axis=1))
+        matrix = self.matrix if positions is None else self.matrix[positions]
+        return matrix[:, groups].sum(axis=1)
+
+
+def sort_positions_by_profiles(
+    positions,
+    profiles,
+    profile_weights,
+    nr_tokens_norm,
+    profile_weight_factor=1.5,
+    profile_weight_threshold=1,
+):
+    """
+    Array version of `filter_and_sort_places_by_profiles` working on row
+    positions of places in the destinations data.
+
+    Parameters
+    ----------
+    positions: ndarray
+        Row positions of the places to sort.
+    profiles: List
+        List of profiles to use.
+    profile_weights: ProfileWeightMatrix
+        Precomputed profile weights for all places.
+    nr_tokens_norm: ndarray
+        Normalized number of tokens for all places.
+    profile_weight_factor: float
+        Factor to multiply the normalized profile weight with before adding it
+        to the number of tokens weight.
+    profile_weight_threshold: float
+        Minimum threshold for the profiles weight (before normalization) in
+        order for a place to be kept in the output result.
+
+    Returns
+    -------
+    out: ndarray
+        Row positions of the places matching the profiles, sorted by a feature
+        profiles match and the number of tokens.
+    """
+    profile_weight = profile_weights.weights(profiles, positions)
+    if len(profile_weight) == 0:
+        return positions
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        profile_weight_norm = (profile_weight - profile_weight.min()) / (
+            profile_weight.max() - profile_weight.min()
+        )
+    # keep only places with a profile weight higher than the threshold
+    keep = profile_weight > profile_weight_threshold
+    # create sorting weight as a combination of token and profiles weight
+    sort_weight = (
+        nr_tokens_norm[positions[keep]]
+        + profile_weight_norm[keep] * profile_weight_factor
+    )
+    return positions[keep][np.argsort(-sort_weight, kind="stable")]
+
+
+class FeatureMatrix:
+    """
+    Feature scores for all places, aligned with the rows of the destinations
+    DataFrame, for selecting the top features of many places at once.
+
+    Parameters
+    ----------
+    place_ids: array-like
+        Ids of the places, in the order of the destinations DataFrame.
+    df_features: DataFrame
+        Data set with feature scores for all places, indexed on 'id'.
+    df_feature_types: DataFrame
+        Data set that tells which features belong to which feature profiles.
+    """
+
+    def __init__(self, place_ids, df_features, df_feature_types):
+        self.names = np.asarray(df_features.columns, dtype=object)
+        # names as JSON strings, so that features can be added to pre-encoded documents
+        self.encoded_names = [encode_json(name) for name in self.names]
+        self.scores = aligned_scores(place_ids, df_features)
+        # ranking in scope features first: any score + offset beats any score
+        self.offset = float(np.abs(self.scores).max(initial=0)) * 2 + 1
+
+        feature_types = df_feature_types.set_index("feature_name")
+        self.profiles = [
+            column
+            for column in feature_types.columns
+            if column not in NON_PROFILE_COLUMNS
+        ]
+        self.membership = read_only(
+            feature_types[self.profiles].reindex(self.names).fillna(0).values > 0
+        )
+
+    def top_features(self, positions, profiles, top_x=5, min_threshold=0.1):
+        """
+        Get the top_x features for many places, keeping feature profiles into
+        account. Same as `select_features_with_profiles` for every place.
+
+        Parameters
+        ----------
+        positions: array-like
+            Row positions of the places to return features for.
+        profiles: list
+            List with feature profiles in scope (e.g. 'nature', 'culture', ...).
+        top_x: int
+            Number of features to return per place.
+        min_threshold: float
+            Minimum score a feature needs to have.
+
+        Returns
+        -------
+        out: list
+            List with a list of the top x feature names for each place, with
+            features from selected profiles first.
+        """
+        return [
+            self.names[columns].tolist()
+            for columns in self.top_columns(positions, profiles, top_x, min_threshold)
+        ]
+
+    def top_features_json(self, positions, profiles, top_x=5, min_threshold=0.1):
+        """Same as `top_features`, but returns each list as JSON bytes."""
+        encoded_names = self.encoded_names
+        return [
+            b"[" + b",".join([encoded_names[i] for i in columns]) + b"]"
+            for columns in self.top_columns(positions, profiles, top_x, min_threshold)
+        ]
+
+    def top_columns(self, positions, profiles, top_x=5, min_threshold=0.1):
+        """Same as `top_features`, but returns the column numbers of the features."""
+        scores = self.scores[np.asarray(positions, dtype=np.intp)].astype(
+            np.float64
+        )
+        if scores.size == 0:
+            return [[] for _ in range(len(scores))]
+
+        selected = [
+            i for i, profile in enumerate(self.profiles) if profile in profiles
+        ]
+        inscope = self.membership[:, selected].any(axis=1)
+        ranking = np.where(
+            scores > min_threshold, scores + inscope * self.offset, -np.inf
+        )
+
+        top_x = min(top_x, ranking.shape[1])
+        top = np.argpartition(-ranking, top_x - 1, axis=1)[:, :top_x]
+        top_ranking = np.take_along_axis(ranking, top, axis=1)
+        order = np.argsort(-top_ranking, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        valid = np.take_along_axis(top_ranking, order, axis=1) > -np.inf
+
+        return [columns[mask].tolist() for columns, mask in zip(top, valid)]
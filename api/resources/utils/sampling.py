@@ -0,0 +1,156 @@
+from functools import lru_cache
+
+import numpy as np
+
+from .utils import read_only
+
+
+class WeightedShuffle:
+    """
+    Deterministic weighted shuffling of places.
+
+    Uses the Efraimidis-Spirakis algorithm for weighted sampling without
+    replacement: every place gets a key E / weight, where E is drawn from an
+    exponential distribution, and sorting on the keys yields a weighted random
+    order. The keys only depend on the seed, so all workers produce the same
+    order for a seed and the keys for recent seeds are cached.
+
+    Keys for all places only pay off for ordering many places. `sample` orders
+    a few places with keys for those places only, and `choice` picks a single
+    place from the cumulative weights.
+
+    Parameters
+    ----------
+    weights: array-like
+        Sampling weight of each place, aligned with the destinations data.
+    cache_bytes: int
+        Maximum size of the cached keys. The keys of a seed take 4 bytes per
+        place, and the keys of at least one seed are cached.
+    """
+
+    def __init__(self, weights, cache_bytes=16 * 2 ** 20):
+        self.weights = read_only(np.array(weights, dtype=np.float64))
+        self.cumulative = read_only(np.cumsum(self.weights))
+        self.cache_size = max(cache_bytes // (4 * max(len(self), 1)), 1)
+        self._seeded_keys = lru_cache(maxsize=self.cache_size)(self._create_keys)
+
+    def __len__(self):
+        return len(self.weights)
+
+    def _create_keys(self, seed):
+        random_state = np.random.RandomState(seed)
+        # places with a weight of zero get an infinite key and come last
+        with np.errstate(divide="ignore"):
+            keys = random_state.standard_exponential(len(self)) / self.weights
+        # cached keys are shared by concurrent requests
+        return read_only(keys.astype(np.float32))
+
+    def keys(self, seed=None):
+        """
+        Get the sorting keys of all places for a seed.
+
+        Parameters
+        ----------
+        seed: int
+            Random seed. If None, fresh random keys are created.
+
+        Returns
+        -------
+        out: ndarray
+            Keys for all places; the lowest key comes first.
+        """
+        if seed is None:
+            return self._create_keys(None)
+        return self._seeded_keys(seed % 2 ** 32)
+
+    def page(self, positions, seed=None, offset=0, n_results=None):
+        """
+        Get one page of places from a weighted random order.
+
+        Only the places up to the end of the page are sorted, so earlier pages
+        are cheaper than a full shuffle.
+
+        Parameters
+        ----------
+        positions: ndarray
+            Row positions of the places to shuffle.
+        seed: int
+            Random seed. If None, a fresh random order is used.
+        offset: int
+            Number of places to skip.
+        n_results: int
+            Number of places to return. Defaults to all remaining places.
+
+        Returns
+        -------
+        out: ndarray
+            Row positions of the places on the page, in shuffled order.
+        """
+        positions = np.asarray(positions, dtype=np.intp)
+        offset = max(offset, 0)
+        stop = len(positions)
+        if n_results is not None:
+            stop = min(offset + n_results, stop)
+        if stop <= offset:
+            return np.empty(0, dtype=np.intp)
+
+        keys = self.keys(seed)[positions]
+        if stop < len(positions):
+            # all places up to the last key of the page, so that tied keys are
+            # in the same order as in the full shuffle
+            last_key = keys[np.argpartition(keys, stop - 1)[stop - 1]]
+            selected = np.flatnonzero(keys <= last_key)
+        else:
+            selected = np.arange(len(positions))
+        selected = selected[np.argsort(keys[selected], kind="stable")]
+
+        return positions[selected[offset:stop]]
+
+    def sample(self, positions, seed=None, n_results=None):
+        """
+        Get a weighted random order of a few places, like `page` but drawing
+        keys for these places only.
+
+        The order for a seed depends on the order of the positions, and is
+        not the same as the order of `page`.
+
+        Parameters
+        ----------
+        positions: ndarray
+            Row positions of the places to shuffle.
+        seed: int
+            Random seed. If None, a fresh random order is used.
+        n_results: int
+            Number of places to return. Defaults to all places.
+
+        Returns
+        -------
+        out: ndarray
+            Row positions of the places, in shuffled order.
+        """
+        positions = np.asarray(positions, dtype=np.intp)
+        # seeding a Generator is much cheaper than seeding a RandomState
+        rng = np.random.default_rng(None if seed is None else seed % 2 ** 32)
+        # places with a weight of zero get an infinite key and come last
+        with np.errstate(divide="ignore"):
+            keys = rng.standard_exponential(len(positions)) / self.weights[positions]
+        order = np.argsort(keys, kind="stable")
+        if n_results is not None:
+            order = order[: max(n_results, 0)]
+        return positions[order]
+
+    def choice(self):
+        """
+        Pick one random place with a probability proportional to its weight.
+
+        Returns
+        -------
+        out: int
+            Row position of the place.
+        """
+        total = self.cumulative[-1]
+        if not total > 0:
+            return np.random.randint(len(self))
+        return int(
+            np.searchsorted(self.cumulative, np.random.random() * total, side="right")
+        )
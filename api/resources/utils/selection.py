@@ -1,10 +1,52 @@
+import re
+import unicodedata
+
+import numpy as np
+
+from .utils import read_only
+
 N_FEATURES = 5
 
+# alternative country names, e.g. as returned by geocoding, mapped to the name in the data
+COUNTRY_ALIASES = {
+    "USA": "United States of America",
+    "US": "United States of America",
+    "United States": "United States of America",
+    "America": "United States of America",
+    "UK": "United Kingdom",
+    "Great Britain": "United Kingdom",
+    "Britain": "United Kingdom",
+    "The Netherlands": "Netherlands",
+    "Holland": "Netherlands",
+    "Czechia": "Czech Republic",
+    "Ivory Coast": "Côte d'Ivoire",
+    "Georgia": "Georgia (country)",
+    "Burma": "Myanmar",
+    "Myanmar (Burma)": "Myanmar",
+    "Timor-Leste": "East Timor",
+    "Swaziland": "Eswatini",
+    "Macedonia": "North Macedonia",
+    "Cabo Verde": "Cape Verde",
+    "Palestine": "Palestinian territories",
+    "DR Congo": "Democratic Republic of the Congo",
+    "Congo-Kinshasa": "Democratic Republic of the Congo",
+    "Congo-Brazzaville": "Republic of the Congo",
+    "Türkiye": "Turkey",
+    "Viet Nam": "Vietnam",
+    "UAE": "United Arab Emirates",
+    "Bahamas, The": "Bahamas",
+    "The Gambia": "Gambia",
+}
+
 
 def filter_on_geolocation(df_in, ne_lat, ne_lng, sw_lat, sw_lng):
-    return df_in.loc[lambda df: (df["lat"] >= sw_lat) & (df["lat"] < ne_lat)].loc[
-        lambda df: (df["lng"] >= sw_lng) & (df["lng"] < ne_lng)
-    ]
+    lat_mask = (df_in["lat"] >= sw_lat) & (df_in["lat"] < ne_lat)
+    # a viewport crossing the 180 degree meridian has its west edge east of its east edge
+    if sw_lng > ne_lng:
+        lng_mask = (df_in["lng"] >= sw_lng) | (df_in["lng"] < ne_lng)
+    else:
+        lng_mask = (df_in["lng"] >= sw_lng) & (df_in["lng"] < ne_lng)
+    return df_in.loc[lat_mask & lng_mask]
 
 
 def select_top_features(place_id, df_in, top_x=N_FEATURES):
@@ -12,3 +54,175 @@ def select_top_features(place_id, df_in, top_x=N_FEATURES):
     Selects top X features with the highes scores and returns them in a list.
     """
     return df_in.loc[place_id].sort_values(ascending=False)[:top_x].index.tolist()
+
+
+class GridIndex:
+    """
+    Grid index for finding places within a map viewport.
+
+    The globe is divided into cells of `cell_size` by `cell_size` degrees. Row
+    positions of the places are stored ordered by cell, so that all places in a
+    band of adjacent cells on the same latitude can be taken with one slice.
+
+    Parameters
+    ----------
+    lat: array-like
+        Latitudes of the places in degrees.
+    lng: array-like
+        Longitudes of the places in degrees.
+    cell_size: float
+        Width and height of a grid cell in degrees.
+    """
+
+    def __init__(self, lat, lng, cell_size=1.0):
+        self.lat = read_only(np.array(lat, dtype=float))
+        self.lng = read_only(np.array(lng, dtype=float))
+        self.cell_size = cell_size
+        self.n_rows = int(np.ceil(180 / cell_size))
+        self.n_cols = int(np.ceil(360 / cell_size))
+
+        cells = self._row(self.lat) * self.n_cols + self._col(self.lng)
+        self.order = read_only(np.argsort(cells, kind="stable"))
+        # places in cell c are at self.order[self.starts[c] : self.starts[c + 1]]
+        self.starts = read_only(
+            np.searchsorted(cells[self.order], np.arange(self.n_rows * self.n_cols + 1))
+        )
+
+    def _row(self, lat):
+        return np.clip(
+            ((np.asarray(lat) + 90) // self.cell_size).astype(int), 0, self.n_rows - 1
+        )
+
+    def _col(self, lng):
+        return np.clip(
+            ((np.asarray(lng) + 180) // self.cell_size).astype(int), 0, self.n_cols - 1
+        )
+
+    def _candidates(self, row_start, row_end, col_start, col_end):
+        return [
+            self.order[
+                self.starts[row * self.n_cols + col_start] : self.starts[
+                    row * self.n_cols + col_end + 1
+                ]
+            ]
+            for row in range(row_start, row_end + 1)
+        ]
+
+    def query(self, ne_lat, ne_lng, sw_lat, sw_lng):
+        """
+        Find places within a viewport.
+
+        Places on the south and west edge are included, places on the north
+        and east edge are not. When the west edge lies east of the east edge,
+        the viewport is taken to cross the 180 degree meridian.
+
+        Parameters
+        ----------
+        ne_lat: float
+            Latitude of the north east corner.
+        ne_lng: float
+            Longitude of the north east corner.
+        sw_lat: float
+            Latitude of the south west corner.
+        sw_lng: float
+            Longitude of the south west corner.
+
+        Returns
+        -------
+        out: ndarray
+            Sorted row positions of the places within the viewport.
+        """
+        if sw_lat >= ne_lat:
+            return np.empty(0, dtype=np.intp)
+
+        row_start, row_end = self._row(sw_lat), self._row(ne_lat)
+        if sw_lng > ne_lng:
+            parts = self._candidates(
+                row_start, row_end, self._col(sw_lng), self.n_cols - 1
+            ) + self._candidates(row_start, row_end, 0, self._col(ne_lng))
+        else:
+            parts = self._candidates(
+                row_start, row_end, self._col(sw_lng), self._col(ne_lng)
+            )
+        candidates = np.concatenate(parts)
+
+        # cells on the edges of the viewport are only partially covered
+        lat, lng = self.lat[candidates], self.lng[candidates]
+        lat_mask = (lat >= sw_lat) & (lat < ne_lat)
+        if sw_lng > ne_lng:
+            lng_mask = (lng >= sw_lng) | (lng < ne_lng)
+        else:
+            lng_mask = (lng >= sw_lng) & (lng < ne_lng)
+
+        return np.sort(candidates[lat_mask & lng_mask])
+
+
+def normalize_country(country):
+    """
+    Normalize a country name for matching: lower case, without accents and
+    with punctuation replaced by single spaces.
+
+    Parameters
+    ----------
+    country: str
+        Country name to normalize.
+
+    Returns
+    -------
+    out: str
+        Normalized country name, e.g. "Côte d'Ivoire" becomes "cote d ivoire".
+    """
+    decomposed = unicodedata.normalize("NFKD", country)
+    stripped = "".join(
+        char for char in decomposed if not unicodedata.combining(char)
+    )
+    return " ".join(re.split(r"\W+", stripped.casefold())).strip()
+
+
+class CountryIndex:
+    """
+    Inverted index from normalized country names to the row positions of the
+    places in that country.
+
+    Parameters
+    ----------
+    countries: array-like
+        Country name of each place.
+    aliases: dict
+        Alternative country names mapped to the country name used in the data.
+    """
+
+    def __init__(self, countries, aliases=COUNTRY_ALIASES):
+        keys = [normalize_country(country) for country in countries]
+        names, codes = np.unique(np.asarray(keys, dtype=object), return_inverse=True)
+        # the positions of a country are views on this array, so they are read-only too
+        order = read_only(np.argsort(codes, kind="stable"))
+        bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+
+        self.positions = {
+            name: order[bounds[i] : bounds[i + 1]] for i, name in enumerate(names)
+        }
+        # names in the data take precedence over aliases
+        for alias, name in aliases.items():
+            key = normalize_country(name)
+            if key in self.positions:
+                self.positions.setdefault(normalize_country(alias), self.positions[key])
+
+    def query(self, country):
+        """
+        Find the places in a country.
+
+        Parameters
+        ----------
+        country: str
+            Country name or alias, matched case and accent insensitive.
+
+        Returns
+        -------
+        out: ndarray
+            Sorted row positions of the places in the country, empty when the
+            country is unknown.
+        """
+        return self.positions.get(
+            normalize_country(country), read_only(np.empty(0, dtype=np.intp))
+        )
@@ -1,3 +1,12 @@
+import numpy as np
+
+
+def read_only(array):
+    """Mark an array as read-only, so shared data can't be modified by accident."""
+    array.flags.writeable = False
+    return array
+
+
 def create_stairwaytotravel_url(place_id):
     """Create a url to a place page given the place id."""
     return "https://stairwaytotravel.com/explore/" + str(place_id)
@@ -9,60 +18,56 @@ def create_html_link(url, text):
     return line
 
 
-def create_one_list_item(
-    df_in, place_id, line_prefix="<li>", line_postfix="", add_link=False
-):
-    """Create one line of text for a given place.
-
-    Parameters
-    ----------
-    df_in: DataFrame
-        DataFrame to look up the place_id in.
-    place_id: int
-        Unique id for the place to generate the line of text for.
-    line_prefix: str
-        Start each line with this string.
-    line_postfix: str
-        End each line with this string.
-    add_link: bool
-        Whether to wrap the text in an html anchor element.
-    Returns
-    -------
-    str
-        A line of text about the specified place.
-    """
-    record = df_in.loc[lambda df: df["id"] == place_id]
-    text = record["name"].iloc[0] + ", " + record["country"].iloc[0]
-    link = create_html_link(create_stairwaytotravel_url(place_id), text)
-    line = line_prefix + (link if add_link else text) + line_postfix
-    return line
-
-
 def create_list_of_likes(
-    df_in, likes, list_prefix="<ul>", list_postfix="</ul>", **kwargs
+    catalog,
+    likes,
+    list_prefix="<ul>",
+    list_postfix="</ul>",
+    line_prefix="<li>",
+    line_postfix="",
+    add_link=False,
 ):
     """Create a string listing the specified liked places.
 
     Parameters
     ----------
-    df_in: DataFrame
-        DataFrame to look up the place_id in.
+    catalog: Catalog
+        Catalog to look up the places in.
     likes: list
         List with unique ids for the places to create the text for.
     list_prefix: str
         Start the list with this string.
     list_postfix: str
         End the list with this string.
+    line_prefix: str
+        Start each line with this string.
+    line_postfix: str
+        End each line with this string.
+    add_link: bool
+        Whether to wrap the text of each place in an html anchor element.
     Returns
     -------
-    str
-        A string listing the specified places.
+    tuple
+        A string listing the specified places that were found, and a list
+        with the ids that were not found.
     """
-    output = list_prefix
-    for like in likes:
-        output = output + create_one_list_item(df_in, like, **kwargs)
-    output = output + list_postfix
-    return output
+    # look up all places at once, -1 for unknown ids
+    positions = catalog.positions.lookup(likes)
+    known = positions >= 0
+    names = catalog.columns["name"][positions[known]].tolist()
+    countries = catalog.columns["country"][positions[known]].tolist()
+
+    lines = []
+    for place_id, name, country in zip(
+        np.asarray(likes)[known].tolist(), names, countries
+    ):
+        text = name + ", " + country
+        if add_link:
+            text = create_html_link(create_stairwaytotravel_url(place_id), text)
+        lines.append(line_prefix + text + line_postfix)
+
+    unknown = [like for like, found in zip(likes, known) if not found]
+    return list_prefix + "".join(lines) + list_postfix, unknown
 
 
 def split_text_in_chuncks(text, max_characters=255, split_character=">"):
@@ -136,9 +141,11 @@ def add_normalized_column(df, column_name):
     Returns
     -------
     out: DataFrame
-        DataFrame with a normalized column having postfix "_norm".
+        Copy of the DataFrame with a normalized column having postfix "_norm".
     """
-    df[f"{column_name}_norm"] = (df[column_name] - df[column_name].min()) / (
-        df[column_name].max() - df[column_name].min()
+    return df.assign(
+        **{
+            f"{column_name}_norm": (df[column_name] - df[column_name].min())
+            / (df[column_name].max() - df[column_name].min())
+        }
     )
-    return df
@@ -0,0 +1,147 @@
+"""
+Throughput in articles per second of reading the features of Wikivoyage
+articles and removing their templates, before and after the single pass
+template scanner.
+
+Before: one regular expression search of the article per feature, two of them
+for the last match, and a character by character walk to remove the
+templates. After: one `scan_templates` for both. Uses the articles of a dump
+if given, otherwise synthetic articles with the size and templates of a
+typical Wikivoyage city article:
+
+    python scripts/wikivoyage_templates_benchmark.py
+    python scripts/wikivoyage_templates_benchmark.py \
+        --dump data/wikivoyage/raw/enwikivoyage-20191001-pages-articles.xml.bz2
+"""
+import argparse
+import bz2
+import random
+import time
+from itertools import islice
+from xml.etree.ElementTree import iterparse
+
+from stairway.sources.wikivoyage.templates import (
+    extract_article_type,
+    extract_disambiguation,
+    extract_geolocation,
+    extract_historical,
+    extract_ispartof,
+    extract_patterns,
+    remove_template,
+    scan_templates,
+)
+
+LISTINGS = ["see", "do", "buy", "eat", "drink", "sleep"]
+
+
+def main(*args):
+    options = parse_args(*args)
+    if options.dump:
+        articles = list(islice(read_dump(options.dump), options.articles))
+    else:
+        articles = synthetic_articles(options.articles)
+    n_chars = sum(len(article) for article in articles)
+    print(f"{len(articles)} articles, {n_chars / len(articles):.0f} characters each")
+
+    for label, func in [("before", parse_before), ("after", parse_after)]:
+        start = time.perf_counter()
+        for article in articles:
+            func(article)
+        duration = time.perf_counter() - start
+        print(f"{label:>6} | {len(articles) / duration:9.0f} articles/s")
+
+
+def parse_args(*args):
+    parser = argparse.ArgumentParser(description="Benchmark template parsing.")
+    parser.add_argument("--dump", help="Path to a pages-articles .xml.bz2 dump.")
+    parser.add_argument("--articles", type=int, default=2000)
+    return parser.parse_args(args)
+
+
+def read_dump(path):
+    """Yield the text of every page of a dump."""
+    with bz2.open(path) as f:
+        for _, elem in iterparse(f):
+            if elem.tag.endswith("}text"):
+                yield elem.text or ""
+            elif elem.tag.endswith("}page"):
+                elem.clear()
+
+
+def synthetic_articles(n, seed=1234):
+    """Articles with a banner, a quickbar, listings and the feature templates."""
+    rng = random.Random(seed)
+    articles = []
+    for i in range(n):
+        lines = [
+            "{{pagebanner|Place %d banner.jpg}}" % i,
+            "{{Quickbar|image=Place.jpg|location={{geo|%.4f|%.4f}}}}"
+            % (rng.uniform(-60, 60), rng.uniform(-180, 180)),
+        ]
+        for _ in range(rng.randint(20, 80)):
+            lines.append(
+                "* {{%s | name=Listing %d | url=http://example.com | "
+                "lat=%.4f | long=%.4f | content=Open daily {{price|%d}}.}} "
+                "A [[link]] with ''some'' text about the place and its history."
+                % (
+                    rng.choice(LISTINGS),
+                    rng.randrange(1000),
+                    rng.uniform(-60, 60),
+                    rng.uniform(-180, 180),
+                    rng.randrange(100),
+                )
+            )
+        lines.append("{{geo|%.4f|%.4f}}" % (rng.uniform(-60, 60), rng.uniform(-180, 180)))
+        lines.append("{{%s}}" % rng.choice(["outlinecity", "usablecity", "guidecity"]))
+        lines.append("{{IsPartOf|Region_%d}}" % rng.randrange(100))
+        articles.append("\n".join(lines))
+    return articles
+
+
+def parse_before(article):
+    features = (
+        extract_article_type(article),
+        extract_geolocation(article),
+        extract_ispartof(article),
+        extract_disambiguation(article),
+        extract_historical(article),
+    )
+    return features, remove_template_by_character(article)
+
+
+def parse_after(article):
+    templates, spans = scan_templates(article)
+    return extract_patterns(article, templates), remove_template(article, spans)
+
+
+def remove_template_by_character(s):
+    """The template removal of parsing.py before `scan_templates`."""
+    n_open, n_close = 0, 0
+    starts, ends = [], [-1]
+    in_template = False
+    prev_c = None
+    for i, c in enumerate(s):
+        if not in_template:
+            if c == "{" and c == prev_c:
+                starts.append(i - 1)
+                in_template = True
+                n_open = 1
+        if in_template:
+            if c == "{":
+                n_open += 1
+            elif c == "}":
+                n_close += 1
+            if n_open == n_close:
+                ends.append(i)
+                in_template = False
+                n_open, n_close = 0, 0
+        prev_c = c
+
+    starts.append(None)
+    return "".join(s[end + 1 : start] for end, start in zip(ends, starts))
+
+
+if __name__ == "__main__":
+    import sys
+
+    main(*sys.argv[1:])
@@ -1,7 +1,9 @@
+import os
 import random
 
 import pandas as pd
 
+from stairway.sources.wikivoyage.snapshot import write_snapshot_from_csv
 from stairway.utils.utils import add_normalized_column
 from stairway.wikivoyage.preprocessing import scope_minimal_nr_tokens
 
@@ -34,6 +36,10 @@ def main(*args):
     )
     df.to_csv(options.output_path, index=False)
     df.pipe(prepare_for_api).to_csv(options.api_path, index=False)
+    # refresh the binary snapshot that the API loads at startup
+    api_dir = os.path.dirname(options.api_path)
+    if os.path.exists(os.path.join(api_dir, "wikivoyage_features.csv")):
+        write_snapshot_from_csv(api_dir)
 
 
 def parse_args(*args):
@@ -0,0 +1,94 @@
+"""
+Read a multistream Wikimedia dump one bz2 stream at a time.
+
+A multistream dump, like `enwikivoyage-20191001-pages-articles-multistream.xml.bz2`,
+is a series of independent bz2 streams: one with the `<mediawiki>` header and
+site info, then streams of 100 pages each. The index next to it,
+`...-multistream-index.txt.bz2`, has a line `offset:page id:title` for every
+page, with the byte offset of the stream the page is in. With the offsets,
+every stream can be decompressed and parsed on its own, by another process.
+"""
+import bz2
+import os
+import re
+
+RE_ROOT = re.compile(rb"<mediawiki[^>]*>")
+ROOT_END = b"</mediawiki>"
+
+
+def find_index(fname):
+    """
+    Return the path of the index of a multistream dump, or None if there is
+    no index next to the dump.
+    """
+    if not fname.endswith(".xml.bz2"):
+        return None
+    base = fname[: -len(".xml.bz2")]
+    for index_fname in [base + "-index.txt.bz2", base + "-index.txt"]:
+        if os.path.exists(index_fname):
+            return index_fname
+    return None
+
+
+def read_offsets(index_fname):
+    """Return the sorted, unique stream offsets of a multistream index."""
+    opener = bz2.open if index_fname.endswith(".bz2") else open
+    with opener(index_fname, "rt", encoding="utf-8") as f:
+        return sorted({int(line.split(":", 1)[0]) for line in f if line.strip()})
+
+
+def read_streams(fname, index_fname):
+    """
+    Read the header of a multistream dump and the byte ranges of its streams.
+
+    Parameters
+    ----------
+    fname: str
+        Path to the dump.
+    index_fname: str
+        Path to the index of the dump.
+
+    Returns
+    -------
+    out: tuple
+        The opening `<mediawiki ...>` tag of the dump, with its namespaces,
+        and a list of (start, end) byte ranges of the streams with pages.
+        The last range runs to the end of the file.
+    """
+    offsets = read_offsets(index_fname)
+    if not offsets:
+        raise ValueError("%s lists no streams" % index_fname)
+    with open(fname, "rb") as f:
+        header = bz2.decompress(f.read(offsets[0]))
+        size = f.seek(0, os.SEEK_END)
+    match = RE_ROOT.search(header)
+    if match is None:
+        raise ValueError("%s doesn't start with a <mediawiki> header" % fname)
+    return match.group(), list(zip(offsets, offsets[1:] + [size]))
+
+
+def read_stream(fname, start, end, root):
+    """
+    Decompress the stream between `start` and `end` of a multistream dump, as
+    an XML document with the pages of the stream.
+
+    Parameters
+    ----------
+    fname: str
+        Path to the dump.
+    start, end: int
+        Byte range of the stream.
+    root: bytes
+        Opening `<mediawiki ...>` tag of the dump, see `read_streams`.
+
+    Returns
+    -------
+    out: bytes
+        The pages of the stream between the opening and closing tag of the
+        dump.
+    """
+    with open(fname, "rb") as f:
+        f.seek(start)
+        # the last range also holds the stream that closes the dump
+        pages = bz2.decompress(f.read(end - start)).replace(ROOT_END, b"")
+    return root + pages + ROOT_END
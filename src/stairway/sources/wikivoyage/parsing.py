@@ -19,10 +19,14 @@ See :mod:`gensim.scripts.make_wiki` for a canned (example) command-line script b
 
 import bz2
 import csv
+import io
 import logging
 import multiprocessing
+import pickle
 import re
 import signal
+from collections import deque
+from itertools import islice
 from pickle import PicklingError
 from xml.etree.cElementTree import (  # LXML isn't faster, so let's go with the built-in solution
     iterparse,
@@ -33,6 +37,25 @@ from gensim import utils
 from gensim.corpora.dictionary import Dictionary
 from gensim.corpora.textcorpus import TextCorpus
 from six import raise_from
+from stairway.sources.wikivoyage.multistream import (
+    find_index,
+    read_stream,
+    read_streams,
+)
+from stairway.sources.wikivoyage.templates import (
+    extract_patterns,
+    remove_template,
+    scan_templates,
+)
+
+# the single feature functions moved to templates.py, still importable from here
+from stairway.sources.wikivoyage.templates import (  # noqa: F401
+    extract_article_type,
+    extract_disambiguation,
+    extract_geolocation,
+    extract_historical,
+    extract_ispartof,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -219,85 +242,6 @@ def filter_wiki(
     )
 
 
-def extract_geolocation(s):
-    """Retrieves geolocation from wikivoyage article text."""
-    # (?s:.*) to match at furthest position and gradually back off
-    pattern = re.compile(
-        r"(?s:.*){{(geo|mapframe)\|([-]?[0-9]+[.]?[0-9]*)[^|}{]*\|([-]?[0-9]+[.]?[0-9]*)([^}{]*)}}",
-        re.DOTALL | re.UNICODE | re.IGNORECASE,
-    )
-
-    # get geo coordinates if available
-    match = re.search(pattern, s)
-    lat, lon = (
-        (float(match.group(2)), float(match.group(3)))
-        if match
-        else (None, None)
-    )
-    return lat, lon
-
-
-def extract_article_type(s):
-    """Retrieves wikivoyage article type and status features from text."""
-    pattern = re.compile(
-        r"{{(outline|usable|guide|star|extra)(\w*)([^}{]*)}}",
-        re.DOTALL | re.UNICODE | re.IGNORECASE,
-    )
-
-    match = re.search(pattern, s)
-    # return matches if available
-    status, articletype = (
-        (match.group(1).strip().lower(), match.group(2).strip().lower())
-        if match
-        else (None, None)
-    )
-    return status, articletype
-
-
-def extract_ispartof(s):
-    """Retrieves wikivoyage `{{IsPartOf|...}}` feature from text."""
-    pattern = re.compile(
-        r"(?s:.*){{(ispartof|isin)\|([^}{]*)}}",
-        re.DOTALL | re.UNICODE | re.IGNORECASE,
-    )
-
-    match = re.search(pattern, s)
-    # return matches if available
-    return match.group(2).strip().replace("_", " ") if match else None
-
-
-def extract_disambiguation(s):
-    """Retrieves wikivoyage disambiguation feature from text."""
-    pattern = re.compile(
-        r"{{(disamb|disambig|pagebanner\|Disambiguation banner.png)[^}{]*}}",
-        re.DOTALL | re.UNICODE | re.IGNORECASE,
-    )
-
-    match = re.search(pattern, s)
-    return True if match else False
-
-
-def extract_historical(s):
-    """Retrieves wikivoyage disambiguation feature from text."""
-    pattern = re.compile(
-        r"{{(historical)[^}{]*}}", re.DOTALL | re.UNICODE | re.IGNORECASE
-    )
-
-    match = re.search(pattern, s)
-    return True if match else False
-
-
-def extract_patterns(s):
-    """Retrieves several features from the input string and outputs them in a tuple."""
-    status, articletype = extract_article_type(s)
-    lat, lon = extract_geolocation(s)
-    ispartof = extract_ispartof(s)
-    disambiguation = extract_disambiguation(s)
-    historical = extract_historical(s)
-
-    return status, articletype, lat, lon, ispartof, disambiguation, historical
-
-
 def remove_markup(
     text, promote_remaining=True, simplify_links=True, extract_features=False
 ):
@@ -318,15 +262,23 @@ def remove_markup(
         `text` without markup.
     """
     # ADJ: first capture important info, before removing the markup!
+    # one scan finds the templates for both the features and their removal
+    templates, spans = scan_templates(text)
     if extract_features:
-        patterns = extract_patterns(text)
-
-    text = re.sub(RE_P2, "", text)  # remove the last list (=languages)
+        patterns = extract_patterns(text, templates)
+
+    # remove the last list (=languages)
+    match = re.search(RE_P2, text)
+    if match:
+        text = text[: match.start()] + text[match.end() :]
+        # the templates all end before the list, unless it contains braces
+        if "{" in match.group() or "}" in match.group():
+            spans = None
     # the wiki markup is recursive (markup inside markup etc)
     # instead of writing a recursive grammar, here we deal with that by removing
     # markup in a loop, starting with inner-most expressions and working outwards,
     # for as long as something changes.
-    text = remove_template(text)
+    text = remove_template(text, spans)
     text = remove_file(text)
     iters = 0
     while True:
@@ -375,48 +327,6 @@ def remove_markup(
         return text
 
 
-def remove_template(s):
-    """Remove template wikimedia markup.
-    Parameters
-    ----------
-    s : str
-        String containing markup template.
-    Returns
-    -------
-    str
-        Сopy of `s` with all the `wikimedia markup template <http://meta.wikimedia.org/wiki/Help:Template>`_ removed.
-    Notes
-    -----
-    Since template can be nested, it is difficult remove them using regular expressions.
-    """
-    # Find the start and end position of each template by finding the opening
-    # '{{' and closing '}}'
-    n_open, n_close = 0, 0
-    starts, ends = [], [-1]
-    in_template = False
-    prev_c = None
-    for i, c in enumerate(s):
-        if not in_template:
-            if c == "{" and c == prev_c:
-                starts.append(i - 1)
-                in_template = True
-                n_open = 1
-        if in_template:
-            if c == "{":
-                n_open += 1
-            elif c == "}":
-                n_close += 1
-            if n_open == n_close:
-                ends.append(i)
-                in_template = False
-                n_open, n_close = 0, 0
-        prev_c = c
-
-    # Remove all the templates
-    starts.append(None)
-    return "".join(s[end + 1 : start] for end, start in zip(ends, starts))
-
-
 def remove_file(s):
     """Remove the 'File:' and 'Image:' markup, keeping the file caption.
     Parameters
@@ -652,6 +562,49 @@ def _process_article(args):
     )
 
 
+def _process_stream(args):
+    """Decompress and parse one stream of a multistream dump, and process its articles.
+    Parameters
+    ----------
+    args : (str, int, int, bytes, tuple of str, function, bool, (function, int, int, bool))
+        Dump file name, byte range of the stream, opening tag of the dump (see
+        :func:`~stairway.sources.wikivoyage.multistream.read_streams`), namespaces, article filter,
+        lemmatize flag and tokenization parameters.
+    Returns
+    -------
+    list
+        Same as :func:`~gensim.corpora.wikicorpus.process_article` for every article of the stream.
+    """
+    (
+        fname,
+        start,
+        end,
+        root,
+        filter_namespaces,
+        filter_articles,
+        lemmatize,
+        tokenization_params,
+    ) = args
+    f = io.BytesIO(read_stream(fname, start, end, root))
+    return [
+        _process_article(
+            (text, lemmatize, title, pageid, redirect, tokenization_params)
+        )
+        for title, text, pageid, redirect in extract_pages(
+            f, filter_namespaces, filter_articles
+        )
+    ]
+
+
+def can_pickle(obj):
+    """Whether `obj` can be sent to other processes."""
+    try:
+        pickle.dumps(obj)
+    except Exception:
+        return False
+    return True
+
+
 class WikiCorpus(TextCorpus):
     """Treat a Wikipedia articles dump as a read-only, streamed, memory-efficient corpus.
     Supported dump formats:
@@ -669,6 +622,10 @@ class WikiCorpus(TextCorpus):
     --------
     "Multistream" archives are *not* supported in Python 2 due to `limitations in the core bz2 library
     <https://docs.python.org/2/library/bz2.html#de-compression-of-files>`_.
+    With the index of a multistream archive, every worker process decompresses and parses its own
+    streams, so that reading the dump isn't limited to one core. The workers then also filter the
+    articles, so `filter_articles` has to be picklable, e.g. a module level function. Otherwise the
+    dump is read in this process, like a dump without an index.
     Examples
     --------
     .. sourcecode:: pycon
@@ -695,6 +652,7 @@ class WikiCorpus(TextCorpus):
         token_max_len=TOKEN_MAX_LEN,
         lower=True,
         filter_articles=None,
+        index_fname=None,
     ):
         """Initialize the corpus.
         Unless a dictionary is provided, this scans the corpus once,
@@ -728,12 +686,18 @@ class WikiCorpus(TextCorpus):
         filter_articles: callable or None, optional
             If set, each XML article element will be passed to this callable before being processed. Only articles
             where the callable returns an XML element are processed, returning None allows filtering out
-            some articles based on customised rules.
+            some articles based on customised rules. A multistream dump is only read in parallel
+            when the callable can be pickled.
+        index_fname: str or None, optional
+            Path to the `-multistream-index.txt` or `-multistream-index.txt.bz2` file of a multistream dump.
+            Defaults to the index next to `fname`, if there is one. Without an index the dump is read as
+            a single stream.
         Warnings
         --------
         Unless a dictionary is provided, this scans the corpus once, to determine its vocabulary.
         """
         self.fname = fname
+        self.index_fname = find_index(fname) if index_fname is None else index_fname
         self.filter_namespaces = filter_namespaces
         self.filter_articles = filter_articles
         self.metadata = False
@@ -786,62 +750,53 @@ class WikiCorpus(TextCorpus):
             self.token_max_len,
             self.lower,
         )
-        texts = (
-            (
-                text,
-                self.lemmatize,
-                title,
-                pageid,
-                redirect,
-                tokenization_params,
-            )
-            for title, text, pageid, redirect in extract_pages(
-                bz2.BZ2File(self.fname),
-                self.filter_namespaces,
+        pool = multiprocessing.Pool(self.processes, init_to_ignore_interrupt)
+        if self.index_fname is None:
+            processed = self._process_single_stream(pool, tokenization_params)
+        elif not can_pickle(self.filter_articles):
+            logger.info(
+                "reading %s in one process, %r can't be sent to other processes",
+                self.fname,
                 self.filter_articles,
             )
-        )
-        pool = multiprocessing.Pool(self.processes, init_to_ignore_interrupt)
+            processed = self._process_single_stream(pool, tokenization_params)
+        else:
+            processed = self._process_multistream(pool, tokenization_params)
 
         try:
-            # process the corpus in smaller chunks of docs, because multiprocessing.Pool
-            # is dumb and would load the entire input into RAM at once...
-            for group in utils.chunkize(
-                texts, chunksize=10 * self.processes, maxsize=1
-            ):
-                # ADJ: also return patterns and text
-                for (
-                    patterns,
-                    text,
-                    tokens,
-                    title,
-                    pageid,
-                    redirect,
-                ) in pool.imap(_process_article, group):
-                    # ADJ: keep track of nr of tokensx
-                    nr_tokens = len(tokens)
-                    articles_all += 1
-                    positions_all += nr_tokens
-                    # article redirects and short stubs are pruned here
-                    if nr_tokens < self.article_min_tokens or any(
-                        title.startswith(ignore + ":")
-                        for ignore in IGNORED_NAMESPACES
-                    ):
-                        continue
-                    articles += 1
-                    positions += nr_tokens
-                    # ADJ: return items of our desire, incl. count of number of tokens
-                    if self.metadata:
-                        yield (
-                            pageid,
-                            title,
-                            redirect,
-                            nr_tokens,
-                            patterns,
-                            text,
-                        )
-                    else:
-                        yield tokens
+            # ADJ: also return patterns and text
+            for (
+                patterns,
+                text,
+                tokens,
+                title,
+                pageid,
+                redirect,
+            ) in processed:
+                # ADJ: keep track of nr of tokensx
+                nr_tokens = len(tokens)
+                articles_all += 1
+                positions_all += nr_tokens
+                # article redirects and short stubs are pruned here
+                if nr_tokens < self.article_min_tokens or any(
+                    title.startswith(ignore + ":")
+                    for ignore in IGNORED_NAMESPACES
+                ):
+                    continue
+                articles += 1
+                positions += nr_tokens
+                # ADJ: return items of our desire, incl. count of number of tokens
+                if self.metadata:
+                    yield (
+                        pageid,
+                        title,
+                        redirect,
+                        nr_tokens,
+                        patterns,
+                        text,
+                    )
+                else:
+                    yield tokens
 
         except KeyboardInterrupt:
             logger.warn(
@@ -877,6 +832,66 @@ class WikiCorpus(TextCorpus):
         finally:
             pool.terminate()
 
+    def _process_single_stream(self, pool, tokenization_params):
+        """Read the dump in this process and process its articles in the pool."""
+        texts = (
+            (
+                text,
+                self.lemmatize,
+                title,
+                pageid,
+                redirect,
+                tokenization_params,
+            )
+            for title, text, pageid, redirect in extract_pages(
+                bz2.BZ2File(self.fname),
+                self.filter_namespaces,
+                self.filter_articles,
+            )
+        )
+        # process the corpus in smaller chunks of docs, because multiprocessing.Pool
+        # is dumb and would load the entire input into RAM at once...
+        for group in utils.chunkize(
+            texts, chunksize=10 * self.processes, maxsize=1
+        ):
+            for article in pool.imap(_process_article, group):
+                yield article
+
+    def _process_multistream(self, pool, tokenization_params):
+        """Decompress, read and process every stream of the dump in the pool, in order."""
+        root, ranges = read_streams(self.fname, self.index_fname)
+        logger.info(
+            "reading %i streams of %s in %i processes",
+            len(ranges),
+            self.fname,
+            self.processes,
+        )
+        streams = (
+            (
+                self.fname,
+                start,
+                end,
+                root,
+                self.filter_namespaces,
+                self.filter_articles,
+                self.lemmatize,
+                tokenization_params,
+            )
+            for start, end in ranges
+        )
+        # a few streams per process at a time, to keep the results in RAM small:
+        # the next stream is sent as soon as the result of the oldest one is in
+        results = deque(
+            pool.apply_async(_process_stream, (args,))
+            for args in islice(streams, 4 * self.processes)
+        )
+        while results:
+            articles = results.popleft().get()
+            for args in islice(streams, 1):
+                results.append(pool.apply_async(_process_stream, (args,)))
+            for article in articles:
+                yield article
+
     def write_to_csv(self, file_path):
 
         f = open(file_path, "w", encoding="utf-8")
@@ -0,0 +1,256 @@
+"""
+Binary snapshot of the API data.
+
+The API data is exported as CSV files, which are slow to parse when the API
+starts. A snapshot stores the same data as `.npy` arrays that the API can
+memory-map at startup. The layout of a snapshot directory is:
+
+    snapshots/
+    ├── CURRENT                  # name of the version the API should load
+    └── <version>/
+        ├── manifest.json        # tables, columns, dtypes and files
+        ├── destinations.<i>.npy # one array per destinations column, and a
+        │                        # .missing.npy mask for missing text values
+        ├── features.npy         # float32 matrix aligned with destinations
+        └── feature_types.<i>.npy
+
+The version is a hash of the data, so exporting unchanged data results in the
+same version.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+# the API reads snapshots and is deployed on its own, so the definitions of the
+# format are in api/common/snapshot.py; the API is run from within api/
+API_DIR = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), *[os.pardir] * 4, "api")
+)
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from common.snapshot import (  # noqa: E402
+    CURRENT_FILE,
+    MANIFEST_FILE,
+    SNAPSHOT_FORMAT,
+    get_current_version,
+)
+
+
+def main(*args):
+    options = parse_args(*args)
+    version = write_snapshot_from_csv(options.data_dir, options.snapshot_dir)
+    print(f"Wrote API data snapshot {version}")
+
+
+def parse_args(*args):
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        description="Create a binary snapshot of API data."
+    )
+    parser.add_argument(
+        "-d",
+        "--data-dir",
+        dest="data_dir",
+        default="api/data",
+        help="Path to the folder with the API CSV files.",
+    )
+    parser.add_argument(
+        "-s",
+        "--snapshot-dir",
+        dest="snapshot_dir",
+        default=None,
+        help="Path to the snapshot folder. Default: 'snapshots/' in data-dir.",
+    )
+
+    return parser.parse_args(args=args)
+
+
+def write_snapshot_from_csv(data_dir, snapshot_dir=None):
+    """
+    Create a snapshot from the CSV files in the API data folder.
+
+    Parameters
+    ----------
+    data_dir: str
+        Folder containing 'wikivoyage_destinations.csv',
+        'wikivoyage_features.csv' and 'wikivoyage_features_types.csv'.
+    snapshot_dir: str
+        Folder to write the snapshot to. Defaults to 'snapshots/' in
+        `data_dir`.
+
+    Returns
+    -------
+    out: str
+        Version of the written snapshot.
+    """
+    if snapshot_dir is None:
+        snapshot_dir = os.path.join(data_dir, "snapshots")
+    return write_snapshot(
+        pd.read_csv(os.path.join(data_dir, "wikivoyage_destinations.csv")),
+        pd.read_csv(
+            os.path.join(data_dir, "wikivoyage_features.csv")
+        ).set_index("id"),
+        pd.read_csv(os.path.join(data_dir, "wikivoyage_features_types.csv")),
+        snapshot_dir,
+    )
+
+
+def write_snapshot(
+    df_destinations, df_features, df_feature_types, snapshot_dir, keep=2
+):
+    """
+    Write the API data as a new snapshot version and make it the current one.
+
+    Parameters
+    ----------
+    df_destinations: DataFrame
+        Destinations data with an 'id' column.
+    df_features: DataFrame
+        Feature scores for all places, indexed on 'id'.
+    df_feature_types: DataFrame
+        Data set that tells which features belong to which feature profiles.
+    snapshot_dir: str
+        Folder containing all snapshot versions.
+    keep: int
+        Number of most recent versions to keep, including the new one.
+
+    Returns
+    -------
+    out: str
+        Version of the written snapshot.
+    """
+    destinations = to_column_arrays(df_destinations)
+    # align features with the destinations, to look up rows by position
+    features = (
+        df_features.reindex(index=df_destinations["id"].values)
+        .fillna(0)
+        .values.astype(np.float32)
+    )
+    feature_types = to_column_arrays(df_feature_types)
+
+    digest = hashlib.sha1()
+    for name, array, missing in (
+        destinations + [("features", features, None)] + feature_types
+    ):
+        digest.update(
+            f"{name}:{array.dtype.str}:{array.shape}".encode("utf-8")
+        )
+        digest.update(np.ascontiguousarray(array).tobytes())
+        if missing is not None:
+            digest.update(missing.tobytes())
+    digest.update(json.dumps(list(df_features.columns)).encode("utf-8"))
+    version = digest.hexdigest()[:12]
+
+    created = datetime.datetime.utcnow().isoformat(timespec="seconds")
+    version_dir = os.path.join(snapshot_dir, version)
+    if not os.path.exists(os.path.join(version_dir, MANIFEST_FILE)):
+        # write to a temporary folder first, so readers never see half of it
+        tmp_dir = version_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": version,
+            "created": created + "Z",
+            "tables": {
+                "destinations": save_columns(
+                    tmp_dir, "destinations", destinations
+                ),
+                "features": {
+                    "file": "features.npy",
+                    "dtype": features.dtype.str,
+                    "shape": list(features.shape),
+                    "columns": list(df_features.columns),
+                },
+                "feature_types": save_columns(
+                    tmp_dir, "feature_types", feature_types
+                ),
+            },
+        }
+        np.save(os.path.join(tmp_dir, "features.npy"), features)
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+        shutil.rmtree(version_dir, ignore_errors=True)
+        os.rename(tmp_dir, version_dir)
+
+    set_current_version(snapshot_dir, version)
+    remove_old_versions(snapshot_dir, keep=keep)
+    return version
+
+
+def to_column_arrays(df_in):
+    """
+    Convert a DataFrame to a list of (column name, array, missing) tuples, with
+    text columns as fixed width unicode arrays that can be memory-mapped.
+
+    Missing text values are stored as empty strings, with a boolean array
+    `missing` that marks them. `missing` is None for columns without missing
+    text values.
+    """
+    columns = []
+    for name in df_in.columns:
+        missing = None
+        if pd.api.types.is_numeric_dtype(df_in[name]):
+            values = df_in[name].to_numpy()
+        else:
+            is_missing = df_in[name].isna().to_numpy()
+            if is_missing.any():
+                missing = is_missing
+            values = df_in[name].where(~is_missing, "").to_numpy(dtype=str)
+        columns.append((str(name), np.ascontiguousarray(values), missing))
+    return columns
+
+
+def save_columns(directory, table, columns):
+    """Save column arrays as .npy files and return their manifest entry."""
+    entries = []
+    for i, (name, array, missing) in enumerate(columns):
+        file_name = f"{table}.{i}.npy"
+        np.save(os.path.join(directory, file_name), array)
+        entry = {"name": name, "file": file_name, "dtype": array.dtype.str}
+        if missing is not None:
+            entry["missing"] = f"{table}.{i}.missing.npy"
+            np.save(os.path.join(directory, entry["missing"]), missing)
+        entries.append(entry)
+    n_rows = len(columns[0][1]) if columns else 0
+    return {"n_rows": n_rows, "columns": entries}
+
+
+def set_current_version(snapshot_dir, version):
+    """Atomically point the CURRENT file to a snapshot version."""
+    current_path = os.path.join(snapshot_dir, CURRENT_FILE)
+    with open(current_path + ".tmp", "w") as f:
+        f.write(version + "\n")
+    os.replace(current_path + ".tmp", current_path)
+
+
+def remove_old_versions(snapshot_dir, keep=2):
+    """Remove all but the `keep` most recently created snapshot versions."""
+    versions = sorted(
+        (
+            entry
+            for entry in os.scandir(snapshot_dir)
+            if entry.is_dir() and not entry.name.endswith(".tmp")
+        ),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    current = get_current_version(snapshot_dir)
+    for entry in versions[keep:]:
+        if entry.name != current:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import sys
+
+    main(*sys.argv[1:])
@@ -0,0 +1,229 @@
+"""
+Wikivoyage templates: find them in an article in one pass, read the article
+features from them and remove them from the text.
+
+An article is scanned once by `scan_templates`, which walks the runs of braces
+of the article and returns:
+
+- templates: every innermost template, at any depth, i.e. the text between
+  `{{` and `}}` that contains no other braces. The features of an article,
+  like `{{geo|lat|lon}}` or `{{usablecity}}`, are always innermost templates.
+- spans: the outermost templates, from their first `{{` up to the brace that
+  balances all braces opened since, which are removed from the text.
+
+`extract_patterns` reads all features from the templates and `remove_template`
+removes the spans, so that parsing an article needs one scan for both. The
+single feature functions `extract_geolocation`, `extract_article_type`,
+`extract_ispartof`, `extract_disambiguation` and `extract_historical` search
+the whole article with a regular expression and give the same results.
+"""
+import re
+
+# the start of the text of an innermost template, for every feature
+RE_GEOLOCATION = re.compile(
+    r"(geo|mapframe)\|([-]?[0-9]+[.]?[0-9]*)[^|]*\|([-]?[0-9]+[.]?[0-9]*)",
+    re.DOTALL | re.UNICODE | re.IGNORECASE,
+)
+RE_ARTICLE_TYPE = re.compile(
+    r"(outline|usable|guide|star|extra)(\w*)", re.DOTALL | re.UNICODE | re.IGNORECASE
+)
+RE_ISPARTOF = re.compile(
+    r"(ispartof|isin)\|(.*)", re.DOTALL | re.UNICODE | re.IGNORECASE
+)
+RE_DISAMBIGUATION = re.compile(
+    r"disamb|disambig|pagebanner\|Disambiguation banner.png",
+    re.DOTALL | re.UNICODE | re.IGNORECASE,
+)
+RE_HISTORICAL = re.compile(r"historical", re.DOTALL | re.UNICODE | re.IGNORECASE)
+
+
+def scan_templates(s):
+    """
+    Find the innermost and outermost templates of a text in one pass.
+
+    Parameters
+    ----------
+    s: str
+        Text with wiki markup.
+
+    Returns
+    -------
+    out: tuple
+        The innermost templates as a list of (start, text) in order of
+        appearance, with `start` the position of the opening `{{` and `text`
+        what's between the braces. And the outermost templates as a list of
+        (start, end) spans, `end` excluded. The last span ends at None when
+        its braces are never balanced.
+    """
+    templates, spans = [], []
+    # start and brace balance of the outermost template, if in one
+    start, depth = None, 0
+    # end of the last run of two or more opening braces, if it's the last run
+    opened = None
+    # str.find skips the text between braces much faster than a regex or loop
+    find = s.find
+    next_open, next_close = find("{"), find("}")
+    while next_open != -1 or next_close != -1:
+        if next_close == -1 or -1 < next_open < next_close:
+            position = end = next_open
+            while s[end : end + 1] == "{":
+                end += 1
+            next_open = find("{", end)
+            n_braces = end - position
+            if start is not None:
+                depth += n_braces
+            elif n_braces > 1:
+                start, depth = position, n_braces
+            opened = end if n_braces > 1 else None
+            continue
+
+        position = end = next_close
+        while s[end : end + 1] == "}":
+            end += 1
+        next_close = find("}", end)
+        n_braces = end - position
+        # no braces between `{{` and `}}`: an innermost template
+        if opened is not None and n_braces > 1:
+            templates.append((opened - 2, s[opened:position]))
+        opened = None
+        if start is not None:
+            if n_braces >= depth:
+                spans.append((start, position + depth))
+                start = None
+            else:
+                depth -= n_braces
+    if start is not None:
+        spans.append((start, None))
+    return templates, spans
+
+
+def extract_patterns(s, templates=None):
+    """
+    Retrieves several features from the input string and outputs them in a
+    tuple, from the templates found by `scan_templates` if given.
+
+    Returns
+    -------
+    out: tuple
+        Status, article type, latitude, longitude, IsPartOf, disambiguation
+        and historical. The first status template and the last geo and
+        IsPartOf templates are used.
+    """
+    if templates is None:
+        templates, _ = scan_templates(s)
+
+    status = articletype = lat = lon = ispartof = None
+    disambiguation = historical = False
+    for _, text in templates:
+        if status is None:
+            match = RE_ARTICLE_TYPE.match(text)
+            if match:
+                status = match.group(1).strip().lower()
+                articletype = match.group(2).strip().lower()
+        match = RE_GEOLOCATION.match(text)
+        if match:
+            lat, lon = float(match.group(2)), float(match.group(3))
+        match = RE_ISPARTOF.match(text)
+        if match:
+            ispartof = match.group(2).strip().replace("_", " ")
+        if not disambiguation and RE_DISAMBIGUATION.match(text):
+            disambiguation = True
+        if not historical and RE_HISTORICAL.match(text):
+            historical = True
+
+    return status, articletype, lat, lon, ispartof, disambiguation, historical
+
+
+def remove_template(s, spans=None):
+    """Remove template wikimedia markup.
+    Parameters
+    ----------
+    s : str
+        String containing markup template.
+    spans : list of tuple, optional
+        Outermost templates of `s` found by `scan_templates`.
+    Returns
+    -------
+    str
+        Сopy of `s` with all the `wikimedia markup template <http://meta.wikimedia.org/wiki/Help:Template>`_ removed.
+        Everything after a template that is never closed is removed too.
+    """
+    if spans is None:
+        _, spans = scan_templates(s)
+
+    parts, end = [], 0
+    for start, next_end in spans:
+        parts.append(s[end:start])
+        if next_end is None:
+            return "".join(parts)
+        end = next_end
+    parts.append(s[end:])
+    return "".join(parts)
+
+
+def extract_geolocation(s):
+    """Retrieves geolocation from wikivoyage article text."""
+    # (?s:.*) to match at furthest position and gradually back off
+    pattern = re.compile(
+        r"(?s:.*){{(geo|mapframe)\|([-]?[0-9]+[.]?[0-9]*)[^|}{]*\|([-]?[0-9]+[.]?[0-9]*)([^}{]*)}}",
+        re.DOTALL | re.UNICODE | re.IGNORECASE,
+    )
+
+    # get geo coordinates if available
+    match = re.search(pattern, s)
+    lat, lon = (
+        (float(match.group(2)), float(match.group(3)))
+        if match
+        else (None, None)
+    )
+    return lat, lon
+
+
+def extract_article_type(s):
+    """Retrieves wikivoyage article type and status features from text."""
+    pattern = re.compile(
+        r"{{(outline|usable|guide|star|extra)(\w*)([^}{]*)}}",
+        re.DOTALL | re.UNICODE | re.IGNORECASE,
+    )
+
+    match = re.search(pattern, s)
+    # return matches if available
+    status, articletype = (
+        (match.group(1).strip().lower(), match.group(2).strip().lower())
+        if match
+        else (None, None)
+    )
+    return status, articletype
+
+
+def extract_ispartof(s):
+    """Retrieves wikivoyage `{{IsPartOf|...}}` feature from text."""
+    pattern = re.compile(
+        r"(?s:.*){{(ispartof|isin)\|([^}{]*)}}",
+        re.DOTALL | re.UNICODE | re.IGNORECASE,
+    )
+
+    match = re.search(pattern, s)
+    # return matches if available
+    return match.group(2).strip().replace("_", " ") if match else None
+
+
+def extract_disambiguation(s):
+    """Retrieves wikivoyage disambiguation feature from text."""
+    pattern = re.compile(
+        r"{{(disamb|disambig|pagebanner\|Disambiguation banner.png)[^}{]*}}",
+        re.DOTALL | re.UNICODE | re.IGNORECASE,
+    )
+
+    match = re.search(pattern, s)
+    return True if match else False
+
+
+def extract_historical(s):
+    """Retrieves wikivoyage disambiguation feature from text."""
+    pattern = re.compile(
+        r"{{(historical)[^}{]*}}", re.DOTALL | re.UNICODE | re.IGNORECASE
+    )
+
+    match = re.search(pattern, s)
+    return True if match else False
@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# the API is run from within the api/ folder, so make its modules importable
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "api")
+)
+
+
+@pytest.fixture
+def df() -> pd.DataFrame:
+    """
+    Small destinations data set with the same columns as the API data.
+    """
+    return pd.DataFrame(
+        {
+            "id": [662248, 867598, 146019, 197270, 461000],
+            "wiki_id": [10, 33, 36, 37, 40],
+            "name": ["'s-Hertogenbosch", "Aachen", "Aakirkeby", "Aalborg", "Lima"],
+            "status": ["guide", "usable", "outline", "usable", "guide"],
+            "type": ["city", "city", "city", "city", "city"],
+            "lat": [51.69014, 50.7753, 55.0694214, 57.05, -12.05],
+            "lng": [5.29897, 6.0828, 14.9204372, 9.93, -77.04],
+            "country": ["Netherlands", "Germany", "Denmark", "Denmark", "Peru"],
+            "weight": [99691, 88037, 140, 25971, 50000],
+            "nr_tokens_norm": [0.0649, 0.0597, 0.0004, 0.0262, 0.0400],
+        }
+    ).set_index("id", drop=False)
+
+
+@pytest.fixture
+def df_feature_types() -> pd.DataFrame:
+    """
+    Feature types data set mapping three features to two profiles.
+    """
+    return pd.DataFrame(
+        {
+            "feature_name": ["Beaches", "Museums", "Hiking"],
+            "nature": [1, 0, 1],
+            "culture": [0, 1, 0],
+        }
+    )
+
+
+@pytest.fixture
+def df_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Feature scores for all places in the destinations data set.
+    """
+    return pd.DataFrame(
+        {
+            "id": df["id"].tolist(),
+            "Beaches": [0.0, 0.2, 0.9, 0.5, 0.05],
+            "Museums": [0.8, 0.7, 0.0, 0.3, 0.6],
+            "Hiking": [0.3, 0.0, 0.95, 0.4, 0.2],
+        }
+    ).set_index("id")
@@ -0,0 +1,63 @@
+from common.cache import LRUCache
+
+
+def test_lru_cache_hits_and_misses() -> None:
+    """
+    Expect cached values to be returned and counted as hits.
+    """
+    cache = LRUCache(max_bytes=100)
+    cache.put("a", 1, 10)
+
+    assert 1 == cache.get("a")
+    assert cache.get("b") is None
+    assert {"hits": 1, "misses": 1} == {
+        key: cache.stats()[key] for key in ["hits", "misses"]
+    }
+
+
+def test_lru_cache_evicts_least_recently_used() -> None:
+    """
+    Expect the least recently used values to be evicted when full.
+    """
+    cache = LRUCache(max_bytes=30)
+    cache.put("a", 1, 10)
+    cache.put("b", 2, 10)
+    cache.put("c", 3, 10)
+    cache.get("a")
+    cache.put("d", 4, 10)
+
+    assert "b" not in cache
+    assert all(key in cache for key in ["a", "c", "d"])
+    assert 30 == cache.nbytes
+    assert 1 == cache.evictions
+
+
+def test_lru_cache_replaces_and_skips_large_values() -> None:
+    """
+    Expect replacing a value to update the size and large values to be skipped.
+    """
+    cache = LRUCache(max_bytes=30)
+    cache.put("a", 1, 10)
+    cache.put("a", 2, 20)
+    cache.put("b", 3, 31)
+
+    assert 2 == cache.get("a")
+    assert 20 == cache.nbytes
+    assert "b" not in cache
+
+
+def test_lru_cache_version_change_clears() -> None:
+    """
+    Expect entries to be dropped when the data version changes.
+    """
+    cache = LRUCache()
+    cache.set_version("v1")
+    cache.put("a", 1, 10)
+    cache.set_version("v1")
+
+    assert "a" in cache
+
+    cache.set_version("v2")
+
+    assert 0 == len(cache)
+    assert 0 == cache.nbytes
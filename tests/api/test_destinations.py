@@ -0,0 +1,87 @@
+import json
+
+import pandas as pd
+import pytest
+from common.cache import LRUCache
+from common.catalog import Catalog
+from common.compression import ResponseCache
+from common.reloader import LiveCatalog
+from flask import Flask
+from flask.testing import FlaskClient
+from flask_restful import Api
+from resources.destination import Destination
+from resources.destinations import MAX_IDS, Destinations, parse_ids
+
+
+@pytest.fixture
+def client(
+    df: pd.DataFrame, df_features: pd.DataFrame, df_feature_types: pd.DataFrame
+) -> FlaskClient:
+    """
+    Test client for an app serving one and many destinations.
+    """
+    catalog = Catalog(df.set_index("id", drop=False), df_features, df_feature_types)
+    app = Flask(__name__)
+    api = Api(app)
+    kwargs = {
+        "live_catalog": LiveCatalog(catalog),
+        "responses": ResponseCache(LRUCache()),
+    }
+    api.add_resource(
+        Destinations, "/api/destinations", resource_class_kwargs=kwargs
+    )
+    api.add_resource(Destination, "/api/<dest_id>", resource_class_kwargs=kwargs)
+    return app.test_client()
+
+
+@pytest.mark.parametrize(
+    "values,expected",
+    [
+        ([], []),
+        (["867598"], [867598]),
+        (["867598,662248", "146019"], [867598, 662248, 146019]),
+        (["867598, ,abc,", "99999999999999999999"], [867598, -1, -1]),
+    ],
+)
+def test_parse_ids(values: list, expected: list) -> None:
+    """
+    Expect comma separated and repeated ids in order, -1 for invalid ids.
+    """
+    assert expected == parse_ids(values)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "ids=867598,662248,1,867598",
+        "ids=461000&ids=abc&ids=197270&profiles=nature",
+        "ids=146019,662248&profiles=culture&profiles=nature",
+        "",
+    ],
+)
+def test_destinations(client: FlaskClient, query: str) -> None:
+    """
+    Expect the same documents as the single destination endpoint, in request
+    order and null for unknown ids.
+    """
+    response = client.get(f"/api/destinations?{query}")
+    args = [arg.split("=") for arg in query.split("&") if arg]
+    ids = [place_id for key, value in args if key == "ids" for place_id in value.split(",")]
+    profiles = "&".join(f"{key}={value}" for key, value in args if key == "profiles")
+
+    assert 200 == response.status_code
+    assert "public, max-age=3600" == response.headers["Cache-Control"]
+    expected = [
+        json.loads(client.get(f"/api/{place_id}?{profiles}").data)
+        for place_id in ids
+    ]
+    assert {"destinations": expected} == json.loads(response.data)
+
+
+def test_too_many_ids(client: FlaskClient) -> None:
+    """
+    Expect a bad request when asking for more than the maximum number of ids.
+    """
+    ids = ",".join(["867598"] * (MAX_IDS + 1))
+
+    assert 400 == client.get(f"/api/destinations?ids={ids}").status_code
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+from resources.utils.distance import (
+    SphericalIndex,
+    haversine,
+    sort_places_by_distance,
+)
+
+
+@pytest.mark.parametrize("place_id", [662248, 867598, 461000])
+def test_spherical_index_matches_sort(
+    df: pd.DataFrame, place_id: int
+) -> None:
+    """
+    Expect the index to return places in the same order as the full sort.
+    """
+    index = SphericalIndex(df["lat"].values, df["lng"].values)
+    position = df.index.get_loc(place_id)
+
+    positions, distances = index.query(
+        df.loc[place_id, "lat"], df.loc[place_id, "lng"], k=3, exclude=position
+    )
+    expected = sort_places_by_distance(df, place_id).head(3)
+
+    assert expected["id"].tolist() == df["id"].values[positions].tolist()
+    np.testing.assert_allclose(
+        haversine(
+            expected["lat"].values,
+            expected["lng"].values,
+            np.full(3, df.loc[place_id, "lat"]),
+            np.full(3, df.loc[place_id, "lng"]),
+        ),
+        distances,
+    )
+
+
+def test_spherical_index_across_antimeridian() -> None:
+    """
+    Expect places on both sides of the 180 degree meridian to be neighbours.
+    """
+    index = SphericalIndex([0.0, 0.0, 0.0], [179.9, -179.9, 0.0])
+
+    positions, _ = index.query(0.0, 179.95, k=2)
+
+    assert [0, 1] == sorted(positions.tolist())
+
+
+def test_spherical_index_k_larger_than_data() -> None:
+    """
+    Expect all other places when asking for more places than available.
+    """
+    index = SphericalIndex([0.0, 1.0], [0.0, 1.0])
+
+    positions, _ = index.query(0.0, 0.0, k=30, exclude=0)
+
+    assert [1] == positions.tolist()
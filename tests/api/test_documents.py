@@ -0,0 +1,109 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from common.catalog import Catalog
+from resources.utils.documents import DocumentStore, IdIndex, encode_object
+
+
+def test_document_store_lookup(df: pd.DataFrame) -> None:
+    """
+    Expect documents to contain all columns with native JSON types.
+    """
+    documents = DocumentStore(df)
+
+    assert 867598 in documents
+    assert 123 not in documents
+    assert len(df) == len(documents)
+    assert df.loc[867598].to_dict() == json.loads(documents.render(867598))
+
+
+@pytest.mark.parametrize(
+    "fields", [{}, {"features": []}, {"features": ["Museums", "Beaches"]}],
+)
+def test_document_store_render_fields(df: pd.DataFrame, fields: dict) -> None:
+    """
+    Expect request specific fields to be appended to the static document.
+    """
+    documents = DocumentStore(df, columns=["id", "name"])
+
+    expected = {"id": 662248, "name": "'s-Hertogenbosch", **fields}
+
+    assert expected == json.loads(documents.render(662248, **fields))
+    assert expected == json.loads(documents.render_position(0, **fields))
+
+
+@pytest.mark.parametrize("ids", [[5, 3, 9, 4], [5, 3, 10 ** 12, 4]])
+def test_id_index(ids: list) -> None:
+    """
+    Expect dense and sparse ids to be looked up alike, with -1 for unknown ids.
+    """
+    positions = IdIndex(ids)
+
+    assert [0, 1, 2, 3] == [positions[place_id] for place_id in ids]
+    assert [3, -1, 0, -1] == positions.lookup([4, 6, 5, -7]).tolist()
+    # ids outside the int64 range are unknown, not an error
+    huge = [2 ** 63, 5, 10 ** 20, -(2 ** 64), 2 ** 63 - 1, -(2 ** 63)]
+    assert [-1, 0, -1, -1, -1, -1] == positions.lookup(huge).tolist()
+    assert positions.get(2 ** 63) is None
+    assert 6 not in positions
+    assert positions.get("5") is None
+    assert positions.get(True) is None
+    with pytest.raises(KeyError):
+        positions[6]
+
+
+def test_catalog_documents(
+    df: pd.DataFrame, df_features: pd.DataFrame, df_feature_types: pd.DataFrame
+) -> None:
+    """
+    Expect the catalog's documents to equal the DataFrame's records.
+    """
+    catalog = Catalog(df, df_features, df_feature_types)
+    positions = np.array([3, 0])
+
+    expected = df.iloc[positions].to_dict(orient="records")
+    assert expected == json.loads(catalog.documents.render_many(positions))
+    assert [{"id": 197270}, {"id": 662248}] == json.loads(
+        DocumentStore(df, columns=["id"]).render_many(positions)
+    )
+    assert all(not array.flags.writeable for array in catalog.columns.values())
+
+
+@pytest.mark.parametrize("positions", [[], [3], [4, 0, 2]])
+def test_document_store_render_many(df: pd.DataFrame, positions: list) -> None:
+    """
+    Expect a JSON array of documents with per place fields, encoded or not.
+    """
+    documents = DocumentStore(df, columns=["id", "name"])
+    features = [["Museums"] * i for i in range(len(positions))]
+    encoded = [json.dumps(value).encode("utf-8") for value in features]
+
+    expected = [
+        {"id": int(df["id"].iat[p]), "name": df["name"].iat[p], "features": f}
+        for p, f in zip(positions, features)
+    ]
+
+    assert expected == json.loads(documents.render_many(positions, features=features))
+    assert expected == json.loads(documents.render_many(positions, features=encoded))
+
+
+def test_document_store_render_many_missing(df: pd.DataFrame) -> None:
+    """
+    Expect null for negative positions, ignoring their fields.
+    """
+    documents = DocumentStore(df, columns=["id"])
+    result = documents.render_many([-1, 1, -1], features=[None, b"[]", None])
+
+    assert [None, {"id": 867598, "features": []}, None] == json.loads(result)
+
+
+@pytest.mark.parametrize("data", [{}, {"maxPlaces": 2, "maxPlacesText": "2"}])
+def test_encode_object(data: dict) -> None:
+    """
+    Expect pre-encoded values to be spliced into the encoded object.
+    """
+    result = encode_object(data, destinations=b'[{"id":1}]')
+
+    assert {**data, "destinations": [{"id": 1}]} == json.loads(result)
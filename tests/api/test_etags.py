@@ -0,0 +1,209 @@
+import gzip
+
+import pandas as pd
+import pytest
+from common.cache import LRUCache
+from common.catalog import Catalog
+from common.compression import ResponseCache
+from common.reloader import LiveCatalog
+from flask import Flask
+from flask.testing import FlaskClient
+from flask_restful import Api
+from resources.destination import Destination
+from resources.explore import Explore
+from resources.nearby import Nearby
+
+URLS = [
+    "/api/867598?profiles=nature",
+    "/api/nearby/867598?n_results=2",
+    "/api/nearby/?lat=52.0&lng=5.0",
+    "/api/explore/?country=Denmark&seed=3",
+]
+
+
+@pytest.fixture
+def cache() -> LRUCache:
+    """
+    Cache for ordered explore results and response bodies.
+    """
+    return LRUCache()
+
+
+@pytest.fixture
+def client(
+    df: pd.DataFrame,
+    df_features: pd.DataFrame,
+    df_feature_types: pd.DataFrame,
+    cache: LRUCache,
+) -> FlaskClient:
+    """
+    Test client for an app serving the destination resources.
+    """
+    catalog = Catalog(df.set_index("id", drop=False), df_features, df_feature_types)
+    app = Flask(__name__)
+    api = Api(app)
+    # compress every response, the responses of the small data set are small
+    responses = ResponseCache(cache, min_size=0)
+    kwargs = {"live_catalog": LiveCatalog(catalog), "responses": responses}
+    api.add_resource(Destination, "/api/", resource_class_kwargs=kwargs)
+    api.add_resource(
+        Destination, "/api/<dest_id>", endpoint="dest_ep", resource_class_kwargs=kwargs
+    )
+    api.add_resource(
+        Explore,
+        "/api/explore/",
+        resource_class_kwargs={**kwargs, "cache": cache},
+    )
+    api.add_resource(Nearby, "/api/nearby/", resource_class_kwargs=kwargs)
+    api.add_resource(
+        Nearby,
+        "/api/nearby/<dest_id>",
+        endpoint="nearby_ep",
+        resource_class_kwargs=kwargs,
+    )
+    return app.test_client()
+
+
+@pytest.mark.parametrize("url", URLS)
+def test_conditional_get(client: FlaskClient, url: str) -> None:
+    """
+    Expect an ETag and Cache-Control, and 304 when the ETag is sent back.
+    """
+    response = client.get(url)
+    etag = response.headers["ETag"]
+
+    assert 200 == response.status_code
+    assert "public, max-age=3600" == response.headers["Cache-Control"]
+    assert etag == client.get(url).headers["ETag"]
+
+    cached = client.get(url, headers={"If-None-Match": etag})
+    assert 304 == cached.status_code
+    assert b"" == cached.data
+    assert etag == cached.headers["ETag"]
+
+    other = client.get(url, headers={"If-None-Match": '"other"'})
+    assert 200 == other.status_code
+
+
+def test_etags_differ_per_request(client: FlaskClient) -> None:
+    """
+    Expect different responses to have different ETags.
+    """
+    urls = URLS + [
+        "/api/867598?profiles=culture",
+        "/api/nearby/867598?n_results=3",
+        "/api/explore/?country=Denmark&seed=4",
+        "/api/explore/?country=Denmark&seed=3&offset=1",
+    ]
+    etags = {client.get(url).headers["ETag"] for url in urls}
+
+    assert len(urls) == len(etags)
+
+
+def test_random_destination_is_not_cached(client: FlaskClient) -> None:
+    """
+    Expect the random destination to be marked uncacheable, without ETag.
+    """
+    response = client.get("/api/", headers={"If-None-Match": "*"})
+
+    assert 200 == response.status_code
+    assert "no-store" == response.headers["Cache-Control"]
+    assert "ETag" not in response.headers
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        ("/api/99999999999999999999", None),
+        ("/api/-99999999999999999999", None),
+        ("/api/nearby/99999999999999999999", {"destinations": []}),
+        ("/api/nearby/9223372036854775808", {"destinations": []}),
+    ],
+)
+def test_ids_out_of_range(client: FlaskClient, url: str, expected) -> None:
+    """
+    Expect ids too large for an int64 to be unknown destinations.
+    """
+    response = client.get(url)
+
+    assert 200 == response.status_code
+    assert expected == response.get_json()
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "lat=nan&lng=0",
+        "lat=0&lng=nan",
+        "lat=inf&lng=0",
+        "lat=0&lng=-inf",
+        "lat=90.5&lng=0",
+        "lat=0&lng=180.1",
+    ],
+)
+def test_nearby_invalid_location(client: FlaskClient, query: str) -> None:
+    """
+    Expect no nearby destinations for coordinates that are not on the globe.
+    """
+    response = client.get(f"/api/nearby/?{query}")
+
+    assert 200 == response.status_code
+    assert {"destinations": []} == response.get_json()
+
+
+@pytest.mark.parametrize(
+    "accept_encoding,expected",
+    [
+        (None, None),
+        ("gzip", "gzip"),
+        ("gzip, br", "br"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("identity", None),
+    ],
+)
+@pytest.mark.parametrize("url", URLS)
+def test_compressed_responses(
+    client: FlaskClient,
+    cache: LRUCache,
+    url: str,
+    accept_encoding: str,
+    expected: str,
+) -> None:
+    """
+    Expect the body in the best accepted encoding, cached with the other variants.
+    """
+    if expected == "br":
+        pytest.importorskip("brotli")
+    headers = {"Accept-Encoding": accept_encoding} if accept_encoding else {}
+    identity = client.get(url)
+    response = client.get(url, headers=headers)
+
+    assert expected == response.headers.get("Content-Encoding")
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert identity.data == decompress(response.data, expected)
+
+    etag = response.headers["ETag"]
+    assert etag.startswith(identity.headers["ETag"][:-1])
+    cached = client.get(url, headers={"If-None-Match": etag, **headers})
+    assert 304 == cached.status_code
+    assert etag == cached.headers["ETag"]
+
+    # the identity and compressed bodies of the response are cached together,
+    # compressed quickly at first and with the highest level when requested again
+    key = ("response", identity.headers["ETag"].strip('"'))
+    fast = f"{expected}-fast" if expected else "identity"
+    assert {"identity", fast} == set(cache.get(key))
+
+    again = client.get(url, headers=headers)
+    assert identity.data == decompress(again.data, expected)
+    assert {"identity", expected or "identity"} == set(cache.get(key))
+    if expected:
+        assert again.headers["ETag"] != etag
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "br":
+        return pytest.importorskip("brotli").decompress(data)
+    return data
@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import pandas as pd
+import pytest
+from common.catalog import Catalog
+from resources.explore import ExploreQuery, create_query, select_places
+
+QUERIES = [
+    ExploreQuery(None, None, (), 1234),
+    ExploreQuery("denmark", None, (), 1),
+    ExploreQuery("unknown", (60.0, 20.0, 45.0, 0.0), (), 2),
+    ExploreQuery(None, None, ("culture", "nature"), None),
+    ExploreQuery("denmark", None, ("nature",), None),
+]
+
+
+@pytest.fixture
+def catalog(
+    df: pd.DataFrame, df_features: pd.DataFrame, df_feature_types: pd.DataFrame
+) -> Catalog:
+    """
+    Catalog for the small destinations data set.
+    """
+    return Catalog(df.set_index("id", drop=False), df_features, df_feature_types)
+
+
+@pytest.mark.parametrize(
+    "country,seed,expected",
+    [
+        ("Denmark", 1, ExploreQuery("denmark", None, ("nature",), None)),
+        (None, 7, ExploreQuery(None, None, ("nature",), None)),
+    ],
+)
+def test_create_query(country: Optional[str], seed: int, expected: tuple) -> None:
+    """
+    Expect profiles to be normalized and the seed to be dropped with profiles.
+    """
+    args = {
+        "country": country,
+        "seed": seed,
+        "profiles": ["nature", "nature"],
+        "ne_lat": 60.0,
+        "ne_lng": 20.0,
+        "sw_lat": None,
+        "sw_lng": 0.0,
+    }
+
+    assert expected == create_query(args)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_select_places_does_not_modify_catalog(
+    catalog: Catalog, query: ExploreQuery
+) -> None:
+    """
+    Expect the catalog data to be unchanged and the result to be read-only.
+    """
+    df_before = catalog.df.copy()
+
+    positions = select_places(catalog, query)
+
+    pd.testing.assert_frame_equal(df_before, catalog.df)
+    assert not positions.flags.writeable
+    with pytest.raises(ValueError):
+        catalog.profile_weights.matrix[0, 0] = 1
+
+
+def test_select_places_concurrently(catalog: Catalog) -> None:
+    """
+    Expect concurrent queries to return the same places as sequential ones.
+    """
+    queries = QUERIES * 50
+    expected = [select_places(catalog, query).tolist() for query in queries]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        result = [
+            positions.tolist()
+            for positions in executor.map(
+                lambda query: select_places(catalog, query), queries
+            )
+        ]
+
+    assert expected == result
+    assert [0, 1, 2, 3, 4] == sorted(expected[0])
+    assert [2, 3] == sorted(expected[1])
+    assert [0, 1, 2, 3] == sorted(expected[2])
@@ -0,0 +1,136 @@
+import json
+from typing import List
+
+import numpy as np
+import pandas as pd
+import pytest
+from resources.utils.features import (
+    FeatureMatrix,
+    ProfileWeightMatrix,
+    add_sorting_weight_by_profiles,
+    filter_and_sort_places_by_profiles,
+    select_features_with_profiles,
+    sort_positions_by_profiles,
+)
+
+PROFILES = [["nature"], ["culture"], ["nature", "culture"], ["unknown"]]
+
+
+@pytest.mark.parametrize("profiles", PROFILES)
+def test_profile_weight_matrix(
+    df: pd.DataFrame,
+    df_features: pd.DataFrame,
+    df_feature_types: pd.DataFrame,
+    profiles: List[str],
+) -> None:
+    """
+    Expect the same profile weights as summing the features in scope.
+    """
+    matrix = ProfileWeightMatrix(df["id"].values, df_features, df_feature_types)
+
+    expected = (
+        add_sorting_weight_by_profiles(
+            df.copy(),
+            [profile for profile in profiles if profile in matrix.profiles],
+            df_features,
+            df_feature_types,
+        )["profile_weight"]
+        .values
+    )
+
+    np.testing.assert_allclose(expected, matrix.weights(profiles), rtol=1e-6)
+    np.testing.assert_allclose(
+        expected[[3, 1]], matrix.weights(profiles, np.array([3, 1])), rtol=1e-6
+    )
+
+
+@pytest.mark.parametrize("profiles", PROFILES[:3])
+@pytest.mark.parametrize("positions", [[0, 1, 2, 3, 4], [4, 2, 3], [1]])
+def test_sort_positions_by_profiles(
+    df: pd.DataFrame,
+    df_features: pd.DataFrame,
+    df_feature_types: pd.DataFrame,
+    profiles: List[str],
+    positions: List[int],
+) -> None:
+    """
+    Expect the same places in the same order as the DataFrame implementation.
+    """
+    matrix = ProfileWeightMatrix(df["id"].values, df_features, df_feature_types)
+
+    expected = filter_and_sort_places_by_profiles(
+        df.iloc[positions].copy(),
+        profiles,
+        df_features,
+        df_feature_types,
+        profile_weight_threshold=0.5,
+    )["id"].tolist()
+    result = sort_positions_by_profiles(
+        np.array(positions),
+        profiles,
+        matrix,
+        df["nr_tokens_norm"].values,
+        profile_weight_threshold=0.5,
+    )
+
+    assert expected == df["id"].values[result].tolist()
+
+
+def test_filter_and_sort_places_by_profiles_copies(
+    df: pd.DataFrame, df_features: pd.DataFrame, df_feature_types: pd.DataFrame
+) -> None:
+    """
+    Expect the input places to be left unchanged.
+    """
+    df_before = df.copy()
+
+    filter_and_sort_places_by_profiles(
+        df, ["nature"], df_features, df_feature_types
+    )
+
+    pd.testing.assert_frame_equal(df_before, df)
+
+
+@pytest.mark.parametrize("profiles", [[]] + PROFILES[:3])
+@pytest.mark.parametrize("top_x", [1, 2, 5])
+def test_feature_matrix_top_features(
+    df: pd.DataFrame,
+    df_features: pd.DataFrame,
+    df_feature_types: pd.DataFrame,
+    profiles: List[str],
+    top_x: int,
+) -> None:
+    """
+    Expect the same features per place as selecting them one by one.
+    """
+    matrix = FeatureMatrix(df["id"].values, df_features, df_feature_types)
+
+    expected = [
+        select_features_with_profiles(
+            place_id, profiles, df_features, df_feature_types, top_x=top_x
+        )[:top_x]
+        for place_id in df["id"]
+    ]
+
+    assert expected == matrix.top_features(
+        np.arange(len(df)), profiles, top_x=top_x
+    )
+    assert expected == [
+        json.loads(features)
+        for features in matrix.top_features_json(
+            np.arange(len(df)), profiles, top_x=top_x
+        )
+    ]
+
+
+def test_feature_matrix_empty_page(
+    df: pd.DataFrame,
+    df_features: pd.DataFrame,
+    df_feature_types: pd.DataFrame,
+) -> None:
+    """
+    Expect an empty list when no places are requested.
+    """
+    matrix = FeatureMatrix(df["id"].values, df_features, df_feature_types)
+
+    assert [] == matrix.top_features(np.array([], dtype=int), ["nature"])
@@ -0,0 +1,251 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List
+
+import pandas as pd
+import pytest
+import requests
+from common.catalog import Catalog
+from common.mailchimp import MailchimpClient
+from common.metrics import Metrics
+from common.outbox import MailchimpOutbox
+from common.reloader import LiveCatalog
+from flask import Flask
+from flask_restful import Api
+from resources.member import Member
+from resources.signup import Signup
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Local HTTP server that answers with scripted responses and records the
+    requests it receives.
+    """
+
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.responses = []
+        self.received = []
+        self.url = "http://127.0.0.1:{}/3.0".format(self.server_address[1])
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_request(self):
+        length = int(self.headers.get("content-length", 0))
+        body = json.loads(self.rfile.read(length)) if length else None
+        self.server.received.append(
+            {
+                "method": self.command,
+                "path": self.path,
+                "body": body,
+                "auth": self.headers.get("authorization"),
+                "port": self.client_address[1],
+            }
+        )
+        status, data, delay = (
+            self.server.responses.pop(0) if self.server.responses else (200, {}, 0)
+        )
+        if delay:
+            threading.Event().wait(delay)
+        content = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PATCH = do_request
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server() -> Iterator[StubServer]:
+    """
+    Stub of the Mailchimp API running in a background thread.
+    """
+    server = StubServer()
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def create_client(server: StubServer, **kwargs) -> MailchimpClient:
+    kwargs = {"timeout": (1, 0.1), "backoff": 0, **kwargs}
+    return MailchimpClient("key-us3", "audience", base_url=server.url, **kwargs)
+
+
+def test_mailchimp_client_reuses_connection(server: StubServer) -> None:
+    """
+    Expect authenticated requests to share one kept-alive connection.
+    """
+    client = create_client(server)
+
+    for i in range(3):
+        response = client.request("POST", client.members_path(), json={"i": i})
+        assert 200 == response.status_code
+
+    assert 1 == len({request["port"] for request in server.received})
+    assert [{"i": 0}, {"i": 1}, {"i": 2}] == [r["body"] for r in server.received]
+    assert all(r["auth"].startswith("Basic ") for r in server.received)
+    assert "/3.0/lists/audience/members/" == server.received[0]["path"]
+
+
+@pytest.mark.parametrize(
+    "statuses,max_retries,expected",
+    [
+        ([503, 200], 3, [503, 200]),
+        ([429, 500, 200], 3, [429, 500, 200]),
+        ([503, 503, 503], 2, [503, 503, 503]),
+        ([400], 3, [400]),
+    ],
+)
+def test_mailchimp_client_retries(
+    server: StubServer, statuses: List[int], max_retries: int, expected: List[int]
+) -> None:
+    """
+    Expect rate limiting and server errors to be retried a limited number of times.
+    """
+    server.responses = [(status, {}, 0) for status in statuses]
+    client = create_client(server, max_retries=max_retries)
+
+    response = client.request("GET", client.members_path("a@b.c"))
+
+    assert expected[-1] == response.status_code
+    assert len(expected) == len(server.received)
+
+
+def test_mailchimp_client_metrics(server: StubServer) -> None:
+    """
+    Expect the duration of every attempt to be recorded by method and status.
+    """
+    server.responses = [(503, {}, 0), (200, {}, 0)]
+    metrics = Metrics()
+    client = create_client(server, metrics=metrics)
+
+    client.request("GET", client.members_path("a@b.c"))
+
+    samples = metrics.snapshot()
+    for status in [503, 200]:
+        counts = samples[
+            (
+                "mailchimp_request_duration_seconds",
+                (("method", "GET"), ("status", status)),
+            )
+        ]
+        assert 1 == sum(counts[:-1])
+
+
+@pytest.mark.parametrize("method,n_requests", [("GET", 2), ("POST", 1)])
+def test_mailchimp_client_read_timeout(
+    server: StubServer, method: str, n_requests: int
+) -> None:
+    """
+    Expect read timeouts to be retried only for requests that can be repeated.
+    """
+    server.responses = [(200, {}, 0.3), (200, {}, 0.3)]
+    client = create_client(server, max_retries=1)
+
+    with pytest.raises(requests.Timeout):
+        client.request(method, client.members_path())
+
+    assert n_requests == len(server.received)
+
+
+def test_mailchimp_client_from_key_file(tmp_path) -> None:
+    """
+    Expect the credentials and data center to be read from the key file.
+    """
+    key_file = tmp_path / "mailchimp-key.json"
+    key_file.write_text(json.dumps({"api_key": "abc-us7", "audience_id": "123"}))
+
+    client = MailchimpClient.from_key_file(str(key_file))
+
+    assert "https://us7.api.mailchimp.com/3.0" == client.base_url
+    assert "/lists/123/members/x@y.z" == client.members_path("x@y.z")
+
+
+def create_app(catalog: Catalog, mailchimp, outbox) -> Flask:
+    app = Flask(__name__)
+    api = Api(app)
+    kwargs = {
+        "mailchimp": mailchimp,
+        "outbox": outbox,
+        "live_catalog": LiveCatalog(catalog),
+    }
+    api.add_resource(Signup, "/signup/", resource_class_kwargs=kwargs)
+    api.add_resource(Member, "/member/", resource_class_kwargs=kwargs)
+    return app
+
+
+@pytest.mark.parametrize(
+    "method,url",
+    [("post", "/signup/"), ("get", "/signup/"), ("patch", "/signup/"), ("post", "/member/")],
+)
+def test_signup_without_mailchimp_key(
+    df: pd.DataFrame,
+    df_features: pd.DataFrame,
+    df_feature_types: pd.DataFrame,
+    method: str,
+    url: str,
+) -> None:
+    """
+    Expect the signup endpoints to be unavailable when the API runs without a
+    Mailchimp key.
+    """
+    catalog = Catalog(df.set_index("id", drop=False), df_features, df_feature_types)
+    app = create_app(catalog, None, None)
+
+    response = getattr(app.test_client(), method)(
+        url, json={"email": "user@example.com", "likes": [867598]}
+    )
+
+    assert 503 == response.status_code
+
+
+@pytest.mark.parametrize(
+    "method,url,path",
+    [
+        ("patch", "/signup/", "/lists/audience/members/user@example.com"),
+        ("post", "/member/", "/lists/audience/members/user@example.com/events"),
+    ],
+)
+def test_signup_updates_accepted(
+    server: StubServer,
+    df: pd.DataFrame,
+    df_features: pd.DataFrame,
+    df_feature_types: pd.DataFrame,
+    tmp_path,
+    method: str,
+    url: str,
+    path: str,
+) -> None:
+    """
+    Expect updates that are sent to Mailchimp in the background to be
+    accepted with a 202 and queued in the outbox.
+    """
+    catalog = Catalog(df.set_index("id", drop=False), df_features, df_feature_types)
+    outbox = MailchimpOutbox(str(tmp_path / "outbox.sqlite3"), create_client(server))
+    outbox.start = lambda: None
+    app = create_app(catalog, outbox.client, outbox)
+
+    response = getattr(app.test_client(), method)(
+        url, json={"email": "user@example.com", "likes": [867598]}
+    )
+
+    assert 202 == response.status_code
+    assert 1 == outbox.stats()["pending"]
+    queued = outbox.connection().execute("SELECT method, path FROM outbox").fetchall()
+    assert [(method.upper(), path)] == queued
+    assert [] == server.received
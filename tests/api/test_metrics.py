@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+
+import pytest
+from common.cache import LRUCache
+from common.mailchimp import MailchimpClient
+from common.metrics import Metrics, instrument, monitor_cache, monitor_outbox
+from common.outbox import MailchimpOutbox
+from flask import Flask
+from flask.testing import FlaskClient
+
+
+@pytest.fixture
+def metrics() -> Metrics:
+    """
+    Metrics with a counter and a histogram.
+    """
+    metrics = Metrics()
+    metrics.counter("requests_total", "Number of requests.")
+    metrics.histogram("duration_seconds", "Duration.", buckets=[0.1, 1.0])
+    return metrics
+
+
+@pytest.fixture
+def client(metrics: Metrics) -> FlaskClient:
+    """
+    Test client for an instrumented app.
+    """
+    app = Flask(__name__)
+    app.add_url_rule("/items/<item_id>", "item", lambda item_id: "x" * 300)
+    instrument(app, metrics)
+    return app.test_client()
+
+
+def test_render(metrics: Metrics) -> None:
+    """
+    Expect samples in the Prometheus text format, with cumulative buckets.
+    """
+    metrics.inc("requests_total", path='/a"b')
+    metrics.inc("requests_total", 2, path='/a"b')
+    for value in [0.05, 0.1, 0.5, 3]:
+        metrics.observe("duration_seconds", value)
+
+    assert [
+        "# HELP duration_seconds Duration.",
+        "# TYPE duration_seconds histogram",
+        'duration_seconds_bucket{le="0.1"} 2',
+        'duration_seconds_bucket{le="1.0"} 3',
+        'duration_seconds_bucket{le="+Inf"} 4',
+        "duration_seconds_sum 3.65",
+        "duration_seconds_count 4",
+        "# HELP requests_total Number of requests.",
+        "# TYPE requests_total counter",
+        'requests_total{path="/a\\"b"} 3',
+    ] == metrics.render().splitlines()
+
+
+def test_threads_are_added_up(metrics: Metrics) -> None:
+    """
+    Expect the samples of all threads in the snapshot.
+    """
+
+    def record():
+        for _ in range(1000):
+            metrics.inc("requests_total")
+            metrics.observe("duration_seconds", 0.5)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    samples = metrics.snapshot()
+    assert 4000 == samples[("requests_total", ())]
+    assert [0, 4000, 0, 2000.0] == samples[("duration_seconds", ())]
+
+
+def test_workers_are_added_up(tmp_path, metrics: Metrics) -> None:
+    """
+    Expect the published samples of running workers to be added, and those of
+    stopped workers to be removed.
+    """
+    metrics.directory = str(tmp_path)
+    metrics.inc("requests_total", status=200)
+    metrics.publish()
+    assert (tmp_path / "{}.json".format(os.getpid())).exists()
+
+    # a running worker, the parent of this process, and a stopped worker
+    samples = [["requests_total", [["status", 200]], 5]]
+    (tmp_path / "{}.json".format(os.getppid())).write_text(json.dumps(samples))
+    (tmp_path / "999999999.json").write_text(json.dumps(samples))
+
+    assert 6 == metrics.collect()[("requests_total", (("status", 200),))]
+    assert not (tmp_path / "999999999.json").exists()
+
+    metrics.clear()
+    assert not (tmp_path / "{}.json".format(os.getpid())).exists()
+    assert 5 == metrics.collect()[("requests_total", (("status", 200),))]
+
+
+def test_instrument(client: FlaskClient) -> None:
+    """
+    Expect responses to be counted, timed and measured by url rule.
+    """
+    for url in ["/items/1", "/items/2", "/unknown"]:
+        client.get(url)
+
+    response = client.get("/metrics")
+    lines = response.data.decode("utf-8").splitlines()
+
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    assert (
+        'http_requests_total{endpoint="/items/<item_id>",method="GET",status="200"} 2'
+        in lines
+    )
+    assert (
+        'http_requests_total{endpoint="unmatched",method="GET",status="404"} 1' in lines
+    )
+    assert 'http_request_duration_seconds_count{endpoint="/items/<item_id>"} 2' in lines
+    assert (
+        'http_response_size_bytes_bucket{endpoint="/items/<item_id>",le="256"} 0'
+        in lines
+    )
+    assert 'http_response_size_bytes_sum{endpoint="/items/<item_id>"} 600' in lines
+    # only the scrape itself is in progress
+    assert 'http_requests_in_flight{endpoint="/items/<item_id>"} 0' in lines
+    assert 'http_requests_in_flight{endpoint="/metrics"} 1' in lines
+
+
+def test_monitor_cache(metrics: Metrics) -> None:
+    """
+    Expect the cache counters to be reported when scraped.
+    """
+    cache = LRUCache()
+    monitor_cache(metrics, cache)
+    cache.put("a", 1, 10)
+    cache.get("a")
+    cache.get("b")
+
+    lines = metrics.render().splitlines()
+
+    assert "# TYPE cache_hits_total counter" in lines
+    assert "cache_hits_total 1" in lines
+    assert "cache_misses_total 1" in lines
+    assert "cache_bytes 10" in lines
+
+
+def test_monitor_outbox(metrics: Metrics, tmp_path) -> None:
+    """
+    Expect the outbox counters to be reported, and the queue depth by the
+    worker that drains the outbox.
+    """
+    client = MailchimpClient("key", "audience", base_url="http://127.0.0.1:9")
+    outbox = MailchimpOutbox(str(tmp_path / "outbox.sqlite3"), client)
+    outbox.start = lambda: None
+    monitor_outbox(metrics, outbox)
+    outbox.enqueue("a@x.com", "PATCH", "/lists/audience/members/a@x.com", {})
+
+    lines = metrics.render().splitlines()
+
+    assert "# TYPE mailchimp_outbox_enqueued_total counter" in lines
+    assert "mailchimp_outbox_enqueued_total 1" in lines
+    assert "mailchimp_outbox_retries_total 0" in lines
+    assert not any(line.startswith("mailchimp_outbox_updates") for line in lines)
+
+    assert outbox.acquire_drainer_lock()
+    lines = metrics.render().splitlines()
+
+    assert "# TYPE mailchimp_outbox_updates gauge" in lines
+    assert 'mailchimp_outbox_updates{status="pending"} 1' in lines
+    assert 'mailchimp_outbox_updates{status="failed"} 0' in lines
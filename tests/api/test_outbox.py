@@ -0,0 +1,284 @@
+import io
+import json
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List
+
+import pytest
+from common.mailchimp import MailchimpClient
+from common.outbox import MailchimpOutbox
+
+
+class FakeBatchServer(ThreadingHTTPServer):
+    """
+    Local fake of Mailchimp's batch operations endpoint.
+    """
+
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeBatchHandler)
+        self.url = "http://127.0.0.1:{}/3.0".format(self.server_address[1])
+        # operations of every batch, in the order they were received
+        self.batches = []
+        # status codes to answer the next batches with, before accepting them
+        self.failures = []
+        self.finished = True
+        # status codes of failing operations, by operation id, for the next
+        # finished batch they are in
+        self.errors = {}
+        # status codes of all operations of finished batches, by batch id
+        self.results = {}
+
+
+class FakeBatchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length", 0))
+        operations = json.loads(self.rfile.read(length))["operations"]
+        if self.server.failures:
+            return self.respond(self.server.failures.pop(0), {})
+        self.server.batches.append(operations)
+        self.respond(200, {"id": str(len(self.server.batches)), "status": "pending"})
+
+    def do_GET(self):
+        batch_id = self.path.rsplit("/", 1)[1]
+        if "/results/" in self.path:
+            return self.respond(200, results_archive(self.server.results[batch_id]))
+        if not self.server.finished:
+            return self.respond(200, {"status": "started", "errored_operations": 0})
+
+        if batch_id not in self.server.results:
+            self.server.results[batch_id] = {
+                op["operation_id"]: self.server.errors.pop(op["operation_id"], 200)
+                for op in self.server.batches[int(batch_id) - 1]
+            }
+        statuses = self.server.results[batch_id].values()
+        self.respond(
+            200,
+            {
+                "status": "finished",
+                "errored_operations": sum(status >= 400 for status in statuses),
+                "response_body_url": self.server.url + "/results/" + batch_id,
+            },
+        )
+
+    def respond(self, status, data):
+        if not isinstance(data, bytes):
+            data = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def results_archive(statuses: dict) -> bytes:
+    """
+    Gzipped tar archive with the results of a batch, like Mailchimp's.
+    """
+    results = [
+        {"status_code": status, "operation_id": key, "response": "{}"}
+        for key, status in statuses.items()
+    ]
+    content = json.dumps(results).encode("utf-8")
+    f = io.BytesIO()
+    with tarfile.open(fileobj=f, mode="w:gz") as tar:
+        info = tarfile.TarInfo("results/batch.json")
+        info.size = len(content)
+        tar.addfile(info, io.BytesIO(content))
+    return f.getvalue()
+
+
+@pytest.fixture
+def server() -> Iterator[FakeBatchServer]:
+    """
+    Fake batch endpoint running in a background thread.
+    """
+    server = FakeBatchServer()
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def outbox(server: FakeBatchServer, tmp_path) -> MailchimpOutbox:
+    """
+    Outbox in a temporary folder that sends to the fake batch endpoint.
+    """
+    client = MailchimpClient("key", "audience", base_url=server.url, max_retries=0)
+    return MailchimpOutbox(str(tmp_path / "outbox.sqlite3"), client, backoff=0)
+
+
+def enqueue(outbox: MailchimpOutbox, updates: List[tuple]) -> None:
+    # enqueue without starting the drainer thread, the tests drain themselves
+    outbox.start = lambda: None
+    for email, value in updates:
+        outbox.enqueue(email, "PATCH", "/lists/audience/members/" + email, {"v": value})
+
+
+def sent_values(batch: List[dict]) -> List[tuple]:
+    return [(op["path"].rsplit("/", 1)[1], json.loads(op["body"])["v"]) for op in batch]
+
+
+def test_outbox_batches_updates_per_email_in_order(
+    server: FakeBatchServer, outbox: MailchimpOutbox
+) -> None:
+    """
+    Expect one update per email per batch, and the next one after it finished.
+    """
+    enqueue(outbox, [("a@x.com", 1), ("b@x.com", 1), ("a@x.com", 2), ("a@x.com", 3)])
+
+    server.finished = False
+    assert 2 == outbox.drain_once()
+    # the first batch is still running, so the next update of a has to wait
+    assert 0 == outbox.drain_once()
+    server.finished = True
+    assert 1 == outbox.drain_once()
+    assert 1 == outbox.drain_once()
+    assert 0 == outbox.drain_once()
+
+    assert [
+        [("a@x.com", 1), ("b@x.com", 1)],
+        [("a@x.com", 2)],
+        [("a@x.com", 3)],
+    ] == [sent_values(batch) for batch in server.batches]
+    assert {"pending": 0, "sent": 0, "failed": 0} == {
+        key: value for key, value in outbox.stats().items() if key != "counters"
+    }
+    assert 4 == outbox.stats()["counters"]["delivered"]
+
+
+def test_outbox_ignores_duplicate_keys(
+    server: FakeBatchServer, outbox: MailchimpOutbox
+) -> None:
+    """
+    Expect an update with a known idempotency key for the same email to be
+    ignored, also after it was delivered, until the key expires.
+    """
+    outbox.start = lambda: None
+    for email in ["a@x.com", "a@x.com", "b@x.com"]:
+        outbox.enqueue(email, "POST", "/events", {"v": email}, key="request-1")
+
+    assert 2 == outbox.stats()["pending"]
+    assert 2 == outbox.drain_once()
+    assert 0 == outbox.drain_once()
+    assert 2 == outbox.stats()["counters"]["delivered"]
+
+    outbox.enqueue("a@x.com", "POST", "/events", {}, key="request-1")
+    assert 0 == outbox.stats()["pending"]
+
+    outbox.key_ttl = -1
+    outbox.drain_once()
+    outbox.enqueue("a@x.com", "POST", "/events", {}, key="request-1")
+    assert 1 == outbox.stats()["pending"]
+    # the same key for another email is another update, with its own operation id
+    assert 2 == len({op["operation_id"] for op in server.batches[0]})
+
+
+@pytest.mark.parametrize(
+    "failures,max_attempts,expected",
+    [([503], 3, {"pending": 1, "retries": 1}), ([503, 400], 2, {"failed": 1})],
+)
+def test_outbox_retries_failed_batches(
+    server: FakeBatchServer,
+    outbox: MailchimpOutbox,
+    failures: List[int],
+    max_attempts: int,
+    expected: dict,
+) -> None:
+    """
+    Expect failed batches to be retried until the maximum number of attempts.
+    """
+    enqueue(outbox, [("a@x.com", 1)])
+    server.failures = list(failures)
+    outbox.max_attempts = max_attempts
+
+    for _ in failures:
+        assert 0 == outbox.drain_once()
+
+    stats = outbox.stats()
+    assert expected == {
+        key: stats.get(key, stats["counters"].get(key)) for key in expected
+    }
+    assert [] == server.batches
+
+
+@pytest.mark.parametrize(
+    "max_attempts,expected",
+    [
+        (3, {"delivered": 2, "errored": 1, "retries": 1, "failed": 0}),
+        (1, {"delivered": 1, "errored": 1, "retries": 0, "failed": 1}),
+    ],
+)
+def test_outbox_retries_failed_operations(
+    server: FakeBatchServer,
+    outbox: MailchimpOutbox,
+    max_attempts: int,
+    expected: dict,
+) -> None:
+    """
+    Expect operations of a finished batch that failed with a server error or
+    rate limiting to be sent again, and other failed operations to be dropped.
+    """
+    enqueue(outbox, [("a@x.com", 1), ("b@x.com", 1), ("c@x.com", 1)])
+    outbox.max_attempts = max_attempts
+    # operation ids are the row ids of the updates
+    server.errors = {"1": 503, "2": 400}
+
+    while outbox.drain_once():
+        pass
+
+    assert [
+        [("a@x.com", 1), ("b@x.com", 1), ("c@x.com", 1)],
+        [("a@x.com", 1)],
+    ][:max_attempts] == [sent_values(batch) for batch in server.batches]
+    assert expected == {
+        key: value
+        for key, value in outbox.stats()["counters"].items()
+        if key in expected
+    }
+    assert {"pending": 0, "sent": 0, "failed": expected["failed"]} == {
+        key: value for key, value in outbox.stats().items() if key != "counters"
+    }
+
+
+def test_outbox_flush(server: FakeBatchServer, outbox: MailchimpOutbox) -> None:
+    """
+    Expect flushing to send the queued updates, also those waiting for a retry.
+    """
+    enqueue(outbox, [("a@x.com", 1), ("b@x.com", 1)])
+    server.failures = [503]
+    outbox.backoff = 3600
+    assert 0 == outbox.drain_once()
+
+    assert 2 == outbox.flush()
+    assert [[("a@x.com", 1), ("b@x.com", 1)]] == [
+        sent_values(batch) for batch in server.batches
+    ]
+    assert 0 == outbox.stats()["pending"]
+
+
+def test_outbox_drainer_thread(server: FakeBatchServer, outbox: MailchimpOutbox) -> None:
+    """
+    Expect the drainer thread to deliver enqueued updates in the background.
+    """
+    outbox.interval = 0.01
+    outbox.enqueue("a@x.com", "PATCH", "/lists/audience/members/a@x.com", {"v": 1})
+
+    for _ in range(500):
+        if outbox.stats()["counters"]["delivered"]:
+            break
+        threading.Event().wait(0.01)
+    outbox.stop()
+
+    assert [[("a@x.com", 1)]] == [sent_values(batch) for batch in server.batches]
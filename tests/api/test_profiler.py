@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+
+import pytest
+from common.profiler import SamplingProfiler, profile_requests
+from flask import Flask
+from flask.testing import FlaskClient
+
+TOKEN = "secret"
+
+
+def busy_wait(seconds: float) -> str:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return "ok"
+
+
+@pytest.fixture
+def profiler(tmp_path) -> SamplingProfiler:
+    """
+    Profiler that samples often, writing to a temporary folder.
+    """
+    profiler = SamplingProfiler(str(tmp_path), interval=0.001)
+    yield profiler
+    profiler.stop()
+
+
+@pytest.fixture
+def client(profiler: SamplingProfiler) -> FlaskClient:
+    """
+    Test client for a profiled app with a slow endpoint.
+    """
+    app = Flask(__name__)
+    app.add_url_rule("/slow/<item_id>", "slow", lambda item_id: busy_wait(0.05))
+    profile_requests(app, profiler, token=TOKEN)
+    return app.test_client()
+
+
+@pytest.mark.parametrize("fraction,sampled", [(1.0, True), (0.0, False)])
+def test_sampling(
+    client: FlaskClient, profiler: SamplingProfiler, fraction: float, sampled: bool
+) -> None:
+    """
+    Expect collapsed stacks of the sampled requests, per url rule.
+    """
+    client.get("/slow/1")
+    assert 0 == profiler.n_samples
+
+    profiler.start(fraction=fraction)
+    client.get("/slow/1")
+    paths = profiler.stop()
+
+    assert sampled == (profiler.n_samples > 0)
+    assert not profiler.active
+    if sampled:
+        assert 1 == len(paths)
+        assert paths[0].endswith("slow_item_id.{}.collapsed".format(os.getpid()))
+        with open(paths[0]) as f:
+            stack, count = f.readline().rsplit(" ", 1)
+        assert int(count) > 0
+        assert "busy_wait (api/test_profiler.py:" in stack.split(";")[-1]
+    else:
+        assert [] == paths
+
+
+def test_deadline(profiler: SamplingProfiler) -> None:
+    """
+    Expect the profiler to stop by itself after the given number of seconds.
+    """
+    profiler.start(seconds=0.01)
+    profiler.thread.join(timeout=5)
+
+    assert not profiler.running
+
+
+@pytest.mark.parametrize(
+    "headers,status",
+    [
+        ({}, 403),
+        ({"Authorization": "Bearer wrong"}, 403),
+        ({"Authorization": "Bearer " + TOKEN}, 200),
+    ],
+)
+def test_control(
+    client: FlaskClient, profiler: SamplingProfiler, headers: dict, status: int
+) -> None:
+    """
+    Expect the profiler to be controlled only with the token.
+    """
+    response = client.post("/admin/profiler?fraction=0.5", headers=headers)
+
+    assert status == response.status_code
+    assert (status == 200) == profiler.running
+    if status == 200:
+        assert 0.5 == response.get_json()["fraction"]
+        client.get("/slow/1")
+        stopped = client.delete("/admin/profiler", headers=headers).get_json()
+        assert not stopped["running"]
+        assert isinstance(stopped["files"], list)
+
+
+def test_toggle_without_locks(profiler: SamplingProfiler) -> None:
+    """
+    Expect toggling, e.g. from a signal handler, to return without waiting for
+    the profiler lock, and to start and stop profiling in the background.
+    """
+    with profiler.lock:
+        toggling = threading.Thread(target=profiler.toggle, daemon=True)
+        toggling.start()
+        toggling.join(timeout=1)
+        assert not toggling.is_alive()
+
+    for running in [True, False]:
+        for _ in range(100):
+            if profiler.running == running:
+                break
+            time.sleep(0.01)
+        assert running == profiler.running
+        if running:
+            profiler.toggle()
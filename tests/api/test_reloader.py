@@ -0,0 +1,87 @@
+import gc
+import logging
+import os
+
+import pandas as pd
+import pytest
+from common.cache import LRUCache
+from common.catalog import Catalog
+from common.compression import ResponseCache
+from common.reloader import LiveCatalog
+from common.snapshot import CURRENT_FILE, read_snapshot
+from resources.destination import Destination
+from stairway.sources.wikivoyage.snapshot import write_snapshot
+
+
+@pytest.fixture
+def snapshot_dir(
+    tmpdir,
+    df: pd.DataFrame,
+    df_features: pd.DataFrame,
+    df_feature_types: pd.DataFrame,
+) -> str:
+    """
+    Folder with a snapshot of the small destinations data set.
+    """
+    write_snapshot(df, df_features, df_feature_types, str(tmpdir))
+    return str(tmpdir)
+
+
+def test_reload(
+    caplog,
+    snapshot_dir: str,
+    df: pd.DataFrame,
+    df_features: pd.DataFrame,
+    df_feature_types: pd.DataFrame,
+) -> None:
+    """
+    Expect a new snapshot to be swapped in and cached results to be dropped,
+    while resources created before the swap keep the old catalog.
+    """
+    *frames, version = read_snapshot(snapshot_dir)
+    old = Catalog(*frames, version=version)
+    cache = LRUCache()
+    cache.set_version(old.version)
+    cache.put("key", "value", 5)
+    live_catalog = LiveCatalog(old, snapshot_dir, caches=[cache])
+    resource = Destination(live_catalog=live_catalog, responses=ResponseCache(cache))
+
+    assert not live_catalog.check()
+
+    version = write_snapshot(df, df_features * 2, df_feature_types, snapshot_dir)
+    with caplog.at_level(logging.INFO, logger="common.reloader"):
+        assert live_catalog.check()
+        assert not live_catalog.check()
+
+        assert version == live_catalog.catalog.version
+        assert version == cache.version
+        assert "key" not in cache
+        # a request in progress finishes with the old catalog
+        assert resource.catalog is old
+        assert 2 * df_features.values[0, 1] == pytest.approx(
+            live_catalog.catalog.features.scores[0, 1]
+        )
+
+        del old, resource
+        gc.collect()
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages[0].startswith("Swapped catalog")
+    assert messages[1].startswith("Released catalog")
+
+
+def test_reload_failure(snapshot_dir: str) -> None:
+    """
+    Expect the current catalog to be kept when the new snapshot can't be read.
+    """
+    catalog = Catalog(*read_snapshot(snapshot_dir)[:3], version="old")
+    live_catalog = LiveCatalog(catalog, snapshot_dir, interval=0.01)
+    with open(os.path.join(snapshot_dir, CURRENT_FILE), "w") as f:
+        f.write("missing")
+
+    with pytest.raises(FileNotFoundError):
+        live_catalog.check()
+
+    live_catalog.start()
+    live_catalog.stop(timeout=5)
+    assert catalog is live_catalog.catalog
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+from resources.utils.sampling import WeightedShuffle
+
+
+@pytest.fixture
+def shuffle() -> WeightedShuffle:
+    """
+    Shuffle engine for 1000 places with varying weights.
+    """
+    return WeightedShuffle(np.arange(1, 1001) ** 1.5)
+
+
+@pytest.mark.parametrize("seed", [0, 1234, 40953, -1])
+def test_weighted_shuffle_is_deterministic(
+    shuffle: WeightedShuffle, seed: int
+) -> None:
+    """
+    Expect the same order for the same seed, also from a new engine.
+    """
+    positions = np.arange(1000)
+    expected = WeightedShuffle(shuffle.weights).page(positions, seed)
+
+    assert expected.tolist() == shuffle.page(positions, seed).tolist()
+    assert sorted(expected.tolist()) == positions.tolist()
+
+
+@pytest.mark.parametrize("offset,n_results", [(0, 12), (12, 12), (990, 12)])
+def test_weighted_shuffle_pages(
+    shuffle: WeightedShuffle, offset: int, n_results: int
+) -> None:
+    """
+    Expect each page to be a slice of the full shuffled order.
+    """
+    positions = np.arange(0, 1000, 2)
+    full_order = shuffle.page(positions, seed=7)
+
+    page = shuffle.page(positions, seed=7, offset=offset, n_results=n_results)
+
+    assert full_order[offset : offset + n_results].tolist() == page.tolist()
+
+
+def test_weighted_shuffle_prefers_heavy_places() -> None:
+    """
+    Expect places with a higher weight to come first more often.
+    """
+    shuffle = WeightedShuffle([1, 1, 100])
+
+    firsts = [shuffle.page([0, 1, 2], seed, n_results=1)[0] for seed in range(500)]
+
+    assert firsts.count(2) > 400
+
+
+def test_weighted_shuffle_zero_weight_last() -> None:
+    """
+    Expect places without weight at the end of the order.
+    """
+    shuffle = WeightedShuffle([0, 5, 1])
+
+    assert 0 == shuffle.page([0, 1, 2], seed=3)[-1]
+
+
+def test_weighted_shuffle_pages_with_tied_keys() -> None:
+    """
+    Expect pages to be slices of the full order when places have the same key.
+    """
+    shuffle = WeightedShuffle([0] * 20 + [1] * 5)
+    positions = np.arange(25)
+    full_order = shuffle.page(positions, seed=11)
+
+    pages = [
+        shuffle.page(positions, seed=11, offset=i, n_results=4)
+        for i in range(0, 25, 4)
+    ]
+
+    assert full_order.tolist() == np.concatenate(pages).tolist()
+    assert full_order[5:].tolist() == list(range(20))
+
+
+def test_weighted_shuffle_cache_size() -> None:
+    """
+    Expect the number of cached seeds to follow from the size of the keys.
+    """
+    assert 16 == WeightedShuffle(np.ones(1000), cache_bytes=64000).cache_size
+    assert 1 == WeightedShuffle(np.ones(1000), cache_bytes=100).cache_size
+    assert np.float32 == WeightedShuffle(np.ones(1000)).keys(3).dtype
+
+
+def test_weighted_shuffle_sample(shuffle: WeightedShuffle) -> None:
+    """
+    Expect a deterministic weighted order of the given places, with places
+    without weight last.
+    """
+    positions = np.array([999, 5, 500, 0, 250])
+
+    sample = shuffle.sample(positions, seed=7, n_results=3)
+
+    assert sample.tolist() == shuffle.sample(positions, seed=7)[:3].tolist()
+    assert sample.tolist() == WeightedShuffle(shuffle.weights).sample(
+        positions, seed=7, n_results=3
+    ).tolist()
+    assert set(shuffle.sample(positions).tolist()) == set(positions.tolist())
+    assert [] == shuffle.sample(positions, seed=7, n_results=0).tolist()
+    assert 0 == WeightedShuffle([0, 5, 1]).sample([0, 1, 2], seed=3)[-1]
+
+
+def test_weighted_shuffle_choice() -> None:
+    """
+    Expect places to be picked in proportion to their weight, and places
+    without weight never, unless no place has a weight.
+    """
+    shuffle = WeightedShuffle([1, 0, 3])
+
+    picks = [shuffle.choice() for _ in range(2000)]
+
+    assert 0 == picks.count(1)
+    assert 1300 < picks.count(2) < 1700
+    assert {0, 1} >= {WeightedShuffle([0, 0]).choice() for _ in range(20)}
@@ -0,0 +1,115 @@
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+import pytest
+from resources.utils.selection import (
+    CountryIndex,
+    GridIndex,
+    filter_on_geolocation,
+    normalize_country,
+)
+
+
+@pytest.fixture
+def df_random() -> pd.DataFrame:
+    """
+    Random places on the globe, including places on cell boundaries.
+    """
+    rng = np.random.RandomState(42)
+    return pd.DataFrame(
+        {
+            "lat": np.concatenate([rng.uniform(-90, 90, 2000), [0.0, 10.0, -90.0]]),
+            "lng": np.concatenate(
+                [rng.uniform(-180, 180, 2000), [0.0, 180.0, -180.0]]
+            ),
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "viewport",
+    [
+        (52.43, 5.08, 52.28, 4.73),
+        (10.0, 10.0, -10.0, -10.0),
+        (60.5, 20.5, 10.25, -30.75),
+        (90.0, 180.0, -90.0, -180.0),
+        # crossing the 180 degree meridian
+        (30.0, -170.0, -30.0, 160.0),
+        (85.0, 180.0, -85.0, 179.5),
+        # empty viewports
+        (10.0, 10.0, 10.0, -10.0),
+        (10.0, 10.0, 20.0, -10.0),
+    ],
+)
+def test_grid_index_matches_filter(
+    df_random: pd.DataFrame, viewport: Tuple[float]
+) -> None:
+    """
+    Expect the grid index to find the same places as filtering all places.
+    """
+    index = GridIndex(df_random["lat"].values, df_random["lng"].values)
+
+    expected = filter_on_geolocation(df_random, *viewport).index.tolist()
+
+    assert expected == index.query(*viewport).tolist()
+
+
+def test_filter_on_geolocation_across_antimeridian() -> None:
+    """
+    Expect places on both sides of the 180 degree meridian to be found.
+    """
+    df_in = pd.DataFrame({"lat": [0.0, 0.0, 0.0], "lng": [179.0, -179.0, 0.0]})
+
+    assert [0, 1] == filter_on_geolocation(
+        df_in, 1.0, -178.0, -1.0, 178.0
+    ).index.tolist()
+
+
+@pytest.mark.parametrize(
+    "country,expected",
+    [
+        ("Côte d'Ivoire", "cote d ivoire"),
+        ("  Guinea-Bissau ", "guinea bissau"),
+        ("SÃO TOMÉ AND PRÍNCIPE", "sao tome and principe"),
+        ("Georgia (country)", "georgia country"),
+    ],
+)
+def test_normalize_country(country: str, expected: str) -> None:
+    """
+    Expect country names to be normalized for matching.
+    """
+    assert expected == normalize_country(country)
+
+
+@pytest.mark.parametrize(
+    "country,expected",
+    [
+        ("Denmark", [2, 3]),
+        ("denmark", [2, 3]),
+        ("DENMARK", [2, 3]),
+        ("The Netherlands", [0]),
+        ("Holland", [0]),
+        ("Pérú", [4]),
+        ("Atlantis", []),
+    ],
+)
+def test_country_index(df: pd.DataFrame, country: str, expected: list) -> None:
+    """
+    Expect case and accent insensitive matching, including aliases.
+    """
+    index = CountryIndex(df["country"].values)
+
+    assert expected == index.query(country).tolist()
+
+
+def test_country_index_prefers_data_over_alias() -> None:
+    """
+    Expect a country name in the data to win from an alias with that name.
+    """
+    index = CountryIndex(
+        ["Georgia (country)", "Georgia"], aliases={"Georgia": "Georgia (country)"}
+    )
+
+    assert [1] == index.query("georgia").tolist()
+    assert [0] == index.query("Georgia (country)").tolist()
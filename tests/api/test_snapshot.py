@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import pandas as pd
+from common.catalog import Catalog
+from common.snapshot import CURRENT_FILE, get_current_version, read_snapshot
+from pandas.testing import assert_frame_equal
+from stairway.sources.wikivoyage import snapshot
+from stairway.sources.wikivoyage.snapshot import write_snapshot
+
+
+def test_snapshot_round_trip(
+    tmpdir,
+    df: pd.DataFrame,
+    df_features: pd.DataFrame,
+    df_feature_types: pd.DataFrame,
+) -> None:
+    """
+    Expect the API to read back the same data as was written to the snapshot.
+    """
+    version = write_snapshot(
+        df.reset_index(drop=True), df_features, df_feature_types, str(tmpdir)
+    )
+
+    result = read_snapshot(str(tmpdir))
+
+    assert version == get_current_version(str(tmpdir)) == result[3]
+    assert_frame_equal(df, result[0], check_dtype=False)
+    assert_frame_equal(
+        df_features, result[1], check_dtype=False, check_column_type=False
+    )
+    assert_frame_equal(df_feature_types, result[2], check_dtype=False)
+
+
+def test_snapshot_missing_values(
+    tmpdir,
+    df: pd.DataFrame,
+    df_features: pd.DataFrame,
+    df_feature_types: pd.DataFrame,
+) -> None:
+    """
+    Expect missing text values to be read back as missing, like from CSV.
+    """
+    df = df.assign(
+        country=["Netherlands", np.nan, "Denmark", "Denmark", np.nan],
+        status=[np.nan] * 5,
+    )
+    write_snapshot(
+        df.reset_index(drop=True), df_features, df_feature_types, str(tmpdir)
+    )
+
+    result = read_snapshot(str(tmpdir))
+
+    assert_frame_equal(df, result[0], check_dtype=False)
+    assert [False, True, False, False, True] == result[0]["country"].isna().tolist()
+
+
+def test_snapshot_empty_current_file(tmpdir) -> None:
+    """
+    Expect no current version for an empty CURRENT file, when writing as well
+    as reading snapshots.
+    """
+    tmpdir.join(CURRENT_FILE).write("\n")
+
+    assert get_current_version(str(tmpdir)) is None
+    assert snapshot.get_current_version is get_current_version
+
+
+def test_snapshot_versions(
+    tmpdir,
+    df: pd.DataFrame,
+    df_features: pd.DataFrame,
+    df_feature_types: pd.DataFrame,
+) -> None:
+    """
+    Expect the same version for the same data and old versions to be removed.
+    """
+    versions = [
+        write_snapshot(df, df_features, df_feature_types, str(tmpdir)),
+        write_snapshot(df, df_features, df_feature_types, str(tmpdir)),
+        write_snapshot(df, df_features * 2, df_feature_types, str(tmpdir)),
+        write_snapshot(df, df_features * 3, df_feature_types, str(tmpdir)),
+    ]
+
+    assert versions[0] == versions[1]
+    assert len(set(versions)) == 3
+    assert versions[3] == get_current_version(str(tmpdir))
+    remaining = [name for name in os.listdir(str(tmpdir)) if name != "CURRENT"]
+    assert 2 == len(remaining)
+    assert versions[3] in remaining
+
+
+def test_snapshot_features_not_copied(
+    tmpdir,
+    df: pd.DataFrame,
+    df_features: pd.DataFrame,
+    df_feature_types: pd.DataFrame,
+) -> None:
+    """
+    Expect the catalog to use the memory-mapped feature scores of a snapshot.
+    """
+    write_snapshot(
+        df.reset_index(drop=True), df_features, df_feature_types, str(tmpdir)
+    )
+    df, df_features, df_feature_types, version = read_snapshot(str(tmpdir))
+
+    catalog = Catalog(df, df_features, df_feature_types, version)
+
+    base = catalog.features.scores
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    assert isinstance(base, np.memmap)
+    assert not catalog.features.scores.flags.writeable
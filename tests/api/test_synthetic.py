@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+from benchmarks.synthetic import create_data
+from common.catalog import Catalog
+
+
+@pytest.mark.parametrize("n_places", [1, 500])
+def test_create_data(
+    n_places: int,
+    df: pd.DataFrame,
+    df_feature_types: pd.DataFrame,
+) -> None:
+    """
+    Expect the same columns and types as the API data, the same data for the
+    same seed and a catalog that can be built from it.
+    """
+    synthetic, synthetic_features, synthetic_feature_types = create_data(n_places)
+
+    assert n_places == len(synthetic) == len(synthetic_features)
+    assert synthetic["id"].is_unique
+    assert list(df.columns) == list(synthetic.columns)
+    assert set(df_feature_types.columns) <= set(synthetic_feature_types.columns)
+    for column in ["id", "weight", "lat", "nr_tokens_norm"]:
+        assert df[column].dtype.kind == synthetic[column].dtype.kind
+    assert list(synthetic_feature_types["feature_name"]) == list(
+        synthetic_features.columns
+    )
+    assert synthetic_features.index.equals(pd.Index(synthetic["id"]))
+    pd.testing.assert_frame_equal(synthetic, create_data(n_places)[0])
+
+    catalog = Catalog(synthetic, synthetic_features, synthetic_feature_types)
+    assert n_places == len(catalog.df)
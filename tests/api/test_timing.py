@@ -0,0 +1,95 @@
+import json
+import logging
+
+import pandas as pd
+import pytest
+from common.catalog import Catalog
+from common.timing import NULL_SPAN, record_timings, recording, span
+from flask import Flask
+from resources.explore import ExploreQuery, select_places
+
+
+def create_app(**kwargs) -> Flask:
+    app = Flask(__name__)
+
+    def view():
+        with span("select"):
+            pass
+        with span("render"):
+            return "ok"
+
+    app.add_url_rule("/", "index", view)
+    record_timings(app, **kwargs)
+    return app
+
+
+def test_span_without_recording() -> None:
+    """
+    Expect spans to do nothing when timings are not recorded.
+    """
+    assert NULL_SPAN is span("select")
+
+
+@pytest.mark.parametrize(
+    "query,expected",
+    [
+        (ExploreQuery("denmark", None, (), 1), ["country", "shuffle"]),
+        (
+            ExploreQuery(None, (60.0, 20.0, 45.0, 0.0), ("nature",), None),
+            ["viewport", "profiles"],
+        ),
+    ],
+)
+def test_recording(
+    df: pd.DataFrame,
+    df_features: pd.DataFrame,
+    df_feature_types: pd.DataFrame,
+    query: ExploreQuery,
+    expected: list,
+) -> None:
+    """
+    Expect the stages of selecting places to be recorded in order.
+    """
+    catalog = Catalog(df.set_index("id", drop=False), df_features, df_feature_types)
+
+    with recording() as spans:
+        select_places(catalog, query)
+
+    assert expected == list(spans)
+    assert all(seconds >= 0 for seconds in spans.values())
+    assert NULL_SPAN is span("select")
+
+
+@pytest.mark.parametrize("header", [True, False])
+def test_server_timing(header: bool) -> None:
+    """
+    Expect a Server-Timing header with every stage and the total, if enabled.
+    """
+    response = create_app(header=header).test_client().get("/")
+
+    if header:
+        stages = [
+            metric.split(";dur=")[0]
+            for metric in response.headers["Server-Timing"].split(", ")
+        ]
+        assert ["select", "render", "total"] == stages
+    else:
+        assert "Server-Timing" not in response.headers
+
+
+@pytest.mark.parametrize("slow_threshold,logged", [(0, True), (10, False)])
+def test_slow_request_log(caplog, slow_threshold: float, logged: bool) -> None:
+    """
+    Expect the stages of requests slower than the threshold to be logged.
+    """
+    app = create_app(header=False, slow_threshold=slow_threshold)
+
+    with caplog.at_level(logging.WARNING, logger="common.timing"):
+        app.test_client().get("/?a=1")
+
+    assert logged == bool(caplog.records)
+    if logged:
+        entry = json.loads(caplog.records[0].getMessage().split(": ", 1)[1])
+        assert "/" == entry["path"]
+        assert "a=1" == entry["query"]
+        assert ["select", "render"] == list(entry["spans_ms"])
@@ -0,0 +1,59 @@
+from typing import List
+
+import pandas as pd
+import pytest
+from common.catalog import Catalog
+from resources.utils.utils import create_list_of_likes
+
+
+@pytest.fixture
+def catalog(
+    df: pd.DataFrame, df_features: pd.DataFrame, df_feature_types: pd.DataFrame
+) -> Catalog:
+    """
+    Catalog for the small destinations data set.
+    """
+    return Catalog(df, df_features, df_feature_types)
+
+
+@pytest.mark.parametrize(
+    "likes,expected,unknown",
+    [
+        ([], "<ul></ul>", []),
+        ([867598], "<ul><li>Aachen, Germany</ul>", []),
+        (
+            [461000, 123, 867598, 461000],
+            "<ul><li>Lima, Peru<li>Aachen, Germany<li>Lima, Peru</ul>",
+            [123],
+        ),
+    ],
+)
+def test_create_list_of_likes(
+    catalog: Catalog, likes: List[int], expected: str, unknown: List[int]
+) -> None:
+    """
+    Expect the known places in the order of the likes and unknown ids reported.
+    """
+    assert (expected, unknown) == create_list_of_likes(catalog, likes)
+
+
+def test_create_list_of_likes_with_links(catalog: Catalog) -> None:
+    """
+    Expect every place to be linked when using the pipe delimited format.
+    """
+    text, unknown = create_list_of_likes(
+        catalog,
+        [146019, 999],
+        list_prefix="|",
+        list_postfix="",
+        line_prefix=" ",
+        line_postfix=" |",
+        add_link=True,
+    )
+
+    expected = (
+        "| <a href='https://stairwaytotravel.com/explore/146019'>"
+        "Aakirkeby, Denmark</a> |"
+    )
+    assert expected == text
+    assert [999] == unknown
@@ -0,0 +1,103 @@
+import bz2
+import os
+from xml.etree.ElementTree import fromstring
+
+import pytest
+
+from stairway.sources.wikivoyage.multistream import (
+    find_index,
+    read_offsets,
+    read_stream,
+    read_streams,
+)
+
+NAMESPACE = "http://www.mediawiki.org/xml/export-0.10/"
+HEADER = (
+    f'<mediawiki xmlns="{NAMESPACE}" xml:lang="en">\n'
+    "  <siteinfo>\n    <sitename>Wikivoyage</sitename>\n  </siteinfo>\n"
+)
+PAGES = [
+    ("Amsterdam", 10, "{{geo|52.37|4.89}} {{usablecity}}"),
+    ("Aachen", 33, "{{outlinecity}} &lt;/mediawiki&gt;"),
+    ("Aakirkeby", 36, "{{IsPartOf|Bornholm}}"),
+    ("Aalborg", 37, "{{guidecity}}"),
+    ("Lima", 40, ""),
+]
+
+
+def page(title: str, page_id: int, text: str) -> str:
+    return (
+        f"  <page>\n    <title>{title}</title>\n    <ns>0</ns>\n"
+        f"    <id>{page_id}</id>\n    <revision>\n"
+        f'      <text xml:space="preserve">{text}</text>\n'
+        "    </revision>\n  </page>\n"
+    )
+
+
+@pytest.fixture
+def dump(tmpdir) -> str:
+    """
+    Multistream dump with two pages per stream and a compressed index.
+    """
+    fname = str(tmpdir.join("enwikivoyage-pages-articles-multistream.xml.bz2"))
+    index = []
+    with open(fname, "wb") as f:
+        f.write(bz2.compress(HEADER.encode()))
+        for i in range(0, len(PAGES), 2):
+            offset = f.tell()
+            for title, page_id, _ in PAGES[i : i + 2]:
+                index.append(f"{offset}:{page_id}:{title}\n")
+            stream = "".join(page(*args) for args in PAGES[i : i + 2])
+            f.write(bz2.compress(stream.encode()))
+        f.write(bz2.compress(b"</mediawiki>\n"))
+    with bz2.open(fname.replace(".xml.bz2", "-index.txt.bz2"), "wt") as f:
+        f.writelines(index)
+    return fname
+
+
+def titles(xml: bytes) -> list:
+    root = fromstring(xml)
+    return [elem.text for elem in root.iter(f"{{{NAMESPACE}}}title")]
+
+
+def test_find_index(dump: str, tmpdir) -> None:
+    """
+    Expect the compressed or plain index next to a multistream dump.
+    """
+    assert dump.replace(".xml.bz2", "-index.txt.bz2") == find_index(dump)
+
+    os.remove(find_index(dump))
+    index_fname = dump.replace(".xml.bz2", "-index.txt")
+    open(index_fname, "w").close()
+    assert index_fname == find_index(dump)
+
+    assert find_index(str(tmpdir.join("enwikivoyage-pages-articles.xml.bz2"))) is None
+    assert find_index(str(tmpdir.join("enwikivoyage-pages-articles.xml"))) is None
+
+
+def test_read_streams(dump: str) -> None:
+    """
+    Expect every stream to be a document with its own pages, together all
+    pages of the dump in order.
+    """
+    root, ranges = read_streams(dump, find_index(dump))
+
+    assert HEADER.splitlines()[0].encode() == root
+    assert 3 == len(ranges) == len(read_offsets(find_index(dump)))
+    assert os.path.getsize(dump) == ranges[-1][1]
+
+    streams = [titles(read_stream(dump, start, end, root)) for start, end in ranges]
+    assert [["Amsterdam", "Aachen"], ["Aakirkeby", "Aalborg"], ["Lima"]] == streams
+    with bz2.BZ2File(dump) as f:
+        assert titles(f.read()) == sum(streams, [])
+
+
+def test_read_streams_without_pages(dump: str, tmpdir) -> None:
+    """
+    Expect an error for an index without streams.
+    """
+    index_fname = str(tmpdir.join("empty-index.txt"))
+    open(index_fname, "w").close()
+
+    with pytest.raises(ValueError):
+        read_streams(dump, index_fname)
@@ -0,0 +1,164 @@
+import random
+
+import pytest
+
+from stairway.sources.wikivoyage.templates import (
+    extract_article_type,
+    extract_disambiguation,
+    extract_geolocation,
+    extract_historical,
+    extract_ispartof,
+    extract_patterns,
+    remove_template,
+    scan_templates,
+)
+
+ARTICLES = [
+    "",
+    "No templates at all.",
+    "{{pagebanner|Amsterdam banner.jpg}}\n'''Amsterdam''' is the capital."
+    "\n{{geo|52.37|4.89|zoom=12}}\n{{usablecity}}\n{{IsPartOf|North_Holland}}",
+    "{{Quickbar|image={{geo|1.5|-2.25}}}} {{mapframe|-12.05|-77.04}}",
+    "{{outline}} {{guidecity}} {{Star Park|x}} {{extraregion}}",
+    "{{GEO|1|2}} {{geo|3.|4.5.6|7}} {{geo|8|abc}} {{geo|}}",
+    "{{isin|Denmark}} {{IsPartOf| Bornholm_ }} {{ispartof}}",
+    "{{disamb}}",
+    "{{disambig|Lima}}",
+    "{{pagebanner|Disambiguation banner.png}}",
+    "{{pagebanner|Disambiguation bannerXpng|caption}}",
+    "{{historical}} {{Historical|1900}}",
+    "{{{usablecity}}} {{{{geo|1|2}}}}",
+    "text {{unclosed {{geo|1|2}} template",
+    "{{a}b}} {{b}}} }}{{c{d}} {{",
+    "{ {geo|1|2} } {{ geo|1|2}}",
+    "{{usableDistrict\n|note}} {{usable district}} {{usable_city}}",
+    "{{ÉtoileCity}} {{outlineСity}}",
+]
+
+
+def remove_template_reference(s):
+    """
+    The character by character walk parsing.py removed templates with before
+    `scan_templates`.
+    """
+    n_open, n_close = 0, 0
+    starts, ends = [], [-1]
+    in_template = False
+    prev_c = None
+    for i, c in enumerate(s):
+        if not in_template:
+            if c == "{" and c == prev_c:
+                starts.append(i - 1)
+                in_template = True
+                n_open = 1
+        if in_template:
+            if c == "{":
+                n_open += 1
+            elif c == "}":
+                n_close += 1
+            if n_open == n_close:
+                ends.append(i)
+                in_template = False
+                n_open, n_close = 0, 0
+        prev_c = c
+
+    starts.append(None)
+    return "".join(s[end + 1 : start] for end, start in zip(ends, starts))
+
+
+def extract_patterns_reference(s):
+    """
+    The features found by searching the article once for every feature.
+    """
+    status, articletype = extract_article_type(s)
+    lat, lon = extract_geolocation(s)
+    ispartof = extract_ispartof(s)
+    disambiguation = extract_disambiguation(s)
+    historical = extract_historical(s)
+
+    return status, articletype, lat, lon, ispartof, disambiguation, historical
+
+
+def random_articles(n, seed=1234):
+    """
+    Random articles made of braces, feature templates and text.
+    """
+    rng = random.Random(seed)
+    pieces = [
+        "{",
+        "}",
+        "{{",
+        "}}",
+        "|",
+        " ",
+        "\n",
+        "geo|1.5|2",
+        "mapframe|-3|4.25|zoom",
+        "usablecity",
+        "Outline",
+        "IsPartOf|North_Holland",
+        "isin|x",
+        "disamb",
+        "historical",
+        "text",
+    ]
+    return ["".join(rng.choices(pieces, k=rng.randint(0, 40))) for _ in range(n)]
+
+
+@pytest.mark.parametrize("article", ARTICLES)
+def test_extract_patterns(article: str) -> None:
+    """
+    Expect the same features as searching the article for every feature.
+    """
+    assert extract_patterns_reference(article) == extract_patterns(article)
+
+
+def test_extract_patterns_features() -> None:
+    """
+    Expect the first status, the last geolocation and IsPartOf, and the flags.
+    """
+    article = (
+        "{{usablecity}} {{outline}} {{Quickbar|{{geo|1.5|-2.25}}}} "
+        "{{IsPartOf|Zuid_Holland}} {{mapframe|52|4.5|zoom=9}} "
+        "{{isin|North_Holland}} {{disamb}}"
+    )
+
+    expected = ("usable", "city", 52.0, 4.5, "North Holland", True, False)
+    assert expected == extract_patterns(article)
+
+
+@pytest.mark.parametrize("article", ARTICLES)
+def test_remove_template(article: str) -> None:
+    """
+    Expect the same text as removing the templates character by character.
+    """
+    assert remove_template_reference(article) == remove_template(article)
+
+
+def test_random_articles() -> None:
+    """
+    Expect the same features and text as before for random markup.
+    """
+    for article in random_articles(2000):
+        templates, spans = scan_templates(article)
+
+        assert extract_patterns_reference(article) == extract_patterns(
+            article, templates
+        )
+        assert remove_template_reference(article) == remove_template(article, spans)
+
+
+@pytest.mark.parametrize(
+    "article,templates,spans",
+    [
+        ("a {{b}} c", [(2, "b")], [(2, 7)]),
+        ("{{a|{{b}}|{{c}}}}", [(4, "b"), (10, "c")], [(0, 17)]),
+        ("{{{a}}} {{b", [(1, "a")], [(0, 7), (8, None)]),
+        ("{a} {{b}c}", [], [(4, 10)]),
+    ],
+)
+def test_scan_templates(article: str, templates: list, spans: list) -> None:
+    """
+    Expect the innermost templates and the spans of the outermost templates.
+    """
+    assert (templates, spans) == scan_templates(article)